@@ -0,0 +1,262 @@
+"""
+API HTTP/JSON das compras, para integrações (ERP, scripts noturnos) sem
+passar pelo Streamlit. Usa os mesmos consultas.py / servico.py e o mesmo
+banco do app; roda num servidor ASGI (uvicorn) com vários processos.
+
+    GET    /api/compras          lista filtrada e paginada (por chave)
+    POST   /api/compras          grava um ou vários pedidos
+    DELETE /api/compras/{id}     exclui uma linha
+    GET    /api/kpis             totais dos filtros (os cards do app)
+    GET    /api/pedido.pdf       PDF do pedido de um fornecedor/destino no período
+    GET    /api/saude            verificação simples (load balancer)
+
+Filtros (query string): comprador, fornecedor, data_ini, data_fim (AAAA-MM-DD).
+As consultas ao banco rodam no pool de threads do servidor, fora do event loop.
+
+Uso:
+    python api.py                                  # COMPRAS_API_* abaixo
+    uvicorn api:app --workers 4 --port 8000
+
+Variáveis de ambiente:
+  COMPRAS_API_HOST      (padrão: 0.0.0.0)
+  COMPRAS_API_PORTA     (padrão: 8000)
+  COMPRAS_API_WORKERS   processos do servidor (padrão: núcleos, até 8)
+"""
+import os
+import re
+import unicodedata
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from urllib.parse import quote
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import servico
+from consultas import FiltrosCompras, itens_pedido_rollup, kpis_compras, pagina_compras_linhas
+from esquema import dias_para_data
+from pedido_pdf import nome_arquivo_pdf
+
+API_HOST = os.environ.get("COMPRAS_API_HOST", "0.0.0.0")
+API_PORTA = int(os.environ.get("COMPRAS_API_PORTA", 8000))
+API_WORKERS = int(os.environ.get("COMPRAS_API_WORKERS", min(8, os.cpu_count() or 1)))
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+MAX_PEDIDOS_POR_ENVIO = 1000
+
+
+class ErroRequisicao(ValueError):
+    """Parâmetro ou corpo inválido: vira resposta 400 com a mensagem."""
+
+
+# ----------------------------
+# Parâmetros
+# ----------------------------
+def _data(valor, campo: str) -> date | None:
+    if valor in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(str(valor))
+    except ValueError:
+        raise ErroRequisicao(f"{campo}: data inválida (use AAAA-MM-DD)") from None
+
+
+def _inteiro(valor, campo: str, padrao: int, minimo: int = 1, maximo: int | None = None) -> int:
+    if valor in (None, ""):
+        return padrao
+    try:
+        n = int(valor)
+    except ValueError:
+        raise ErroRequisicao(f"{campo}: número inteiro esperado") from None
+    if n < minimo or (maximo is not None and n > maximo):
+        regra = f"deve ser ≥ {minimo}" if maximo is None else f"fora do intervalo {minimo}..{maximo}"
+        raise ErroRequisicao(f"{campo}: {regra}")
+    return n
+
+
+def _filtros(params) -> FiltrosCompras:
+    return FiltrosCompras(
+        comprador=params.get("comprador") or None,
+        fornecedor=params.get("fornecedor") or None,
+        data_ini=_data(params.get("data_ini"), "data_ini"),
+        data_fim=_data(params.get("data_fim"), "data_fim"),
+    )
+
+
+def _cursor(valor) -> tuple[int, int, int] | None:
+    """Cursor opaco "dias:pedido:id" devolvido em `proxima` pela página anterior."""
+    if not valor:
+        return None
+    try:
+        dias, pedido_id, id_ = valor.split(":")
+        return int(dias), int(pedido_id), int(id_)
+    except ValueError:
+        raise ErroRequisicao("apos: cursor inválido") from None
+
+
+def _anexo(nome: str) -> str:
+    """
+    Content-Disposition de download. Cabeçalhos HTTP só levam latin-1 e o
+    nome vem de fornecedor/cidade: filename= leva uma versão ASCII (sem
+    acentos, só letras, números e ._-) e filename*= o nome original em UTF-8
+    (RFC 6266), que os navegadores preferem.
+    """
+    sem_acento = "".join(c for c in unicodedata.normalize("NFKD", nome) if not unicodedata.combining(c))
+    ascii_ = re.sub(r"[^A-Za-z0-9._-]", "_", sem_acento)
+    return f"attachment; filename=\"{ascii_}\"; filename*=UTF-8''{quote(nome, safe='')}"
+
+
+def _pedido(corpo) -> tuple[dict, list]:
+    """Valida um pedido do POST com as regras do formulário; devolve (cabeçalho, linhas)."""
+    if not isinstance(corpo, dict):
+        raise ErroRequisicao("cada pedido deve ser um objeto")
+    cabecalho = {}
+    for campo in ("comprador", "fornecedor", "cidade_destino"):
+        valor = corpo.get(campo)
+        if not isinstance(valor, str) or not valor.strip():
+            raise ErroRequisicao(f"{campo}: obrigatório")
+        cabecalho[campo] = valor
+    cabecalho["data_compra"] = _data(corpo.get("data_compra"), "data_compra") or date.today()
+
+    itens = corpo.get("itens")
+    if not isinstance(itens, list) or not itens:
+        raise ErroRequisicao("itens: lista com ao menos um item")
+    linhas = []
+    for n, it in enumerate(itens, start=1):
+        item = it.get("item") if isinstance(it, dict) else None
+        quantidade = it.get("quantidade") if isinstance(it, dict) else None
+        if not isinstance(item, str) or not item.strip():
+            raise ErroRequisicao(f"itens[{n}]: item obrigatório")
+        if isinstance(quantidade, bool) or not isinstance(quantidade, (int, float)) or not quantidade > 0:
+            raise ErroRequisicao(f"itens[{n}]: quantidade deve ser maior que zero")
+        linhas.append((item, quantidade))
+    return cabecalho, linhas
+
+
+def _registro(linha: dict, datas: dict) -> dict:
+    """Linha da grade em JSON: datas em ISO."""
+    dias = linha["data_compra"]
+    if dias not in datas:
+        datas[dias] = dias_para_data(dias).isoformat()
+    return {
+        **linha,
+        "data_compra": datas[dias],
+        "criado_em": datetime.fromtimestamp(linha["criado_em"], timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+# ----------------------------
+# Rotas
+# ----------------------------
+async def listar_compras(request):
+    params = request.query_params
+    filtros = _filtros(params)
+    limite = _inteiro(params.get("limite"), "limite", LIMITE_PADRAO, maximo=LIMITE_MAXIMO)
+    # Uma linha a mais diz se existe próxima página
+    linhas = await run_in_threadpool(pagina_compras_linhas, filtros, _cursor(params.get("apos")), limite + 1)
+    pagina = linhas[:limite]
+    proxima = None
+    if len(linhas) > limite:
+        ultima = pagina[-1]
+        proxima = f"{ultima['data_compra']}:{ultima['pedido_id']}:{ultima['id']}"
+    datas = {}
+    return JSONResponse({"compras": [_registro(l, datas) for l in pagina], "proxima": proxima})
+
+
+async def criar_compras(request):
+    try:
+        corpo = await request.json()
+    except ValueError:
+        raise ErroRequisicao("corpo deve ser JSON") from None
+    pedidos = corpo if isinstance(corpo, list) else [corpo]
+    if not pedidos or len(pedidos) > MAX_PEDIDOS_POR_ENVIO:
+        raise ErroRequisicao(f"envie de 1 a {MAX_PEDIDOS_POR_ENVIO} pedidos")
+    # Valida tudo antes de gravar e grava tudo numa transação só: um pedido
+    # ruim (ou uma falha no meio da gravação) não deixa o envio pela metade
+    validados = []
+    for n, pedido in enumerate(pedidos, start=1):
+        try:
+            validados.append(_pedido(pedido))
+        except ErroRequisicao as e:
+            raise ErroRequisicao(f"pedido {n}: {e}") from None
+
+    ids = await run_in_threadpool(servico.inserir_pedidos, validados)
+    return JSONResponse({"pedidos": [{"ids": lista} for lista in ids]}, status_code=201)
+
+
+async def excluir_compra(request):
+    compra_id = request.path_params["compra_id"]
+    if not await run_in_threadpool(servico.deletar_compra, compra_id):
+        return JSONResponse({"erro": f"compra {compra_id} não encontrada"}, status_code=404)
+    return Response(status_code=204)
+
+
+async def kpis(request):
+    return JSONResponse(await run_in_threadpool(kpis_compras, _filtros(request.query_params)))
+
+
+async def pedido_pdf(request):
+    params = request.query_params
+    fornecedor, cidade = params.get("fornecedor"), params.get("cidade")
+    if not fornecedor or not cidade:
+        raise ErroRequisicao("fornecedor e cidade são obrigatórios")
+    ini, fim = _data(params.get("data_ini"), "data_ini"), _data(params.get("data_fim"), "data_fim")
+    data_pedido = _data(params.get("data_pedido"), "data_pedido") or date.today()
+
+    def gerar():
+        itens = itens_pedido_rollup(fornecedor, cidade, ini, fim)
+        if itens.empty:
+            return None
+        return servico.obter_pdf_pedido(dict(
+            numero_pedido=params.get("numero_pedido", "").strip(),
+            data_pedido=data_pedido,
+            cnpj_faturamento=params.get("cnpj_faturamento", "").strip(),
+            solicitante=params.get("solicitante", "").strip(),
+            fornecedor=fornecedor,
+            destino=cidade,
+            observacoes=params.get("observacoes", "").strip(),
+            itens_df=itens,
+        ), gerar=True)
+
+    pdf = await run_in_threadpool(gerar)
+    if pdf is None:
+        return JSONResponse({"erro": "sem lançamentos para esse fornecedor/destino no período"}, status_code=404)
+    nome = nome_arquivo_pdf(fornecedor, cidade, data_pedido)
+    return Response(pdf, media_type="application/pdf",
+                    headers={"Content-Disposition": _anexo(nome)})
+
+
+async def saude(request):
+    return JSONResponse({"ok": True})
+
+
+async def _erro_requisicao(request, exc):
+    return JSONResponse({"erro": str(exc)}, status_code=400)
+
+
+@asynccontextmanager
+async def _ciclo(app):
+    await run_in_threadpool(servico.aquecer)
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/api/compras", listar_compras, methods=["GET"]),
+        Route("/api/compras", criar_compras, methods=["POST"]),
+        Route("/api/compras/{compra_id:int}", excluir_compra, methods=["DELETE"]),
+        Route("/api/kpis", kpis, methods=["GET"]),
+        Route("/api/pedido.pdf", pedido_pdf, methods=["GET"]),
+        Route("/api/saude", saude, methods=["GET"]),
+    ],
+    exception_handlers={ErroRequisicao: _erro_requisicao},
+    lifespan=_ciclo,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api:app", host=API_HOST, port=API_PORTA, workers=API_WORKERS)
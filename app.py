@@ -1,15 +1,29 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-from datetime import date, datetime
-from sqlalchemy import create_engine, text
-from io import BytesIO
-
-# ✅ PDF (ReportLab)
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.units import mm
+from datetime import date
+import functools
+import os
+import re
+import tempfile
+import uuid
+
+from esquema import data_para_dias
+
+# Regras e acesso a dados ficam fora da tela: consultas.py (leitura) e servico.py
+from consultas import (
+    BUSCA_RANQUEAR_ATE, FiltrosCompras, versao_tabela, pagina_compras, kpis_compras, itens_pedido_rollup,
+    itens_lote_rollup, volume_total, volume_fornecedores, atividade_compradores, itens_cidade,
+)
+from servico import (
+    iniciar, aquecer, inserir_compras_lote, deletar_compra, opcoes, buscar, ler_export,
+    obter_pdf_pedido, tarefa_exportar, tarefa_importar, tarefa_pedidos_zip,
+)
+from pedido_pdf import nome_arquivo_pdf, pedidos_em_lote
+from exportar import FORMATOS, LIMITE_LINHAS_XLSX
+from validacao import Validacao, validar_compras, validar_itens
+import tarefas
+import perfil
 
 # ----------------------------
 # CONFIG UI
@@ -20,6 +34,8 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded",
 )
+perfil.iniciar_rerun()
+iniciar()
 
 # ----------------------------
 # ✅ LIMPEZA SEGURA (ANTES DOS WIDGETS)
@@ -45,311 +61,102 @@ if st.session_state.get("_limpar_form"):
 # -----------------------------
 # CSS (com destaque no formulário)
 # -----------------------------
-CSS = """
-<style>
-  header[data-testid="stHeader"]{display:none;}
-  [data-testid="stAppViewContainer"]{padding-top:0!important;margin-top:0!important;overflow-x:hidden!important;}
-  .block-container{padding-top:0.8rem!important;padding-bottom:1.2rem!important;max-width:1200px!important;}
-  html, body, [class*="css"]{font-size:13px!important;}
-
-  .stApp{
-    background: radial-gradient(circle at 30% 10%, #f7e9ff 0%, #f6f7ff 35%, #f3f6ff 100%);
-  }
-
-  section[data-testid="stSidebar"]{
-    background: linear-gradient(180deg, #2b2f88 0%, #1f2a6d 55%, #14204f 100%);
-  }
-  section[data-testid="stSidebar"] *{color:#fff!important;}
-
-  /* ===== TEXTO PRETO DENTRO DOS CAMPOS DA SIDEBAR ===== */
-  section[data-testid="stSidebar"] input,
-  section[data-testid="stSidebar"] textarea,
-  section[data-testid="stSidebar"] input::placeholder,
-  section[data-testid="stSidebar"] textarea::placeholder,
-  section[data-testid="stSidebar"] .stDateInput input {
-    color: #000 !important;
-    -webkit-text-fill-color: #000 !important; /* ajuda no Chrome */
-    font-weight: 700 !important;
-  }
-
-  /* Selectbox (valor selecionado) */
-  section[data-testid="stSidebar"] div[data-baseweb="select"] * {
-    color: #000 !important;
-    -webkit-text-fill-color: #000 !important;
-  }
-
-  /* Opções do dropdown (quando abre) — às vezes fica fora da sidebar */
-  div[role="listbox"] * {
-    color: #000 !important;
-  }
-
-  section[data-testid="stSidebar"] input,
-  section[data-testid="stSidebar"] .stDateInput input,
-  section[data-testid="stSidebar"] .stSelectbox div[data-baseweb="select"]{
-    background: rgba(255,255,255,0.10) !important;
-    border: 1px solid rgba(255,255,255,0.18) !important;
-    border-radius: 12px !important;
-    color: #fff !important; /* cor geral, mas é sobrescrita acima nos campos */
-  }
-
-  .h-title{font-size:34px;font-weight:900;margin:0;color:#1f2a44;}
-  .h-sub{margin-top:6px;color:#5a6780;}
-
-  .metric-row{
-    display:grid;
-    grid-template-columns:repeat(4,1fr);
-    gap:16px;
-    margin-top:18px;
-  }
-  .metric-card{
-    background: linear-gradient(180deg, #2b2f88 0%, #1b2462 100%);
-    border-radius:14px;
-    padding:14px 16px;
-    box-shadow:0 10px 22px rgba(0,0,0,0.18);
-    border:1px solid rgba(255,255,255,0.10);
-  }
-  .metric-label{color:rgba(255,255,255,0.75);font-size:13px;}
-  .metric-value{color:#fff;font-size:20px;font-weight:900;margin-top:6px;}
-
-  .panel{
-    background: rgba(255,255,255,0.88);
-    border: 1px solid rgba(100,120,170,0.20);
-    border-radius: 16px;
-    padding: 16px;
-    box-shadow: 0 10px 24px rgba(20,30,70,0.10);
-    margin-bottom: 14px;
-  }
-  .panel-title{
-    font-size:22px;
-    font-weight:900;
-    color:#4b46ff;
-    display:flex;
-    align-items:center;
-    gap:10px;
-    margin-bottom:10px;
-  }
-
-  .stTextInput label,
-  .stNumberInput label,
-  .stDateInput label,
-  .stSelectbox label{
-    color:#1f2433 !important;
-    font-weight:800 !important;
-    opacity:1 !important;
-  }
-
-  .stTextInput input,
-  .stNumberInput input,
-  .stDateInput input{
-    background:#ffffff !important;
-    color:#000000 !important;
-    font-weight:700 !important;
-    border: 1.5px solid rgba(60,70,170,0.35) !important;
-    border-radius: 12px !important;
-  }
-
-  .stTextInput input:focus,
-  .stNumberInput input:focus,
-  .stDateInput input:focus{
-    border: 2px solid #5a55ff !important;
-    box-shadow: 0 0 0 4px rgba(90,85,255,0.15) !important;
-  }
-
-  .stButton>button{
-    border-radius:12px;
-    padding:0.55rem 0.95rem;
-    font-weight:800;
-  }
-
-  div[data-testid="stDataFrame"]{border-radius:14px;overflow:hidden;}
-  div[data-testid="stVerticalBlockBorderWrapper"]{background:transparent!important;border:0!important;box-shadow:none!important;}
-  div[data-testid="stVerticalBlock"] > div:empty{display:none!important;}
-</style>
-"""
-st.markdown(CSS, unsafe_allow_html=True)
+# estilo.css é lido e compactado uma vez por processo; st.html com só <style>
+# vai para o container de eventos e não ocupa espaço na página. O <style>
+# (~3 KB) ainda é enviado ao navegador a cada rerun: o Streamlit não tem como
+# incluir uma folha de estilo na página uma vez só.
+@st.cache_resource(show_spinner=False)
+def css_compactado() -> str:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "estilo.css"), encoding="utf-8") as arq:
+        css = re.sub(r"/\*.*?\*/", "", arq.read(), flags=re.S)
+    css = re.sub(r"\s+", " ", css).strip()
+    return f"<style>{css}</style>"
+
+st.html(css_compactado())
 
 # ----------------------------
-# DB (SQLite)
+# OPÇÕES (catálogo em servico.py)
 # ----------------------------
-engine = create_engine("sqlite:///compras.db", future=True)
-
-def init_db():
-    with engine.begin() as conn:
-        conn.execute(text("""
-        CREATE TABLE IF NOT EXISTS compras (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            comprador TEXT NOT NULL,
-            data_compra TEXT NOT NULL,
-            fornecedor TEXT NOT NULL,
-            cidade_destino TEXT NOT NULL,
-            item TEXT NOT NULL,
-            quantidade REAL NOT NULL,
-            criado_em TEXT NOT NULL
-        );
-        """))
-
-def inserir_compra(comprador, data_compra, fornecedor, cidade_destino, item, quantidade):
-    with engine.begin() as conn:
-        conn.execute(
-            text("""
-                INSERT INTO compras (comprador, data_compra, fornecedor, cidade_destino, item, quantidade, criado_em)
-                VALUES (:comprador, :data_compra, :fornecedor, :cidade_destino, :item, :quantidade, :criado_em)
-            """),
-            {
-                "comprador": comprador.strip(),
-                "data_compra": str(data_compra),
-                "fornecedor": fornecedor.strip(),
-                "cidade_destino": cidade_destino.strip(),
-                "item": item.strip(),
-                "quantidade": float(quantidade),
-                "criado_em": datetime.now().isoformat(timespec="seconds"),
-            }
-        )
+LIMITE_OPCOES = 300  # acima disso o selectbox ganha busca por prefixo
 
-def deletar_compra(compra_id: int):
-    with engine.begin() as conn:
-        conn.execute(text("DELETE FROM compras WHERE id = :id"), {"id": compra_id})
+def selectbox_dimensao(container, rotulo: str, dimensao: str, *, todos: str | None = None, key: str):
+    """
+    Selectbox alimentado pelo catálogo. Com muitos valores, mostra antes um
+    campo de busca por prefixo e envia só as opções que casam.
+    """
+    valores = opcoes(dimensao)
+    if len(valores) > LIMITE_OPCOES:
+        prefixo = container.text_input(f"Buscar {rotulo.lower()}", key=f"{key}_busca", placeholder="Digite o início do nome")
+        valores = opcoes(dimensao, prefixo.strip(), limite=LIMITE_OPCOES)
+        selecionado = st.session_state.get(key)
+        if selecionado and selecionado != todos and selecionado not in valores:
+            valores = [selecionado] + valores
+    if todos is not None:
+        valores = [todos] + valores
+    return container.selectbox(rotulo, valores, key=key)
 
-def carregar_df():
-    with engine.connect() as conn:
-        df_ = pd.read_sql(text("SELECT * FROM compras ORDER BY data_compra DESC, id DESC"), conn)
-    if not df_.empty:
-        df_["data_compra"] = pd.to_datetime(df_["data_compra"]).dt.date
-        df_["criado_em"] = pd.to_datetime(df_["criado_em"])
-    return df_
+# ----------------------------
+# ERROS DE VALIDAÇÃO (máscaras de validacao.py)
+# ----------------------------
+ERROS_LINHAS_MAX = 100  # linhas com erro mostradas de uma vez
+
+def mostrar_erros(df_origem: pd.DataFrame, validacao: Validacao):
+    """Tabela só com as linhas inválidas, as células com erro destacadas."""
+    ruins = ~validacao.ok
+    if not ruins.any():
+        return
+    total = int(ruins.sum())
+    linhas = df_origem.loc[ruins, validacao.erros.columns].head(ERROS_LINHAS_MAX)
+    linhas.index = linhas.index + 1  # numeração como no editor
+    estilos = pd.DataFrame(
+        np.where(validacao.erros.loc[ruins].head(ERROS_LINHAS_MAX), "background-color: #ffd6d6", ""),
+        index=linhas.index,
+        columns=linhas.columns,
+    )
+    st.caption(f"{total} linha(s) com erro" + (f"; mostrando as {ERROS_LINHAS_MAX} primeiras" if total > ERROS_LINHAS_MAX else ""))
+    st.dataframe(linhas.style.apply(lambda _: estilos, axis=None), use_container_width=True)
 
-init_db()
-df = carregar_df()
+# ----------------------------
+# GRADE (paginação no banco)
+# ----------------------------
+GRID_TAMANHO_PAGINA = 50
+GRID_PREFETCH = 50  # linhas extras buscadas junto, servem a próxima página
+GRID_LIMITE_CONSULTA = GRID_TAMANHO_PAGINA + GRID_PREFETCH + 1  # + a linha sentinela
+
+# Primeiro rerun do processo: catálogo, busca, KPIs e primeira página no cache compartilhado
+aquecer(GRID_LIMITE_CONSULTA)
+GRID_COLUNAS = ["id", "comprador", "data_compra", "fornecedor", "cidade_destino", "item", "quantidade", "criado_em"]
+INTERVALO_AVISO_ALTERACOES = 10  # segundos entre conferências da versão dos dados
+
+# Outra sessão (ou a API) gravou ou excluiu desde que a tela foi montada:
+# avisa em vez de rerodar sozinho, para não atrapalhar quem está preenchendo
+# o formulário. Só o fragmento roda no intervalo (uma consulta ao log).
+@st.fragment(run_every=INTERVALO_AVISO_ALTERACOES)
+def aviso_alteracoes(versao_exibida: int):
+    if versao_tabela() == versao_exibida:
+        return
+    c1, c2 = st.columns([5, 1])
+    c1.info("Há compras novas ou excluídas desde a última atualização da tela.")
+    if c2.button("🔄 Atualizar", key="aviso_atualizar", use_container_width=True):
+        st.rerun()
 
 # ----------------------------
-# PDF helper
+# TAREFAS EM SEGUNDO PLANO (fila em tarefas.py)
 # ----------------------------
-def gerar_pdf_pedido(
-    *,
-    numero_pedido: str,
-    data_pedido: date,
-    cnpj_faturamento: str,
-    solicitante: str,
-    fornecedor: str,
-    destino: str,
-    observacoes: str,
-    itens_df: pd.DataFrame,
-) -> bytes:
-    """
-    Gera PDF bonito (A4) com cabeçalho azul e tabela de itens.
-    itens_df precisa ter colunas: Material, Quantidade
-    """
-    buf = BytesIO()
-    doc = SimpleDocTemplate(
-        buf,
-        pagesize=A4,
-        leftMargin=18 * mm,
-        rightMargin=18 * mm,
-        topMargin=16 * mm,
-        bottomMargin=16 * mm,
-        title="Pedido de Compra",
-        author="Sistema de Compras",
-    )
+EXPORT_LIMITE_DIRETO = 100_000  # acima disso a exportação vira tarefa
 
-    styles = getSampleStyleSheet()
-    azul_escuro = colors.HexColor("#1f2a6d")
-    azul_medio = colors.HexColor("#2b2f88")
-    cinza_txt = colors.HexColor("#334155")
-
-    title_style = ParagraphStyle(
-        "TitleCustom",
-        parent=styles["Title"],
-        fontName="Helvetica-Bold",
-        fontSize=18,
-        textColor=azul_escuro,
-        spaceAfter=10,
-    )
-    label_style = ParagraphStyle(
-        "Label",
-        parent=styles["Normal"],
-        fontName="Helvetica-Bold",
-        fontSize=10,
-        textColor=azul_escuro,
-        leading=13,
-    )
-    value_style = ParagraphStyle(
-        "Value",
-        parent=styles["Normal"],
-        fontName="Helvetica",
-        fontSize=10,
-        textColor=cinza_txt,
-        leading=13,
-    )
+def _usuario_tarefas() -> str:
+    """Identifica a sessão para o limite de tarefas por usuário."""
+    return st.session_state.setdefault("usuario_tarefas", uuid.uuid4().hex)
 
-    elements = []
-
-    elements.append(Paragraph("PEDIDO DE COMPRA", title_style))
-
-    # Bloco de informações (2 colunas)
-    info_rows = [
-        [Paragraph("Nº do pedido:", label_style), Paragraph(numero_pedido or "-", value_style),
-         Paragraph("Data:", label_style), Paragraph(data_pedido.strftime("%d/%m/%Y"), value_style)],
-        [Paragraph("CNPJ faturamento:", label_style), Paragraph(cnpj_faturamento or "-", value_style),
-         Paragraph("Solicitante:", label_style), Paragraph(solicitante or "-", value_style)],
-        [Paragraph("Fornecedor:", label_style), Paragraph(fornecedor or "-", value_style),
-         Paragraph("Destino (cidade):", label_style), Paragraph(destino or "-", value_style)],
-    ]
-    info_table = Table(info_rows, colWidths=[32*mm, 63*mm, 28*mm, 55*mm])
-    info_table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, -1), colors.whitesmoke),
-        ("BOX", (0, 0), (-1, -1), 0.6, colors.HexColor("#cbd5e1")),
-        ("INNERGRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#e2e8f0")),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ("LEFTPADDING", (0, 0), (-1, -1), 8),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 8),
-        ("TOPPADDING", (0, 0), (-1, -1), 6),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(info_table)
-    elements.append(Spacer(1, 10))
-
-    if observacoes and observacoes.strip():
-        obs = observacoes.strip().replace("\n", "<br/>")
-        elements.append(Paragraph("Observações:", label_style))
-        elements.append(Paragraph(obs, value_style))
-        elements.append(Spacer(1, 10))
-
-    # Tabela de itens
-    data = [[
-        Paragraph("<b>Material</b>", ParagraphStyle("h", parent=value_style, textColor=colors.white)),
-        Paragraph("<b>Quantidade</b>", ParagraphStyle("h2", parent=value_style, textColor=colors.white)),
-    ]]
-
-    for _, r in itens_df.iterrows():
-        material = str(r.get("Material", "")).strip()
-        qtd = r.get("Quantidade", "")
-        data.append([Paragraph(material, value_style), Paragraph(str(qtd), value_style)])
-
-    t = Table(data, colWidths=[130*mm, 35*mm])
-
-    t_style = TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), azul_medio),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("ALIGN", (1, 1), (1, -1), "RIGHT"),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ("BOX", (0, 0), (-1, -1), 0.8, colors.HexColor("#94a3b8")),
-        ("INNERGRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#cbd5e1")),
-        ("LEFTPADDING", (0, 0), (-1, -1), 8),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 8),
-        ("TOPPADDING", (0, 0), (-1, -1), 6),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-    ])
-
-    # zebra striping
-    for i in range(1, len(data)):
-        bg = colors.whitesmoke if i % 2 == 1 else colors.HexColor("#eef2ff")
-        t_style.add("BACKGROUND", (0, i), (-1, i), bg)
-
-    t.setStyle(t_style)
-    elements.append(t)
-
-    doc.build(elements)
-    return buf.getvalue()
+def enviar_tarefa(tipo: str, descricao: str, funcao, **kwargs):
+    """Põe a tarefa na fila e reexecuta o app para o painel começar a acompanhar."""
+    try:
+        tarefas.enviar(_usuario_tarefas(), tipo, descricao, perfil.medido(f"tarefa_{tipo}")(funcao), **kwargs)
+    except tarefas.LimiteTarefas as e:
+        st.warning(str(e))
+        return
+    st.rerun()
 
 # ----------------------------
 # HEADER
@@ -367,10 +174,67 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# ----------------------------
+# ⏳ TAREFAS EM SEGUNDO PLANO
+# ----------------------------
+ICONES_TAREFA = {tarefas.FILA: "🕒", tarefas.RODANDO: "⏳", tarefas.PRONTA: "✅", tarefas.ERRO: "⚠️"}
+
+def _tem_pendentes(lista: list[dict]) -> bool:
+    return any(t["status"] in (tarefas.FILA, tarefas.RODANDO) for t in lista)
+
+_tarefas_pendentes = _tem_pendentes(tarefas.listar(_usuario_tarefas()))
+
+# Só consulta de novo (a cada 2s, sem rerodar o app) enquanto houver tarefa em andamento
+@st.fragment(run_every=2 if _tarefas_pendentes else None)
+def painel_tarefas():
+    usuario = _usuario_tarefas()
+    lista = tarefas.listar(usuario)
+    if _tarefas_pendentes and not _tem_pendentes(lista):
+        # Terminou: atualiza o app inteiro (dados importados) e para o polling
+        st.rerun()
+    if not lista:
+        return
+
+    st.markdown('<div class="panel">', unsafe_allow_html=True)
+    st.markdown('<div class="panel-title">⏳ Tarefas</div>', unsafe_allow_html=True)
+    for t in lista:
+        c1, c2, c3 = st.columns([4, 1.2, 0.4])
+        c1.markdown(f"{ICONES_TAREFA[t['status']]} **{t['descricao']}**")
+        if t["status"] in (tarefas.FILA, tarefas.RODANDO):
+            texto = t["mensagem"] or ("Na fila" if t["status"] == tarefas.FILA else "Rodando")
+            c1.progress(float(t["progresso"]), text=texto)
+            continue
+        if t["status"] == tarefas.ERRO:
+            c1.error(t["mensagem"] or "Falhou.")
+        elif t["mensagem"]:
+            c1.caption(t["mensagem"])
+        if t["arquivo"]:
+            c2.download_button(
+                "📥 Baixar",
+                data=functools.partial(tarefas.ler_arquivo, t["id"]),
+                file_name=t["nome_arquivo"],
+                mime=t["mime"],
+                key=f"tarefa_baixar_{t['id']}",
+            )
+        c3.button(
+            "✖",
+            key=f"tarefa_descartar_{t['id']}",
+            help="Descartar",
+            on_click=tarefas.descartar,
+            args=(t["id"], usuario),
+        )
+    st.markdown('</div>', unsafe_allow_html=True)
+
+painel_tarefas()
+
 # ----------------------------
 # ✅ ABAS
 # ----------------------------
-tab_controle, tab_pdf = st.tabs(["🧾 Controle de Compras", "🧾 Gerar pedido (PDF)"])
+# on_change="rerun" liga o .open de cada aba: as Análises só consultam o
+# banco quando estão abertas
+tab_controle, tab_pdf, tab_analises = st.tabs(
+    ["🧾 Controle de Compras", "🧾 Gerar pedido (PDF)", "📊 Análises"], key="aba", on_change="rerun"
+)
 
 # ======================================================================
 # ABA 1 - CONTROLE
@@ -380,11 +244,8 @@ with tab_controle:
     # SIDEBAR (Filtros)
     # ----------------------------
     st.sidebar.header("🔎 Filtros")
-    compradores = sorted(df["comprador"].unique().tolist()) if not df.empty else []
-    fornecedores = sorted(df["fornecedor"].unique().tolist()) if not df.empty else []
-
-    f_comprador = st.sidebar.selectbox("Comprador", ["(Todos)"] + compradores)
-    f_fornecedor = st.sidebar.selectbox("Fornecedor", ["(Todos)"] + fornecedores)
+    f_comprador = selectbox_dimensao(st.sidebar, "Comprador", "comprador", todos="(Todos)", key="f_comprador")
+    f_fornecedor = selectbox_dimensao(st.sidebar, "Fornecedor", "fornecedor", todos="(Todos)", key="f_fornecedor")
 
     st.sidebar.divider()
     st.sidebar.header("📅 Período")
@@ -392,24 +253,25 @@ with tab_controle:
     data_ini = col_a.date_input("De", value=None, format="DD/MM/YYYY")
     data_fim = col_b.date_input("Até", value=None, format="DD/MM/YYYY")
 
-    df_f = df.copy()
-    if not df_f.empty:
-        if f_comprador != "(Todos)":
-            df_f = df_f[df_f["comprador"] == f_comprador]
-        if f_fornecedor != "(Todos)":
-            df_f = df_f[df_f["fornecedor"] == f_fornecedor]
-        if data_ini is not None:
-            df_f = df_f[df_f["data_compra"] >= data_ini]
-        if data_fim is not None:
-            df_f = df_f[df_f["data_compra"] <= data_fim]
+    filtros = FiltrosCompras(
+        comprador=None if f_comprador == "(Todos)" else f_comprador,
+        fornecedor=None if f_fornecedor == "(Todos)" else f_fornecedor,
+        data_ini=data_ini,
+        data_fim=data_fim,
+    )
+    # Versão dos dados: chave dos resultados compartilhados, da página
+    # pré-carregada e das exportações
+    versao = versao_tabela()
+    aviso_alteracoes(versao)
 
     # ----------------------------
     # KPIs
     # ----------------------------
-    total_registros = len(df_f)
-    total_itens = float(df_f["quantidade"].sum()) if not df_f.empty else 0.0
-    forn_unicos = df_f["fornecedor"].nunique() if not df_f.empty else 0
-    itens_unicos = df_f["item"].nunique() if not df_f.empty else 0
+    kpis = kpis_compras(filtros, versao)
+    total_registros = kpis["registros"]
+    total_itens = kpis["quantidade"]
+    forn_unicos = kpis["fornecedores"]
+    itens_unicos = kpis["itens"]
 
     st.markdown(f"""
     <div class="metric-row">
@@ -511,31 +373,31 @@ with tab_controle:
 
         # ===== SALVAR =====
         if salvar:
-            erros = False
-
-            if not str(st.session_state.get("comprador", "")).strip():
-                erros = True
-            if not str(st.session_state.get("fornecedor", "")).strip():
-                erros = True
-            if not str(st.session_state.get("cidade_destino", "")).strip():
-                erros = True
-
-            for item, qtd in zip(itens, quantidades):
-                if not str(item).strip() or float(qtd) <= 0:
-                    erros = True
+            compra = validar_compras(pd.DataFrame({
+                "comprador": st.session_state.get("comprador"),
+                "data_compra": st.session_state.get("data_compra"),
+                "fornecedor": st.session_state.get("fornecedor"),
+                "cidade_destino": st.session_state.get("cidade_destino"),
+                "item": itens,
+                "quantidade": quantidades,
+            }))
+            erros = not compra.ok.all()
 
             if erros:
                 st.error("Preencha comprador, fornecedor, cidade destino e todos os itens com quantidade maior que 0.")
+                itens_ruins = compra.erros[["item", "quantidade"]].any(axis=1)
+                if itens_ruins.any():
+                    st.caption("Revise: " + ", ".join(f"Item {n + 1}" for n in itens_ruins[itens_ruins].index))
             else:
-                for item, qtd in zip(itens, quantidades):
-                    inserir_compra(
-                        st.session_state["comprador"],
-                        st.session_state["data_compra"],
-                        st.session_state["fornecedor"],
-                        st.session_state["cidade_destino"],
-                        item,
-                        qtd,
-                    )
+                inserir_compras_lote(
+                    {
+                        "comprador": st.session_state["comprador"],
+                        "data_compra": st.session_state["data_compra"],
+                        "fornecedor": st.session_state["fornecedor"],
+                        "cidade_destino": st.session_state["cidade_destino"],
+                    },
+                    zip(itens, quantidades),
+                )
 
                 st.success("Compra salva!")
                 st.session_state["_limpar_form"] = True
@@ -550,15 +412,108 @@ with tab_controle:
         st.markdown('<div class="panel">', unsafe_allow_html=True)
         st.markdown('<div class="panel-title">📋 Compras</div>', unsafe_allow_html=True)
 
-        if df_f.empty:
+        termo_busca = st.text_input(
+            "🔎 Buscar", placeholder="item, fornecedor ou cidade (ex.: cabo flexível recife)", key="busca",
+        )
+        if termo_busca.strip():
+            # Busca por texto (índice FTS5): em todas as compras, sem os filtros da sidebar
+            if st.session_state.get("busca_termo") != termo_busca:
+                st.session_state["busca_termo"] = termo_busca
+                st.session_state["busca_pagina"] = 0
+            pagina_busca = st.session_state["busca_pagina"]
+            resultado = buscar(termo_busca, pagina_busca, GRID_TAMANHO_PAGINA)
+
+            if resultado is None or resultado.linhas.empty:
+                st.info("Nada encontrado para essa busca.")
+            else:
+                if resultado.correcao:
+                    st.caption(f"Nada para “{termo_busca}”; mostrando resultados para “{resultado.correcao}”.")
+                with perfil.medir("st.dataframe"):
+                    st.dataframe(
+                        resultado.linhas[GRID_COLUNAS],
+                        use_container_width=True,
+                        hide_index=True,
+                        height=220,
+                        column_config={"data_compra": st.column_config.DateColumn(format="DD/MM/YYYY")},
+                    )
+                ini = pagina_busca * GRID_TAMANHO_PAGINA + 1
+                fim = ini + len(resultado.linhas) - 1
+                if resultado.ranqueada:
+                    st.caption(f"Mostrando {ini}–{fim} de {resultado.total} resultados, por relevância")
+                else:
+                    st.caption(
+                        f"Mostrando {ini}–{fim} de mais de {BUSCA_RANQUEAR_ATE} resultados, "
+                        "os mais recentes primeiro (refine a busca para ordenar por relevância)"
+                    )
+
+            def _busca_mudar_pagina(delta):
+                st.session_state["busca_pagina"] = max(0, st.session_state["busca_pagina"] + delta)
+
+            tem_proxima = resultado is not None and len(resultado.linhas) == GRID_TAMANHO_PAGINA and (
+                not resultado.ranqueada or (pagina_busca + 1) * GRID_TAMANHO_PAGINA < resultado.total
+            )
+            n1, n2 = st.columns(2)
+            n1.button("◀ Anterior", key="busca_anterior", on_click=_busca_mudar_pagina, args=(-1,),
+                      disabled=pagina_busca == 0, use_container_width=True)
+            n2.button("Próxima ▶", key="busca_proxima", on_click=_busca_mudar_pagina, args=(1,),
+                      disabled=not tem_proxima, use_container_width=True)
+
+        elif total_registros == 0:
             st.info("Sem registros para mostrar com os filtros atuais.")
         else:
-            st.dataframe(
-                df_f[["id", "comprador", "data_compra", "fornecedor", "cidade_destino", "item", "quantidade", "criado_em"]],
-                use_container_width=True,
-                hide_index=True,
-                height=220,
-            )
+            # Estado da paginação: chaves de início de cada página já visitada.
+            # Qualquer mudança de filtro volta para a primeira página.
+            if st.session_state.get("grid_filtros") != filtros:
+                st.session_state["grid_filtros"] = filtros
+                st.session_state["grid_cursores"] = [None]
+                st.session_state.pop("grid_prefetch", None)
+            cursores = st.session_state["grid_cursores"]
+            pagina = len(cursores) - 1
+
+            # Usa a página pré-carregada na navegação anterior, se ainda válida.
+            # A busca traz a página + a janela de prefetch + 1 linha sentinela,
+            # que indica se existe página seguinte.
+            chave = (filtros, cursores[-1], versao)
+            pre = st.session_state.get("grid_prefetch")
+            if pre is not None and pre[0] == chave:
+                _, bloco, fim_dados = pre
+            else:
+                bloco = pagina_compras(filtros, cursores[-1], GRID_LIMITE_CONSULTA, versao)
+                fim_dados = len(bloco) < GRID_LIMITE_CONSULTA
+
+            pagina_df = bloco.iloc[:GRID_TAMANHO_PAGINA]
+            resto = bloco.iloc[GRID_TAMANHO_PAGINA:]
+            proxima = None
+            if not resto.empty:
+                ultima = pagina_df.iloc[-1]
+                proxima = (data_para_dias(ultima["data_compra"].date()), int(ultima["pedido_id"]), int(ultima["id"]))
+                # Só guarda o resto se ele cobre a próxima página inteira
+                if len(resto) > GRID_TAMANHO_PAGINA or fim_dados:
+                    st.session_state["grid_prefetch"] = ((filtros, proxima, versao), resto, fim_dados)
+
+            with perfil.medir("st.dataframe"):
+                st.dataframe(
+                    pagina_df[GRID_COLUNAS],
+                    use_container_width=True,
+                    hide_index=True,
+                    height=220,
+                    column_config={"data_compra": st.column_config.DateColumn(format="DD/MM/YYYY")},
+                )
+
+            ini = pagina * GRID_TAMANHO_PAGINA + 1
+            fim = ini + len(pagina_df) - 1
+            st.caption(f"Mostrando {ini}–{fim} de {total_registros} registros")
+
+            def _grid_anterior():
+                if len(st.session_state["grid_cursores"]) > 1:
+                    st.session_state["grid_cursores"].pop()
+
+            def _grid_proxima(chave_proxima):
+                st.session_state["grid_cursores"].append(chave_proxima)
+
+            n1, n2 = st.columns(2)
+            n1.button("◀ Anterior", on_click=_grid_anterior, disabled=pagina == 0, use_container_width=True)
+            n2.button("Próxima ▶", on_click=_grid_proxima, args=(proxima,), disabled=proxima is None, use_container_width=True)
 
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -568,36 +523,65 @@ with tab_controle:
         st.markdown('<div class="panel">', unsafe_allow_html=True)
         st.markdown('<div class="panel-title">⬇️ Exportar</div>', unsafe_allow_html=True)
 
-        if df_f.empty:
+        if total_registros == 0:
             st.info("Sem dados para exportar com os filtros atuais.")
         else:
-            df_xlsx = df_f.rename(columns={
-                "comprador": "Comprador",
-                "data_compra": "Data do pedido",
-                "fornecedor": "Fornecedor",
-                "cidade_destino": "Cidade destino",
-                "item": "Item",
-                "quantidade": "Quantidade",
-            })[["Comprador", "Data do pedido", "Fornecedor", "Cidade destino", "Item", "Quantidade"]].copy()
-
-            df_xlsx["Data do pedido"] = pd.to_datetime(df_xlsx["Data do pedido"]).dt.strftime("%d/%m/%Y")
-
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                df_xlsx.to_excel(writer, index=False, sheet_name="Compras")
-                ws = writer.sheets["Compras"]
-                ws.column_dimensions["A"].width = 18
-                ws.column_dimensions["B"].width = 16
-                ws.column_dimensions["C"].width = 28
-                ws.column_dimensions["D"].width = 22
-                ws.column_dimensions["E"].width = 30
-                ws.column_dimensions["F"].width = 12
-
-            st.download_button(
-                "📥 Baixar Excel",
-                data=output.getvalue(),
-                file_name="compras.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            # Até EXPORT_LIMITE_DIRETO linhas o arquivo é gerado no clique do
+            # download (direto do cursor para um arquivo temporário) e fica em
+            # disco até os filtros ou os dados mudarem; acima disso vira tarefa.
+            formatos = list(FORMATOS)
+            if total_registros > LIMITE_LINHAS_XLSX:
+                formatos.remove("xlsx")
+                st.caption("Volume acima do limite do Excel: exporte em CSV ou Parquet.")
+            formato = st.radio(
+                "Formato",
+                formatos,
+                format_func=lambda f: FORMATOS[f][0],
+                horizontal=True,
+                key="export_formato",
+            )
+            rotulo, extensao, mime = FORMATOS[formato]
+            if total_registros > EXPORT_LIMITE_DIRETO:
+                if st.button(f"⚙️ Gerar {rotulo} em segundo plano", use_container_width=True):
+                    enviar_tarefa(
+                        "exportacao",
+                        f"Exportação {rotulo} ({total_registros} linhas)",
+                        tarefa_exportar(filtros, formato, total_registros),
+                        nome_arquivo=f"compras.{extensao}",
+                        mime=mime,
+                    )
+            else:
+                st.download_button(
+                    f"📥 Baixar {rotulo}",
+                    data=functools.partial(
+                        ler_export, filtros, versao, formato
+                    ),
+                    file_name=f"compras.{extensao}",
+                    mime=mime,
+                    use_container_width=True,
+                )
+
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        # ----------------------------
+        # Importar CSV / Excel
+        # ----------------------------
+        st.markdown('<div class="panel">', unsafe_allow_html=True)
+        st.markdown('<div class="panel-title">📤 Importar planilha</div>', unsafe_allow_html=True)
+        st.caption("Colunas: Comprador, Data do pedido, Fornecedor, Cidade destino, Item, Quantidade.")
+
+        arquivo_import = st.file_uploader("Arquivo CSV ou Excel", type=["csv", "xlsx"], key="arquivo_import")
+        if arquivo_import is not None and st.button("📤 Importar", use_container_width=True):
+            # A tarefa roda depois deste rerun: o upload vai para um arquivo temporário
+            fd, caminho_import = tempfile.mkstemp(suffix=os.path.splitext(arquivo_import.name)[1])
+            with os.fdopen(fd, "wb") as arq:
+                arq.write(arquivo_import.getbuffer())
+            enviar_tarefa(
+                "importacao",
+                f"Importação de {arquivo_import.name}",
+                tarefa_importar(caminho_import, arquivo_import.name),
+                nome_arquivo="importacao_rejeitadas.csv",
+                mime="text/csv",
             )
 
         st.markdown('</div>', unsafe_allow_html=True)
@@ -608,7 +592,7 @@ with tab_controle:
         st.markdown('<div class="panel">', unsafe_allow_html=True)
         st.markdown('<div class="panel-title">🗑️ Excluir um registro</div>', unsafe_allow_html=True)
 
-        if df_f.empty:
+        if total_registros == 0:
             st.info("Sem registros para excluir.")
         else:
             id_del = st.number_input("ID para excluir", min_value=1, step=1)
@@ -626,15 +610,15 @@ with tab_pdf:
     st.markdown('<div class="panel">', unsafe_allow_html=True)
     st.markdown('<div class="panel-title">🧾 Gerar pedido de compra (PDF)</div>', unsafe_allow_html=True)
 
-    if df.empty:
+    if not opcoes("fornecedor"):
         st.info("Ainda não há compras lançadas para gerar um pedido.")
         st.markdown('</div>', unsafe_allow_html=True)
     else:
         # Seletores para puxar itens lançados
         c1, c2, c3 = st.columns(3)
-        fornecedor_sel = c1.selectbox("Fornecedor", sorted(df["fornecedor"].unique().tolist()))
-        cidade_base = c2.selectbox("Destino (cidade) - baseado nos lançamentos", sorted(df["cidade_destino"].unique().tolist()))
-        comprador_padrao = c3.selectbox("Solicitante (padrão)", sorted(df["comprador"].unique().tolist()))
+        fornecedor_sel = selectbox_dimensao(c1, "Fornecedor", "fornecedor", key="pdf_fornecedor")
+        cidade_base = selectbox_dimensao(c2, "Destino (cidade) - baseado nos lançamentos", "cidade_destino", key="pdf_cidade")
+        comprador_padrao = selectbox_dimensao(c3, "Solicitante (padrão)", "comprador", key="pdf_comprador")
 
         c4, c5, c6 = st.columns(3)
         periodo_ini = c4.date_input("Considerar lançamentos - De", value=None, format="DD/MM/YYYY")
@@ -652,56 +636,31 @@ with tab_pdf:
         destino_manual = st.text_input("Destino (cidade) - no PDF (manual)", value=cidade_base)
         observacoes = st.text_area("Observações (opcional)", placeholder="Ex.: Entregar até dia X, faturar para CNPJ Y, etc.", height=90)
 
-        # Filtra base do pedido
-        base = df.copy()
-        base = base[(base["fornecedor"] == fornecedor_sel) & (base["cidade_destino"] == cidade_base)]
-        if periodo_ini is not None:
-            base = base[base["data_compra"] >= periodo_ini]
-        if periodo_fim is not None:
-            base = base[base["data_compra"] <= periodo_fim]
+        # Itens do fornecedor/destino no período, já somados (rollup diário)
+        pedido_df = itens_pedido_rollup(fornecedor_sel, cidade_base, periodo_ini, periodo_fim)
 
-        if base.empty:
+        if pedido_df.empty:
             st.warning("Não encontrei lançamentos com esse fornecedor/destino (e período). Ajuste os filtros.")
             st.markdown('</div>', unsafe_allow_html=True)
         else:
-            # Agrupa itens somando quantidades
-            pedido_df = (
-                base.groupby("item", as_index=False)["quantidade"]
-                .sum()
-                .rename(columns={"item": "Material", "quantidade": "Quantidade"})
-                .sort_values("Material")
-                .reset_index(drop=True)
-            )
 
             st.write("**Itens do pedido (você pode editar antes de gerar o PDF):**")
-            pedido_edit = st.data_editor(
-                pedido_df,
-                use_container_width=True,
-                hide_index=True,
-                num_rows="dynamic",
-            )
+            with perfil.medir("st.data_editor"):
+                pedido_edit = st.data_editor(
+                    pedido_df,
+                    use_container_width=True,
+                    hide_index=True,
+                    num_rows="dynamic",
+                )
 
-            # Validação simples
-            def _pedido_ok(df_items: pd.DataFrame) -> bool:
-                if df_items is None or df_items.empty:
-                    return False
-                if "Material" not in df_items.columns or "Quantidade" not in df_items.columns:
-                    return False
-                for _, r in df_items.iterrows():
-                    if not str(r.get("Material", "")).strip():
-                        return False
-                    try:
-                        if float(r.get("Quantidade", 0)) <= 0:
-                            return False
-                    except Exception:
-                        return False
-                return True
-
-            if not _pedido_ok(pedido_edit):
+            # Validação vetorizada (validacao.py): roda a cada edição, mesmo em pedidos grandes
+            itens_validos = validar_itens(pedido_edit)
+            if pedido_edit.empty or not itens_validos.ok.all():
                 st.error("Revise os itens: 'Material' não pode ficar vazio e 'Quantidade' precisa ser maior que 0.")
+                mostrar_erros(pedido_edit, itens_validos)
                 st.markdown('</div>', unsafe_allow_html=True)
             else:
-                pdf_bytes = gerar_pdf_pedido(
+                campos_pdf = dict(
                     numero_pedido=numero_pedido.strip(),
                     data_pedido=data_pedido,
                     cnpj_faturamento=cnpj_faturamento.strip(),
@@ -709,17 +668,124 @@ with tab_pdf:
                     fornecedor=fornecedor_sel,
                     destino=destino_manual.strip(),
                     observacoes=observacoes.strip(),
-                    itens_df=pedido_edit,
+                    itens_df=itens_validos.valores,
                 )
 
-                nome_arquivo = f"pedido_{fornecedor_sel}_{destino_manual}_{data_pedido.strftime('%Y-%m-%d')}.pdf"
-                nome_arquivo = nome_arquivo.replace(" ", "_").replace("/", "-")
+                # O PDF só é montado quando pedido; se esses mesmos dados já
+                # geraram um PDF antes, ele vem do cache.
+                pdf_bytes = obter_pdf_pedido(campos_pdf)
+                if pdf_bytes is None and st.button("⚙️ Gerar PDF"):
+                    with st.spinner("Gerando PDF..."):
+                        pdf_bytes = obter_pdf_pedido(campos_pdf, gerar=True)
+
+                if pdf_bytes is not None:
+                    st.download_button(
+                        "📄 Baixar Pedido (PDF)",
+                        data=pdf_bytes,
+                        file_name=nome_arquivo_pdf(fornecedor_sel, destino_manual, data_pedido),
+                        mime="application/pdf",
+                    )
 
-                st.download_button(
-                    "📄 Baixar Pedido (PDF)",
-                    data=pdf_bytes,
-                    file_name=nome_arquivo,
-                    mime="application/pdf",
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        # ----------------------------
+        # PEDIDOS EM LOTE (ZIP)
+        # ----------------------------
+        st.markdown('<div class="panel">', unsafe_allow_html=True)
+        st.markdown('<div class="panel-title">📦 Pedidos em lote (ZIP)</div>', unsafe_allow_html=True)
+        st.caption(
+            "Um pedido por fornecedor + destino, com os lançamentos do período acima. "
+            "Usa data, CNPJ, solicitante e observações preenchidos acima; "
+            "o nº do pedido, se informado, ganha um sufixo sequencial."
+        )
+
+        if st.button("📦 Gerar pedidos (ZIP)"):
+            pedidos = pedidos_em_lote(
+                itens_lote_rollup(periodo_ini, periodo_fim),
+                numero_pedido=numero_pedido.strip(),
+                data_pedido=data_pedido,
+                cnpj_faturamento=cnpj_faturamento.strip(),
+                solicitante=solicitante.strip(),
+                observacoes=observacoes.strip(),
+            )
+
+            if not pedidos:
+                st.info("Sem lançamentos no período para gerar pedidos.")
+            else:
+                enviar_tarefa(
+                    "pdf_lote",
+                    f"{len(pedidos)} pedidos em PDF (ZIP)",
+                    tarefa_pedidos_zip(pedidos),
+                    nome_arquivo=f"pedidos_{data_pedido.strftime('%Y-%m-%d')}.zip",
+                    mime="application/zip",
                 )
 
         st.markdown('</div>', unsafe_allow_html=True)
+
+# ======================================================================
+# ABA 3 - 📊 ANÁLISES (agregadas no banco, consultas.py)
+# ======================================================================
+AGRUPAMENTO_ROTULOS = {"mes": "Mês", "semana": "Semana"}
+
+def _series(df_serie: pd.DataFrame, coluna: str, valor: str) -> pd.DataFrame:
+    """Uma coluna por série (fornecedor, comprador) e uma linha por período."""
+    return df_serie.pivot(index="periodo", columns=coluna, values=valor).fillna(0)
+
+if tab_analises.open:
+    with tab_analises:
+        st.markdown('<div class="panel">', unsafe_allow_html=True)
+        st.markdown('<div class="panel-title">📊 Análises</div>', unsafe_allow_html=True)
+
+        c1, c2, c3 = st.columns([2, 1, 1])
+        agrupamento = c1.radio(
+            "Agrupar por", list(AGRUPAMENTO_ROTULOS), format_func=AGRUPAMENTO_ROTULOS.get,
+            horizontal=True, key="analise_agrupamento",
+        )
+        analise_ini = c2.date_input("De", value=None, format="DD/MM/YYYY", key="analise_ini")
+        analise_fim = c3.date_input("Até", value=None, format="DD/MM/YYYY", key="analise_fim")
+
+        total = volume_total(agrupamento, analise_ini, analise_fim)
+        if total.empty:
+            st.info("Sem compras no período.")
+        else:
+            st.subheader("Quantidade comprada")
+            st.bar_chart(total, x="periodo", y="quantidade", x_label="", y_label="Quantidade")
+
+            g1, g2 = st.columns(2)
+            with g1:
+                st.subheader("Maiores fornecedores")
+                fornecedores_serie = volume_fornecedores(agrupamento, analise_ini, analise_fim)
+                st.line_chart(_series(fornecedores_serie, "fornecedor", "quantidade"), x_label="", y_label="Quantidade")
+            with g2:
+                st.subheader("Pedidos por comprador")
+                compradores_serie = atividade_compradores(agrupamento, analise_ini, analise_fim)
+                st.line_chart(_series(compradores_serie, "comprador", "pedidos"), x_label="", y_label="Pedidos")
+
+            st.subheader("Itens mais comprados por cidade")
+            cidade_analise = selectbox_dimensao(st, "Cidade de destino", "cidade_destino", key="analise_cidade")
+            if cidade_analise:
+                itens = itens_cidade(cidade_analise, analise_ini, analise_fim)
+                st.bar_chart(itens, x="item", y="quantidade", horizontal=True, sort="-quantidade", x_label="Quantidade", y_label="")
+
+        st.markdown('</div>', unsafe_allow_html=True)
+
+# ----------------------------
+# ⏱️ DESEMPENHO (só admin: ?admin=<COMPRAS_ADMIN_TOKEN>)
+# ----------------------------
+if perfil.admin_liberado(st.query_params):
+    with st.sidebar.expander("⏱️ Desempenho"):
+        ultimo = st.session_state.get("perfil_ultimo_rerun")
+        if ultimo:
+            st.caption("Último rerun desta sessão (ms)")
+            st.dataframe(
+                pd.DataFrame(list(ultimo.items()), columns=["etapa", "ms"]).round(1),
+                hide_index=True,
+            )
+        st.caption("Processo, todas as sessões (ms)")
+        st.dataframe(pd.DataFrame(perfil.resumo_etapas()), hide_index=True)
+        st.caption("Consultas SQL mais lentas (p95, ms)")
+        st.dataframe(pd.DataFrame(perfil.resumo_sql()), hide_index=True)
+        if perfil.ARQUIVO_LOG:
+            st.caption(f"Log: {perfil.ARQUIVO_LOG} (resumo: python perfil.py {perfil.ARQUIVO_LOG})")
+
+st.session_state["perfil_ultimo_rerun"] = perfil.fim_rerun(_usuario_tarefas())
@@ -0,0 +1 @@
+"""Benchmarks do sistema de compras (rodar a partir da raiz do repositório)."""
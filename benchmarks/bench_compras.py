@@ -0,0 +1,278 @@
+"""
+Benchmarks das operações de leitura do app, sem Streamlit, em bancos
+sintéticos de 10k, 100k e 1M linhas (benchmarks/dados.py).
+
+Casos: versao_tabela, KPIs e primeira página da grade (sem filtro, por
+fornecedor e por período), KPIs já calculados por outra sessão, itens do
+pedido e agrupamento do lote na aba de PDF, busca por texto (genérica,
+ranqueada e com correção), séries da aba Análises (por mês e por
+semana), exportação (Excel, CSV, Parquet) e gerar_pdf_pedido.
+
+Cada tamanho roda num processo próprio (o engine é do processo); os bancos
+gerados ficam em --pasta e são reaproveitados.
+O resultado vai para um JSON que pode ser comparado com o de outra versão:
+
+    python -m benchmarks.bench_compras [--tamanhos 10000 100000] [--saida bench.json]
+    python -m benchmarks.bench_compras --comparar antes.json depois.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+TAMANHOS = [10_000, 100_000, 1_000_000]
+
+
+# ----------------------------
+# Casos (rodam no processo filho)
+# ----------------------------
+def _casos():
+    """Lista de (nome, função); cada função devolve um dict de detalhes (ou None)."""
+    import consultas
+    import servico
+    from sqlalchemy import text
+
+    from consultas import FiltrosCompras
+    from db import engine
+    from esquema import dias_para_data
+    from exportar import exportar
+    from pedido_pdf import gerar_pdf_pedido, pedidos_em_lote
+
+    servico.iniciar()  # bancos gerados por versões antigas recebem as migrações novas
+    # Fornecedor com mais linhas, a cidade em que ele mais aparece e a última data
+    with engine.connect() as conn:
+        fornecedor_id, fornecedor = conn.execute(text("""
+            SELECT f.id, f.nome FROM compras_diarias r JOIN fornecedores f ON f.id = r.fornecedor_id
+            GROUP BY f.id, f.nome ORDER BY SUM(r.linhas) DESC, f.nome LIMIT 1
+        """)).one()
+        cidade = conn.execute(text("""
+            SELECT d.nome FROM compras_diarias r JOIN cidades d ON d.id = r.cidade_id
+            WHERE r.fornecedor_id = :f
+            GROUP BY d.id, d.nome ORDER BY SUM(r.linhas) DESC, d.nome LIMIT 1
+        """), {"f": fornecedor_id}).scalar_one()
+        ultima = dias_para_data(conn.execute(text("SELECT MAX(data_compra) FROM pedidos")).scalar_one())
+    filtros = {
+        "todos": FiltrosCompras(),
+        "fornecedor": FiltrosCompras(fornecedor=fornecedor),
+        "periodo": FiltrosCompras(data_ini=ultima - timedelta(days=90), data_fim=ultima),
+    }
+    mes = (ultima - timedelta(days=30), ultima)
+
+    # KPIs e páginas são compartilhados por versão dos dados: sem descartar,
+    # só a primeira repetição iria ao banco
+    def kpis(f):
+        def rodar():
+            consultas.descartar_resultados()
+            return consultas.kpis_compras(f)
+        return rodar
+
+    def kpis_compartilhado():
+        return consultas.kpis_compras(filtros["todos"])
+
+    def pagina(f):
+        def rodar():
+            consultas.descartar_resultados()
+            return {"linhas": len(consultas.pagina_compras(f, None, 100))}
+        return rodar
+
+    def versao():
+        return {"versao": consultas.versao_tabela()}
+
+    def analise(funcao, *args):
+        def rodar():
+            consultas.descartar_resultados()
+            return {"linhas": len(funcao(*args))}
+        return rodar
+
+    def itens_pedido():
+        return {"itens": len(consultas.itens_pedido_rollup(fornecedor, cidade, None, None))}
+
+    def pedidos_lote():
+        pedidos = pedidos_em_lote(
+            consultas.itens_lote_rollup(*mes), numero_pedido="PC-BENCH", data_pedido=ultima,
+            cnpj_faturamento="", solicitante="Benchmark", observacoes="",
+        )
+        return {"pedidos": len(pedidos)}
+
+    def busca(texto):
+        def rodar():
+            resultado = servico.buscar(texto)
+            return {"total": resultado.total, "ranqueada": resultado.ranqueada}
+        return rodar
+
+    def exportacao(formato):
+        def rodar():
+            arq = io.BytesIO()
+            exportar(consultas.iter_lotes_export(filtros["todos"]), formato, arq)
+            return {"bytes": arq.tell()}
+        return rodar
+
+    itens_pdf = consultas.itens_pedido_rollup(fornecedor, cidade, None, None)
+
+    def pdf():
+        conteudo = gerar_pdf_pedido(
+            numero_pedido="PC-BENCH", data_pedido=date(2026, 1, 1), cnpj_faturamento="00.000.000/0001-00",
+            solicitante="Benchmark", fornecedor=fornecedor, destino=cidade, observacoes="",
+            itens_df=itens_pdf,
+        )
+        return {"itens": len(itens_pdf), "bytes": len(conteudo)}
+
+    casos = [("versao_tabela", versao)]
+    for nome, f in filtros.items():
+        casos += [(f"kpis_{nome}", kpis(f)), (f"pagina_{nome}", pagina(f))]
+    casos += [
+        ("kpis_compartilhado", kpis_compartilhado),
+        ("itens_pedido", itens_pedido),
+        ("pedidos_lote", pedidos_lote),
+        ("busca_generica", busca("cimento")),
+        ("busca_ranqueada", busca(f"toner {cidade}")),
+        ("busca_corrigida", busca("hidraulco")),
+        ("analise_total_mes", analise(consultas.volume_total, "mes")),
+        ("analise_fornecedores_mes", analise(consultas.volume_fornecedores, "mes")),
+        ("analise_fornecedores_semana", analise(consultas.volume_fornecedores, "semana")),
+        ("analise_compradores_semana", analise(consultas.atividade_compradores, "semana")),
+        ("analise_itens_cidade", analise(consultas.itens_cidade, cidade)),
+        ("exportacao_xlsx", exportacao("xlsx")),
+        ("exportacao_csv", exportacao("csv")),
+        ("exportacao_parquet", exportacao("parquet")),
+        ("gerar_pdf_pedido", pdf),
+    ]
+    return casos
+
+
+def rodar_tamanho(repeticoes: int, filtro: list[str] | None) -> dict:
+    """Mede os casos no banco de COMPRAS_DATABASE_URL (processo filho)."""
+    resultados = {}
+    for nome, funcao in _casos():
+        if filtro and not any(f in nome for f in filtro):
+            continue
+        tempos, detalhes = [], None
+        for _ in range(repeticoes):
+            t0 = time.perf_counter()
+            detalhes = funcao()
+            tempos.append(time.perf_counter() - t0)
+        resultados[nome] = {
+            "min_s": round(min(tempos), 6),
+            "mediana_s": round(statistics.median(tempos), 6),
+            "max_s": round(max(tempos), 6),
+            **(detalhes or {}),
+        }
+    return {
+        "casos": resultados,
+        # KiB no Linux
+        "rss_max_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+# ----------------------------
+# Orquestração (processo pai)
+# ----------------------------
+def _banco(pasta: str, linhas: int, semente: int) -> str:
+    caminho = os.path.join(pasta, f"compras_bench_{linhas}_{semente}.db")
+    if not os.path.exists(caminho):
+        print(f"gerando {linhas} linhas em {caminho}...", file=sys.stderr)
+        try:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.dados", caminho, "--linhas", str(linhas), "--semente", str(semente)],
+                check=True,
+            )
+        except BaseException:
+            # Banco pela metade não pode ser reaproveitado na próxima rodada
+            if os.path.exists(caminho):
+                os.remove(caminho)
+            raise
+    return caminho
+
+
+def _versao() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(tamanhos, repeticoes: int, semente: int, pasta: str, filtro=None) -> dict:
+    relatorio = {
+        "versao": _versao(),
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "semente": semente,
+        "repeticoes": repeticoes,
+        "tamanhos": {},
+    }
+    for linhas in tamanhos:
+        banco = _banco(pasta, linhas, semente)
+        env = {**os.environ, "COMPRAS_DATABASE_URL": f"sqlite:///{banco}"}
+        cmd = [sys.executable, "-m", "benchmarks.bench_compras", "--filho", "--repeticoes", str(repeticoes)]
+        if filtro:
+            cmd += ["--casos", *filtro]
+        saida = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        if saida.returncode != 0:
+            sys.exit(f"falhou em {linhas} linhas:\n{saida.stderr}")
+        relatorio["tamanhos"][str(linhas)] = json.loads(saida.stdout)
+        _imprimir(linhas, relatorio["tamanhos"][str(linhas)])
+    return relatorio
+
+
+def _imprimir(linhas: int, resultado: dict):
+    print(f"\n{linhas} linhas (RSS máx. {resultado['rss_max_mb']} MB)")
+    print(f"{'caso':<24}{'min s':>10}{'mediana s':>12}")
+    for nome, r in resultado["casos"].items():
+        print(f"{nome:<24}{r['min_s']:>10.4f}{r['mediana_s']:>12.4f}")
+
+
+def comparar(antes: dict, depois: dict):
+    """Mediana de cada caso nas duas versões e a razão depois/antes."""
+    print(f"antes: {antes.get('versao')}  depois: {depois.get('versao')}")
+    print(f"{'linhas':>9} {'caso':<24}{'antes s':>10}{'depois s':>10}{'razão':>8}")
+    for linhas, resultado in depois["tamanhos"].items():
+        base = antes["tamanhos"].get(linhas, {}).get("casos", {})
+        for nome, r in resultado["casos"].items():
+            if nome not in base:
+                continue
+            a, d = base[nome]["mediana_s"], r["mediana_s"]
+            razao = f"{d / a:.2f}x" if a else "-"
+            print(f"{linhas:>9} {nome:<24}{a:>10.4f}{d:>10.4f}{razao:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--casos", nargs="+", help="só os casos cujo nome contém um destes trechos")
+    parser.add_argument("--pasta", default=os.path.join(tempfile.gettempdir(), "compras_bench"),
+                        help="onde ficam os bancos gerados")
+    parser.add_argument("--saida", default="bench_compras.json")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as a, open(args.comparar[1], encoding="utf-8") as d:
+            comparar(json.load(a), json.load(d))
+        return
+    if args.filho:
+        json.dump(rodar_tamanho(args.repeticoes, args.casos), sys.stdout)
+        return
+
+    os.makedirs(args.pasta, exist_ok=True)
+    relatorio = executar(args.tamanhos, args.repeticoes, args.semente, args.pasta, args.casos)
+    with open(args.saida, "w", encoding="utf-8") as arq:
+        json.dump(relatorio, arq, ensure_ascii=False, indent=2)
+    print(f"\nrelatório em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
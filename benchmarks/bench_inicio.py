@@ -0,0 +1,103 @@
+"""
+Tempo de subida e de rerun do app.py (Streamlit AppTest, sem navegador),
+com orçamento: sai com código 1 se algum limite for estourado, para rodar
+no CI ou antes de publicar uma versão.
+
+Mede num processo novo, no banco sintético de --linhas (benchmarks/dados.py):
+  - inicio: importação dos módulos + primeiro rerun (banco já migrado);
+  - rerun: mediana dos reruns seguintes (o que cada interação custa);
+  - e confere que ReportLab e openpyxl não foram importados: só o PDF e o
+    Excel (exportação / importação) os carregam.
+
+    python -m benchmarks.bench_inicio [--linhas 10000] [--reruns 10]
+        [--orcamento-inicio 4] [--orcamento-rerun 0.4]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_compras import _banco
+
+ORCAMENTO_INICIO_S = 4.0
+ORCAMENTO_RERUN_S = 0.4
+MODULOS_SOB_DEMANDA = ("reportlab", "openpyxl")
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def medir(reruns: int) -> dict:
+    """Roda no processo filho (COMPRAS_DATABASE_URL já aponta para o banco)."""
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.run()
+    inicio = time.perf_counter() - t0
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+    tempos = []
+    for _ in range(reruns):
+        t0 = time.perf_counter()
+        at.run()
+        tempos.append(time.perf_counter() - t0)
+    return {
+        "inicio_s": round(inicio, 3),
+        "rerun_mediana_s": round(statistics.median(tempos), 4),
+        "rerun_max_s": round(max(tempos), 4),
+        "carregados": [m for m in MODULOS_SOB_DEMANDA if m in sys.modules],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=10_000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--orcamento-inicio", type=float, default=ORCAMENTO_INICIO_S)
+    parser.add_argument("--orcamento-rerun", type=float, default=ORCAMENTO_RERUN_S)
+    parser.add_argument("--pasta", default=os.path.join(tempfile.gettempdir(), "compras_bench"),
+                        help="onde ficam os bancos gerados")
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        json.dump(medir(args.reruns), sys.stdout)
+        return
+
+    os.makedirs(args.pasta, exist_ok=True)
+    banco = _banco(args.pasta, args.linhas, args.semente)
+    env = {**os.environ, "COMPRAS_DATABASE_URL": f"sqlite:///{banco}"}
+    # Migrações fora da medição: no container elas rodam antes (python servico.py)
+    subprocess.run([sys.executable, "-c", "import servico; servico.iniciar()"], env=env, check=True)
+    saida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_inicio", "--filho", "--reruns", str(args.reruns)],
+        env=env, capture_output=True, text=True,
+    )
+    if saida.returncode != 0:
+        sys.exit(f"falhou:\n{saida.stderr}")
+    r = json.loads(saida.stdout.strip().splitlines()[-1])
+
+    falhas = []
+    if r["inicio_s"] > args.orcamento_inicio:
+        falhas.append(f"início {r['inicio_s']:.2f}s > {args.orcamento_inicio}s")
+    if r["rerun_mediana_s"] > args.orcamento_rerun:
+        falhas.append(f"rerun {r['rerun_mediana_s']:.3f}s > {args.orcamento_rerun}s")
+    if r["carregados"]:
+        falhas.append(f"importados sem uso: {', '.join(r['carregados'])}")
+
+    print(f"{args.linhas} linhas")
+    print(f"início (imports + 1º rerun)  {r['inicio_s']:.2f}s  (orçamento {args.orcamento_inicio}s)")
+    print(f"rerun (mediana / máx.)       {r['rerun_mediana_s']:.3f}s / {r['rerun_max_s']:.3f}s"
+          f"  (orçamento {args.orcamento_rerun}s)")
+    for falha in falhas:
+        print(f"ESTOURO: {falha}")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
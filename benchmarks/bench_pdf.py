@@ -0,0 +1,71 @@
+"""
+Tempo de gerar_pdf_pedido para pedidos de 100, 1k e 10k itens, comparado
+com o renderizador de referência (benchmarks/pdf_referencia.py, a versão
+antes do pedido_pdf.py) no mesmo pedido sintético.
+
+Uso (na raiz do repositório):
+    python -m benchmarks.bench_pdf [--repeticoes 3] [--tamanhos 100 1000 10000] [--sem-referencia]
+
+A referência leva ~20 s por repetição com 10k itens; --sem-referencia
+mede só a versão atual.
+"""
+import argparse
+import time
+from datetime import date
+
+import pandas as pd
+
+from benchmarks import pdf_referencia
+from pedido_pdf import gerar_pdf_pedido
+
+RENDERIZADORES = {"referencia": pdf_referencia.gerar_pdf_pedido, "atual": gerar_pdf_pedido}
+
+
+def itens_sinteticos(n: int) -> pd.DataFrame:
+    # 1 em cada 10 materiais é longo o bastante para quebrar linha
+    materiais = [
+        f"Material {i} " + ("com descrição longa que não cabe numa linha só da coluna" if i % 10 == 0 else "padrão")
+        for i in range(n)
+    ]
+    return pd.DataFrame({"Material": materiais, "Quantidade": [float(i % 17 + 1) for i in range(n)]})
+
+
+def medir(gerar, n: int, repeticoes: int) -> tuple[float, int]:
+    itens = itens_sinteticos(n)
+    melhor, tamanho = float("inf"), 0
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        pdf = gerar(
+            numero_pedido="PC-BENCH",
+            data_pedido=date(2026, 1, 1),
+            cnpj_faturamento="00.000.000/0001-00",
+            solicitante="Benchmark",
+            fornecedor="Fornecedor X",
+            destino="São Paulo",
+            observacoes="Pedido sintético",
+            itens_df=itens,
+        )
+        melhor = min(melhor, time.perf_counter() - t0)
+        tamanho = len(pdf)
+    return melhor, tamanho
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--sem-referencia", action="store_true", help="não mede o renderizador de referência")
+    args = parser.parse_args()
+    nomes = ["atual"] if args.sem_referencia else ["referencia", "atual"]
+
+    print(f"{'itens':>8} {'renderizador':>12} {'segundos':>10} {'bytes':>10} {'ganho':>7}")
+    for n in args.tamanhos:
+        tempos = {}
+        for nome in nomes:
+            tempos[nome], tamanho = medir(RENDERIZADORES[nome], n, args.repeticoes)
+            ganho = f"{tempos['referencia'] / tempos[nome]:.1f}x" if "referencia" in tempos else "-"
+            print(f"{n:>8} {nome:>12} {tempos[nome]:>10.3f} {tamanho:>10} {ganho:>7}")
+
+
+if __name__ == "__main__":
+    main()
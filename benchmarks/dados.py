@@ -0,0 +1,133 @@
+"""
+Gerador determinístico de compras sintéticas para os benchmarks.
+
+Mesma semente e mesmo tamanho = mesmo banco, linha por linha. As
+distribuições imitam o uso real:
+  - fornecedores e itens seguem uma cauda longa (Zipf): poucos concentram
+    a maior parte das linhas;
+  - cidades de destino também concentradas, compradores quase uniformes;
+  - datas espalhadas por ANOS anos, com menos lançamentos no fim de semana
+    e volume crescendo com o tempo;
+  - pedidos com vários itens (média ~4), quantidades log-normais.
+
+As linhas são gravadas pelo mesmo caminho da importação em lote
+(importar.gravar_bloco), então o rollup diário fica consistente.
+
+Uso (na raiz do repositório):
+    python -m benchmarks.dados compras_bench.db --linhas 100000 [--semente 42]
+"""
+import argparse
+import os
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+ANOS = 3
+FIM = date(2026, 1, 1)  # data fixa: o banco não depende do dia em que foi gerado
+ITENS_POR_PEDIDO = 4
+LOTE = 50_000
+
+CIDADES = [
+    "São Paulo", "Rio de Janeiro", "Belo Horizonte", "Curitiba", "Porto Alegre",
+    "Salvador", "Recife", "Fortaleza", "Goiânia", "Campinas", "Manaus", "Belém",
+    "Florianópolis", "Vitória",
+]
+MATERIAIS = [
+    "Cimento CP-II", "Areia média", "Brita 1", "Tijolo cerâmico", "Vergalhão CA-50",
+    "Tubo PVC", "Cabo flexível", "Disjuntor", "Luva de raspa", "Capacete", "Tinta acrílica",
+    "Parafuso sextavado", "Porca", "Arruela", "Chapa de aço", "Papel A4", "Toner",
+    "Óleo hidráulico", "Rolamento", "Correia em V", "Filtro de ar", "Lâmpada LED",
+]
+ESPECIFICACOES = ["", " 50kg", " 1/2\"", " 3/4\"", " 10mm", " 2,5mm²", " 18L", " M8", " M10", " tam. G"]
+
+
+def _zipf(rng: np.random.Generator, n: int, quantos: int, s: float) -> np.ndarray:
+    """Índices 0..quantos-1 com probabilidade proporcional a 1/(k+1)^s."""
+    pesos = 1.0 / np.arange(1, quantos + 1) ** s
+    return rng.choice(quantos, size=n, p=pesos / pesos.sum())
+
+
+def _nomes_itens(quantos: int) -> np.ndarray:
+    base = [m + e for m in MATERIAIS for e in ESPECIFICACOES]
+    return np.array([f"{base[i % len(base)]} ref. {i:05d}" for i in range(quantos)], dtype=object)
+
+
+def gerar_compras(linhas: int, semente: int = 42) -> pd.DataFrame:
+    """
+    Compras sintéticas já no formato da importação validada: colunas
+    comprador, data_compra (dias desde 1970), fornecedor, cidade_destino,
+    item, quantidade. Linhas do mesmo pedido ficam juntas.
+    """
+    rng = np.random.default_rng(semente)
+    n_fornecedores = int(min(5000, max(20, linhas // 200)))
+    n_itens = int(min(20000, max(200, linhas // 50)))
+    n_compradores = int(min(60, max(5, linhas // 20000)))
+
+    # Cabeçalhos: itens por pedido com média ITENS_POR_PEDIDO
+    por_pedido = rng.geometric(1 / ITENS_POR_PEDIDO, size=2 * (linhas // ITENS_POR_PEDIDO) + 10)
+    por_pedido = por_pedido[np.cumsum(por_pedido) - por_pedido < linhas]
+    n_pedidos = len(por_pedido)
+
+    fim = (FIM - date(1970, 1, 1)).days
+    dias = np.arange(fim - 365 * ANOS, fim)
+    peso_dia = np.where((dias + 3) % 7 >= 5, 0.3, 1.0)  # 1970-01-01 foi quinta-feira
+    peso_dia = peso_dia * np.linspace(0.6, 1.4, len(dias))  # crescimento ao longo dos anos
+    datas = rng.choice(dias, size=n_pedidos, p=peso_dia / peso_dia.sum())
+
+    fornecedores = np.array([f"Fornecedor {i:04d}" for i in range(n_fornecedores)], dtype=object)
+    compradores = np.array([f"Comprador {i:02d}" for i in range(n_compradores)], dtype=object)
+    cabecalhos = pd.DataFrame({
+        "comprador": compradores[rng.integers(0, n_compradores, n_pedidos)],
+        "data_compra": datas,
+        "fornecedor": fornecedores[_zipf(rng, n_pedidos, n_fornecedores, 1.1)],
+        "cidade_destino": np.array(CIDADES, dtype=object)[_zipf(rng, n_pedidos, len(CIDADES), 0.8)],
+    }).sort_values("data_compra", kind="stable", ignore_index=True)
+
+    compras = cabecalhos.loc[cabecalhos.index.repeat(por_pedido)].iloc[:linhas].reset_index(drop=True)
+    compras["item"] = _nomes_itens(n_itens)[_zipf(rng, len(compras), n_itens, 1.2)]
+    compras["quantidade"] = np.maximum(np.round(rng.lognormal(2.0, 1.0, len(compras)), 1), 0.1)
+    return compras
+
+
+def popular_banco(linhas: int, semente: int = 42, ao_progredir=None) -> dict:
+    """
+    Cria o esquema no banco de COMPRAS_DATABASE_URL e grava as compras
+    sintéticas em lotes de LOTE linhas. Importa db só aqui: quem chama
+    define a URL antes.
+    """
+    from db import engine
+    from esquema import DIM_TABELAS, init_db
+    from importar import gravar_bloco
+
+    init_db()
+    compras = gerar_compras(linhas, semente)
+    criado_em = int(pd.Timestamp(FIM).timestamp())
+    conhecidos = {dim: {} for dim in DIM_TABELAS}
+    pedidos = 0
+    inicio = time.perf_counter()
+    for ini in range(0, len(compras), LOTE):
+        with engine.begin() as conn:
+            pedidos += gravar_bloco(conn, compras.iloc[ini:ini + LOTE], conhecidos, criado_em)
+        if ao_progredir is not None:
+            ao_progredir(min(ini + LOTE, len(compras)), len(compras))
+    return {"linhas": len(compras), "pedidos": pedidos, "segundos": time.perf_counter() - inicio}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("banco", help="arquivo SQLite a criar")
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.banco):
+        parser.error(f"{args.banco} já existe")
+    os.environ["COMPRAS_DATABASE_URL"] = f"sqlite:///{args.banco}"
+    resumo = popular_banco(args.linhas, args.semente)
+    print(f"{resumo['linhas']} linhas em {resumo['pedidos']} pedidos ({resumo['segundos']:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+gerar_pdf_pedido como era antes de ir para o pedido_pdf.py (estilos
+montados a cada chamada, iterrows, um Paragraph por célula, uma faixa de
+zebra por linha), sem alterações. Serve de referência no bench_pdf.py.
+"""
+from datetime import date
+from io import BytesIO
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+
+def gerar_pdf_pedido(
+    *,
+    numero_pedido: str,
+    data_pedido: date,
+    cnpj_faturamento: str,
+    solicitante: str,
+    fornecedor: str,
+    destino: str,
+    observacoes: str,
+    itens_df: pd.DataFrame,
+) -> bytes:
+    """
+    Gera PDF bonito (A4) com cabeçalho azul e tabela de itens.
+    itens_df precisa ter colunas: Material, Quantidade
+    """
+    buf = BytesIO()
+    doc = SimpleDocTemplate(
+        buf,
+        pagesize=A4,
+        leftMargin=18 * mm,
+        rightMargin=18 * mm,
+        topMargin=16 * mm,
+        bottomMargin=16 * mm,
+        title="Pedido de Compra",
+        author="Sistema de Compras",
+    )
+
+    styles = getSampleStyleSheet()
+    azul_escuro = colors.HexColor("#1f2a6d")
+    azul_medio = colors.HexColor("#2b2f88")
+    cinza_txt = colors.HexColor("#334155")
+
+    title_style = ParagraphStyle(
+        "TitleCustom",
+        parent=styles["Title"],
+        fontName="Helvetica-Bold",
+        fontSize=18,
+        textColor=azul_escuro,
+        spaceAfter=10,
+    )
+    label_style = ParagraphStyle(
+        "Label",
+        parent=styles["Normal"],
+        fontName="Helvetica-Bold",
+        fontSize=10,
+        textColor=azul_escuro,
+        leading=13,
+    )
+    value_style = ParagraphStyle(
+        "Value",
+        parent=styles["Normal"],
+        fontName="Helvetica",
+        fontSize=10,
+        textColor=cinza_txt,
+        leading=13,
+    )
+
+    elements = []
+
+    elements.append(Paragraph("PEDIDO DE COMPRA", title_style))
+
+    # Bloco de informações (2 colunas)
+    info_rows = [
+        [Paragraph("Nº do pedido:", label_style), Paragraph(numero_pedido or "-", value_style),
+         Paragraph("Data:", label_style), Paragraph(data_pedido.strftime("%d/%m/%Y"), value_style)],
+        [Paragraph("CNPJ faturamento:", label_style), Paragraph(cnpj_faturamento or "-", value_style),
+         Paragraph("Solicitante:", label_style), Paragraph(solicitante or "-", value_style)],
+        [Paragraph("Fornecedor:", label_style), Paragraph(fornecedor or "-", value_style),
+         Paragraph("Destino (cidade):", label_style), Paragraph(destino or "-", value_style)],
+    ]
+    info_table = Table(info_rows, colWidths=[32*mm, 63*mm, 28*mm, 55*mm])
+    info_table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), colors.whitesmoke),
+        ("BOX", (0, 0), (-1, -1), 0.6, colors.HexColor("#cbd5e1")),
+        ("INNERGRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#e2e8f0")),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 8),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+        ("TOPPADDING", (0, 0), (-1, -1), 6),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+    ]))
+    elements.append(info_table)
+    elements.append(Spacer(1, 10))
+
+    if observacoes and observacoes.strip():
+        obs = observacoes.strip().replace("\n", "<br/>")
+        elements.append(Paragraph("Observações:", label_style))
+        elements.append(Paragraph(obs, value_style))
+        elements.append(Spacer(1, 10))
+
+    # Tabela de itens
+    data = [[
+        Paragraph("<b>Material</b>", ParagraphStyle("h", parent=value_style, textColor=colors.white)),
+        Paragraph("<b>Quantidade</b>", ParagraphStyle("h2", parent=value_style, textColor=colors.white)),
+    ]]
+
+    for _, r in itens_df.iterrows():
+        material = str(r.get("Material", "")).strip()
+        qtd = r.get("Quantidade", "")
+        data.append([Paragraph(material, value_style), Paragraph(str(qtd), value_style)])
+
+    t = Table(data, colWidths=[130*mm, 35*mm])
+
+    t_style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), azul_medio),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("ALIGN", (1, 1), (1, -1), "RIGHT"),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("BOX", (0, 0), (-1, -1), 0.8, colors.HexColor("#94a3b8")),
+        ("INNERGRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#cbd5e1")),
+        ("LEFTPADDING", (0, 0), (-1, -1), 8),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+        ("TOPPADDING", (0, 0), (-1, -1), 6),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+    ])
+
+    # zebra striping
+    for i in range(1, len(data)):
+        bg = colors.whitesmoke if i % 2 == 1 else colors.HexColor("#eef2ff")
+        t_style.add("BACKGROUND", (0, i), (-1, i), bg)
+
+    t.setStyle(t_style)
+    elements.append(t)
+
+    doc.build(elements)
+    return buf.getvalue()
@@ -0,0 +1,569 @@
+"""
+Leitura das compras, sem interface: os filtros da sidebar, os KPIs, a grade
+paginada, a busca por texto, o rollup da aba de PDF, os lotes da exportação
+e as séries da aba Análises. Os KPIs, as páginas da grade e as análises são
+compartilhados entre as sessões e seguem a versão dos dados (o contador
+do esquema.py).
+
+O app.py usa estas funções a cada rerun; os benchmarks (benchmarks/) as
+chamam direto, sem Streamlit.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import NamedTuple
+
+import pandas as pd
+from sqlalchemy import text
+
+import perfil
+from db import engine
+from esquema import data_para_dias
+
+
+EXPORT_LOTE = 20_000  # linhas por fetchmany (e por row group no Parquet)
+
+
+# ----------------------------
+# VERSÃO DOS DADOS
+# ----------------------------
+def versao_tabela() -> int:
+    """Versão atual dos dados (esquema.registrar_alteracao): muda a cada gravação ou exclusão."""
+    with engine.connect() as conn:
+        return int(conn.execute(text("SELECT versao FROM versao_dados WHERE id = 1")).scalar_one())
+
+
+# ----------------------------
+# RESULTADOS COMPARTILHADOS (KPIs, páginas da grade)
+# ----------------------------
+# Resultados das consultas da tela por (consulta, argumentos, versão dos
+# dados), valendo para todas as sessões do processo: N usuários com os mesmos
+# filtros custam uma consulta. Quem pede uma chave que outra sessão está
+# calculando espera por ela em vez de repetir a consulta. Versão nova, chaves
+# novas; as antigas saem pela ordem de uso (LRU).
+RESULTADOS_MAX = 256
+_resultados = {"lock": threading.Lock(), "itens": OrderedDict(), "calculando": {}}
+
+
+def _compartilhado(chave: tuple, calcular, *args):
+    """calcular(*args) uma vez por chave no processo; o valor é compartilhado (não altere)."""
+    with _resultados["lock"]:
+        if chave in _resultados["itens"]:
+            _resultados["itens"].move_to_end(chave)
+            return _resultados["itens"][chave]
+        evento = _resultados["calculando"].get(chave)
+        dono = evento is None
+        if dono:
+            evento = _resultados["calculando"][chave] = threading.Event()
+    if not dono:
+        evento.wait()
+        with _resultados["lock"]:
+            if chave in _resultados["itens"]:
+                return _resultados["itens"][chave]
+        # O cálculo da outra sessão falhou: tenta aqui (e o erro aparece aqui)
+        return calcular(*args)
+    try:
+        valor = calcular(*args)
+        with _resultados["lock"]:
+            _resultados["itens"][chave] = valor
+            while len(_resultados["itens"]) > RESULTADOS_MAX:
+                _resultados["itens"].popitem(last=False)
+        return valor
+    finally:
+        with _resultados["lock"]:
+            del _resultados["calculando"][chave]
+        evento.set()
+
+
+def descartar_resultados():
+    """Esquece os resultados compartilhados; as próximas chamadas vão ao banco."""
+    with _resultados["lock"]:
+        _resultados["itens"].clear()
+
+
+# Linhas (pedido_itens) com o cabeçalho e os nomes das dimensões
+SQL_FROM_COMPRAS = """
+    FROM pedido_itens i
+    JOIN pedidos p ON p.id = i.pedido_id
+    JOIN compradores c ON c.id = p.comprador_id
+    JOIN fornecedores f ON f.id = p.fornecedor_id
+    JOIN cidades d ON d.id = p.cidade_id
+"""
+SQL_COLUNAS_COMPRAS = """
+    i.id, i.pedido_id, c.nome AS comprador, p.data_compra, f.nome AS fornecedor,
+    d.nome AS cidade_destino, i.item, i.quantidade, p.criado_em
+"""
+COLUNAS_DIMENSAO = ["comprador", "fornecedor", "cidade_destino"]
+
+
+def _tipar_compras(df_: pd.DataFrame) -> pd.DataFrame:
+    """Dimensões como category; datas inteiras convertidas de forma vetorizada."""
+    for col in COLUNAS_DIMENSAO:
+        df_[col] = df_[col].astype("category")
+    df_["data_compra"] = pd.to_datetime(df_["data_compra"].astype("int64"), unit="D")
+    df_["criado_em"] = pd.to_datetime(df_["criado_em"].astype("int64"), unit="s")
+    return df_
+
+
+# Ordem da listagem. O pedido entra no meio para a consulta partir de
+# pedidos pelo idx_pedidos_data (data_compra, id) e achar as linhas de cada
+# pedido pelo idx_pedido_itens_pedido, sem ordenar o resultado inteiro.
+SQL_ORDEM_COMPRAS = "p.data_compra DESC, p.id DESC, i.id DESC"
+
+
+def _sql_compras(where: str, params: dict | None, limite: int | None) -> tuple[str, dict]:
+    params = dict(params or {})
+    sql = f"SELECT {SQL_COLUNAS_COMPRAS} {SQL_FROM_COMPRAS} {where} ORDER BY {SQL_ORDEM_COMPRAS}"
+    if limite is not None:
+        sql += " LIMIT :limite"
+        params["limite"] = int(limite)
+    return sql, params
+
+
+def _ler_compras(conn, where: str = "", params: dict | None = None, limite: int | None = None) -> pd.DataFrame:
+    sql, params = _sql_compras(where, params, limite)
+    return _tipar_compras(pd.read_sql(text(sql), conn, params=params))
+
+
+# ----------------------------
+# FILTROS / KPIs (no banco)
+# ----------------------------
+class FiltrosCompras(NamedTuple):
+    comprador: str | None = None
+    fornecedor: str | None = None
+    data_ini: date | None = None
+    data_fim: date | None = None
+
+
+def _where_filtros(filtros: FiltrosCompras) -> tuple[str, dict]:
+    """Monta o WHERE parametrizado a partir dos filtros da sidebar."""
+    conds, params = [], {}
+    # Nome -> id pelo lookup, para o filtro cair nos índices de pedidos
+    if filtros.comprador:
+        conds.append("p.comprador_id = (SELECT id FROM compradores WHERE nome = :comprador)")
+        params["comprador"] = filtros.comprador
+    if filtros.fornecedor:
+        conds.append("p.fornecedor_id = (SELECT id FROM fornecedores WHERE nome = :fornecedor)")
+        params["fornecedor"] = filtros.fornecedor
+    if filtros.data_ini is not None:
+        conds.append("p.data_compra >= :data_ini")
+        params["data_ini"] = data_para_dias(filtros.data_ini)
+    if filtros.data_fim is not None:
+        conds.append("p.data_compra <= :data_fim")
+        params["data_fim"] = data_para_dias(filtros.data_fim)
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    return where, params
+
+
+def _where_pagina(filtros: FiltrosCompras, apos: tuple[int, int, int] | None) -> tuple[str, dict]:
+    where, params = _where_filtros(filtros)
+    if apos is not None:
+        cond = "(p.data_compra, p.id, i.id) < (:k_data, :k_pedido, :k_id)"
+        where = f"{where} AND {cond}" if where else f"WHERE {cond}"
+        params.update(k_data=int(apos[0]), k_pedido=int(apos[1]), k_id=int(apos[2]))
+    return where, params
+
+
+def _consultar_pagina(filtros: FiltrosCompras, apos: tuple[int, int, int] | None, limite: int) -> pd.DataFrame:
+    where, params = _where_pagina(filtros, apos)
+    with engine.connect() as conn:
+        return _ler_compras(conn, where, params, limite=limite)
+
+
+def _consultar_pagina_linhas(filtros: FiltrosCompras, apos: tuple[int, int, int] | None, limite: int) -> list[dict]:
+    where, params = _where_pagina(filtros, apos)
+    sql, params = _sql_compras(where, params, limite)
+    with engine.connect() as conn:
+        return [dict(linha) for linha in conn.execute(text(sql), params).mappings()]
+
+
+@perfil.medido("grade_consulta")
+def pagina_compras(filtros: FiltrosCompras, apos: tuple[int, int, int] | None, limite: int,
+                   versao: int | None = None) -> pd.DataFrame:
+    """
+    Paginação por chave (keyset) na mesma ordem da listagem: (data_compra, pedido_id, id) DESC.
+    `apos` é a chave (dias, pedido_id, id) da última linha da página anterior (None = primeira página).
+    `versao` é a versao_tabela() que quem chama já leu (None = ler agora); o
+    resultado é compartilhado entre as sessões: não altere o frame.
+    """
+    versao = versao_tabela() if versao is None else versao
+    return _compartilhado(("pagina", filtros, apos, limite, versao), _consultar_pagina, filtros, apos, limite)
+
+
+def pagina_compras_linhas(filtros: FiltrosCompras, apos: tuple[int, int, int] | None, limite: int,
+                          versao: int | None = None) -> list[dict]:
+    """
+    Mesma página de pagina_compras, como lista de dicts e sem pandas (para a API).
+    data_compra vem em dias desde 1970 e criado_em em segundos, como no banco.
+    """
+    versao = versao_tabela() if versao is None else versao
+    return _compartilhado(
+        ("pagina_linhas", filtros, apos, limite, versao), _consultar_pagina_linhas, filtros, apos, limite,
+    )
+
+
+@perfil.medido("kpis")
+def kpis_compras(filtros: FiltrosCompras, versao: int | None = None) -> dict:
+    """Valores dos cards; compartilhados entre as sessões por filtros e versão (ver pagina_compras)."""
+    versao = versao_tabela() if versao is None else versao
+    return _compartilhado(("kpis", filtros, versao), _consultar_kpis, filtros)
+
+
+def _consultar_kpis(filtros: FiltrosCompras) -> dict:
+    """Os quatro valores em uma única consulta agregada."""
+    where, params = _where_filtros(filtros)
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(f"""
+                SELECT COUNT(*), COALESCE(SUM(i.quantidade), 0),
+                       COUNT(DISTINCT p.fornecedor_id), COUNT(DISTINCT i.item)
+                FROM pedido_itens i JOIN pedidos p ON p.id = i.pedido_id
+                {where}
+            """),
+            params,
+        ).one()
+    return {
+        "registros": int(row[0]),
+        "quantidade": float(row[1]),
+        "fornecedores": int(row[2]),
+        "itens": int(row[3]),
+    }
+
+
+def iter_lotes_export(filtros: FiltrosCompras):
+    """Percorre o resultado filtrado em lotes de EXPORT_LOTE linhas, sem montar DataFrame."""
+    where, params = _where_filtros(filtros)
+    sql = f"""
+        SELECT c.nome, p.data_compra, f.nome, d.nome, i.item, i.quantidade
+        {SQL_FROM_COMPRAS} {where}
+        ORDER BY {SQL_ORDEM_COMPRAS}
+    """
+    with engine.connect() as conn:
+        res = conn.execution_options(yield_per=EXPORT_LOTE).execute(text(sql), params)
+        for lote in res.partitions(EXPORT_LOTE):
+            yield lote
+
+
+# ----------------------------
+# BUSCA POR TEXTO (item, fornecedor, cidade)
+# ----------------------------
+# Até BUSCA_RANQUEAR_ATE resultados a ordem é por relevância (bm25, ~10µs por
+# linha encontrada); acima disso a busca é genérica demais para o ranking
+# compensar o custo e vêm as linhas mais recentes primeiro.
+BUSCA_RANQUEAR_ATE = 2_000
+BUSCA_PESOS = "2.0, 1.0, 0.5"  # item, fornecedor, cidade_destino no bm25
+BUSCA_FTS = engine.dialect.name == "sqlite"
+# Sem FTS5: ILIKE no PostgreSQL; no SQLite o LIKE já não diferencia maiúsculas
+BUSCA_LIKE = "ILIKE" if engine.dialect.name == "postgresql" else "LIKE"
+
+
+class ResultadoBusca(NamedTuple):
+    linhas: pd.DataFrame
+    total: int  # limitado a BUSCA_RANQUEAR_ATE + 1 ("mais de ...")
+    ranqueada: bool
+    correcao: str | None = None  # busca efetivamente feita, quando corrigida (servico.buscar)
+
+
+def termos_busca() -> list[str]:
+    """Palavras indexadas na busca (sem acento, minúsculas), em ordem."""
+    if not BUSCA_FTS:
+        return []
+    with engine.connect() as conn:
+        return sorted(conn.execute(text("SELECT term FROM compras_busca_termos")).scalars())
+
+
+def _expressao_fts(palavras: list[tuple[str, ...]]) -> str:
+    """[("cabo",), ("flexivel", "flexiveis")] -> '"cabo" AND ("flexivel" OR "flexiveis")'; "x*" é prefixo."""
+    grupos = []
+    for alternativas in palavras:
+        termos = [f'"{t[:-1]}"*' if t.endswith("*") else f'"{t}"' for t in alternativas]
+        grupos.append(termos[0] if len(termos) == 1 else "(" + " OR ".join(termos) + ")")
+    return " AND ".join(grupos)
+
+
+def _where_busca_ilike(palavras: list[tuple[str, ...]]) -> tuple[str, dict]:
+    """Sem FTS5 (PostgreSQL): cada palavra em qualquer das três colunas, por ILIKE (BUSCA_LIKE)."""
+    conds, params = [], {}
+    for n, alternativas in enumerate(palavras):
+        ou = []
+        for m, termo in enumerate(alternativas):
+            params[f"b{n}_{m}"] = f"%{termo.rstrip('*')}%"
+            ou += [f"{col} {BUSCA_LIKE} :b{n}_{m}" for col in ("i.item", "f.nome", "d.nome")]
+        conds.append("(" + " OR ".join(ou) + ")")
+    return "WHERE " + " AND ".join(conds), params
+
+
+@perfil.medido("busca")
+def buscar_compras(palavras: list[tuple[str, ...]], pagina: int = 0, limite: int = 50) -> ResultadoBusca:
+    """
+    Linhas em que todas as palavras aparecem (em item, fornecedor ou cidade).
+    Cada palavra é uma tupla de alternativas já normalizadas (sem acento,
+    minúsculas; "x*" = prefixo), montada por servico.buscar. Paginação por
+    deslocamento: `pagina` começa em 0.
+    """
+    teto = BUSCA_RANQUEAR_ATE + 1
+    inicio = int(pagina) * int(limite)
+    with engine.connect() as conn:
+        if not BUSCA_FTS:
+            where, params = _where_busca_ilike(palavras)
+            total = conn.execute(
+                text(f"SELECT COUNT(*) FROM (SELECT 1 {SQL_FROM_COMPRAS} {where} LIMIT :teto) t"),
+                {**params, "teto": teto},
+            ).scalar_one()
+            sql = f"""
+                SELECT {SQL_COLUNAS_COMPRAS} {SQL_FROM_COMPRAS} {where}
+                ORDER BY i.id DESC LIMIT :limite OFFSET :inicio
+            """
+            linhas = pd.read_sql(text(sql), conn, params={**params, "limite": int(limite), "inicio": inicio})
+            return ResultadoBusca(_tipar_compras(linhas), int(total), False)
+
+        params = {"busca": _expressao_fts(palavras)}
+        total = conn.execute(
+            text("SELECT COUNT(*) FROM (SELECT rowid FROM compras_busca WHERE compras_busca MATCH :busca LIMIT :teto)"),
+            {**params, "teto": teto},
+        ).scalar_one()
+        ranqueada = total <= BUSCA_RANQUEAR_ATE
+        # "ORDER BY rowid DESC" literal: o FTS5 percorre o índice já nessa ordem
+        peso, ordem = (
+            (f"bm25(compras_busca, {BUSCA_PESOS})", "peso, rowid DESC") if ranqueada else ("-rowid", "rowid DESC")
+        )
+        sql = f"""
+            SELECT {SQL_COLUNAS_COMPRAS} {SQL_FROM_COMPRAS}
+            JOIN (
+                SELECT rowid AS id, {peso} AS peso FROM compras_busca
+                WHERE compras_busca MATCH :busca
+                ORDER BY {ordem} LIMIT :limite OFFSET :inicio
+            ) b ON b.id = i.id
+            ORDER BY b.peso, i.id DESC
+        """
+        linhas = pd.read_sql(text(sql), conn, params={**params, "limite": int(limite), "inicio": inicio})
+    return ResultadoBusca(_tipar_compras(linhas), int(total), ranqueada)
+
+
+# ----------------------------
+# ITENS DO PEDIDO (rollup diário)
+# ----------------------------
+def _where_rollup(periodo_ini: date | None, periodo_fim: date | None, tabela: str = "r") -> tuple[list, dict]:
+    conds, params = [], {}
+    if periodo_ini is not None:
+        conds.append(f"{tabela}.data_compra >= :ini")
+        params["ini"] = data_para_dias(periodo_ini)
+    if periodo_fim is not None:
+        conds.append(f"{tabela}.data_compra <= :fim")
+        params["fim"] = data_para_dias(periodo_fim)
+    return conds, params
+
+
+@perfil.medido("itens_pedido")
+def itens_pedido_rollup(fornecedor: str, cidade: str, periodo_ini: date | None, periodo_fim: date | None) -> pd.DataFrame:
+    """Itens somados de um fornecedor/destino no período, lidos do rollup diário."""
+    conds, params = _where_rollup(periodo_ini, periodo_fim)
+    conds += [
+        "r.fornecedor_id = (SELECT id FROM fornecedores WHERE nome = :fornecedor)",
+        "r.cidade_id = (SELECT id FROM cidades WHERE nome = :cidade)",
+    ]
+    params.update(fornecedor=fornecedor, cidade=cidade)
+    with engine.connect() as conn:
+        return pd.read_sql(
+            text(f"""
+                SELECT r.item AS "Material", SUM(r.quantidade) AS "Quantidade"
+                FROM compras_diarias r
+                WHERE {" AND ".join(conds)}
+                GROUP BY r.item
+                ORDER BY r.item
+            """),
+            conn,
+            params=params,
+        )
+
+
+@perfil.medido("itens_lote")
+def itens_lote_rollup(periodo_ini: date | None, periodo_fim: date | None) -> pd.DataFrame:
+    """Itens somados por fornecedor + destino + item no período (para o lote)."""
+    conds, params = _where_rollup(periodo_ini, periodo_fim)
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    with engine.connect() as conn:
+        return pd.read_sql(
+            text(f"""
+                SELECT f.nome AS fornecedor, d.nome AS cidade_destino,
+                       r.item AS "Material", SUM(r.quantidade) AS "Quantidade"
+                FROM compras_diarias r
+                JOIN fornecedores f ON f.id = r.fornecedor_id
+                JOIN cidades d ON d.id = r.cidade_id
+                {where}
+                GROUP BY f.nome, d.nome, r.item
+                ORDER BY f.nome, d.nome, r.item
+            """),
+            conn,
+            params=params,
+        )
+
+
+# ----------------------------
+# ANÁLISES (agregações no banco)
+# ----------------------------
+# Séries por semana ou mês agrupadas no SQL: volumes sobre o rollup diário
+# (compras_diarias, com índices que cobrem as somas) e atividade dos
+# compradores sobre pedidos. Cada consulta soma primeiro por dia e só então
+# aplica o balde, que assim roda em ~1 linha por dia. Cada gráfico traz no
+# máximo ANALISE_TOP_N séries, então os frames têm poucas centenas de linhas.
+# Compartilhadas entre as sessões como os KPIs, mas a versão dos dados na
+# chave só anda a cada ANALISE_VALIDADE segundos: com gravações o tempo
+# todo, cada análise é refeita uma vez por intervalo, não a cada gravação.
+AGRUPAMENTOS = ("mes", "semana")
+ANALISE_TOP_N = 8
+ANALISE_VALIDADE = 60  # segundos
+_analise_versao = {"lock": threading.Lock(), "versao": None, "desde": 0.0}
+
+
+def _versao_analise() -> int:
+    versao = versao_tabela()
+    with _analise_versao["lock"]:
+        agora = time.monotonic()
+        if _analise_versao["versao"] is None or (
+            versao != _analise_versao["versao"] and agora - _analise_versao["desde"] >= ANALISE_VALIDADE
+        ):
+            _analise_versao.update(versao=versao, desde=agora)
+        return _analise_versao["versao"]
+
+
+def _sql_balde(coluna: str, agrupamento: str) -> str:
+    """Início da semana (segunda-feira) ou do mês da coluna, em dias desde 1970."""
+    if agrupamento not in AGRUPAMENTOS:
+        raise ValueError(f"agrupamento inválido: {agrupamento}")
+    if agrupamento == "semana":
+        # 1970-01-01 foi uma quinta-feira
+        return f"({coluna} - ({coluna} + 3) % 7)"
+    if engine.dialect.name == "postgresql":
+        return f"(CAST(date_trunc('month', DATE '1970-01-01' + {coluna}) AS DATE) - DATE '1970-01-01')"
+    return f"CAST(julianday(date({coluna} * 86400, 'unixepoch', 'start of month')) - 2440587.5 AS INTEGER)"
+
+
+def _ler_serie(sql: str, params: dict) -> pd.DataFrame:
+    with engine.connect() as conn:
+        df_ = pd.read_sql(text(sql), conn, params=params)
+    df_["periodo"] = (df_["periodo"].to_numpy(dtype="int64") * 86_400).astype("datetime64[s]")
+    return df_
+
+
+def _volume_total(agrupamento: str, ini: date | None, fim: date | None) -> pd.DataFrame:
+    conds, params = _where_rollup(ini, fim)
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    return _ler_serie(f"""
+        SELECT {_sql_balde("d.data_compra", agrupamento)} AS periodo,
+               SUM(d.quantidade) AS quantidade, SUM(d.linhas) AS linhas
+        FROM (
+            SELECT r.data_compra, SUM(r.quantidade) AS quantidade, SUM(r.linhas) AS linhas
+            FROM compras_diarias r
+            {where}
+            GROUP BY r.data_compra
+        ) d
+        GROUP BY 1
+        ORDER BY 1
+    """, params)
+
+
+def _volume_fornecedores(agrupamento: str, ini: date | None, fim: date | None, top_n: int) -> pd.DataFrame:
+    conds, params = _where_rollup(ini, fim)
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    params["n"] = top_n
+    return _ler_serie(f"""
+        WITH top AS (
+            SELECT r.fornecedor_id, SUM(r.quantidade) AS total
+            FROM compras_diarias r
+            {where}
+            GROUP BY r.fornecedor_id
+            ORDER BY total DESC
+            LIMIT :n
+        )
+        SELECT {_sql_balde("d.data_compra", agrupamento)} AS periodo, f.nome AS fornecedor,
+               SUM(d.quantidade) AS quantidade
+        FROM (
+            SELECT r.fornecedor_id, r.data_compra, SUM(r.quantidade) AS quantidade
+            FROM top t
+            JOIN compras_diarias r ON r.fornecedor_id = t.fornecedor_id
+            {where}
+            GROUP BY r.fornecedor_id, r.data_compra
+        ) d
+        JOIN fornecedores f ON f.id = d.fornecedor_id
+        GROUP BY 1, f.nome
+        ORDER BY 1, f.nome
+    """, params)
+
+
+def _atividade_compradores(agrupamento: str, ini: date | None, fim: date | None, top_n: int) -> pd.DataFrame:
+    conds, params = _where_rollup(ini, fim, tabela="p")
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    params["n"] = top_n
+    return _ler_serie(f"""
+        WITH top AS (
+            SELECT p.comprador_id, COUNT(*) AS total
+            FROM pedidos p
+            {where}
+            GROUP BY p.comprador_id
+            ORDER BY total DESC
+            LIMIT :n
+        )
+        SELECT {_sql_balde("d.data_compra", agrupamento)} AS periodo, c.nome AS comprador,
+               SUM(d.pedidos) AS pedidos
+        FROM (
+            SELECT p.comprador_id, p.data_compra, COUNT(*) AS pedidos
+            FROM top t
+            JOIN pedidos p ON p.comprador_id = t.comprador_id
+            {where}
+            GROUP BY p.comprador_id, p.data_compra
+        ) d
+        JOIN compradores c ON c.id = d.comprador_id
+        GROUP BY 1, c.nome
+        ORDER BY 1, c.nome
+    """, params)
+
+
+def _itens_cidade(cidade: str, ini: date | None, fim: date | None, top_n: int) -> pd.DataFrame:
+    conds, params = _where_rollup(ini, fim)
+    conds.append("r.cidade_id = (SELECT id FROM cidades WHERE nome = :cidade)")
+    params.update(cidade=cidade, n=top_n)
+    with engine.connect() as conn:
+        return pd.read_sql(
+            text(f"""
+                SELECT r.item, SUM(r.quantidade) AS quantidade
+                FROM compras_diarias r
+                WHERE {" AND ".join(conds)}
+                GROUP BY r.item
+                ORDER BY quantidade DESC, r.item
+                LIMIT :n
+            """),
+            conn,
+            params=params,
+        )
+
+
+@perfil.medido("analise")
+def volume_total(agrupamento: str, ini: date | None = None, fim: date | None = None) -> pd.DataFrame:
+    """Quantidade e linhas compradas por semana/mês (colunas periodo, quantidade, linhas)."""
+    chave = ("volume_total", agrupamento, ini, fim, _versao_analise())
+    return _compartilhado(chave, _volume_total, agrupamento, ini, fim)
+
+
+@perfil.medido("analise")
+def volume_fornecedores(agrupamento: str, ini: date | None = None, fim: date | None = None,
+                        top_n: int = ANALISE_TOP_N) -> pd.DataFrame:
+    """Quantidade por semana/mês dos top_n fornecedores do período (periodo, fornecedor, quantidade)."""
+    chave = ("volume_fornecedores", agrupamento, ini, fim, top_n, _versao_analise())
+    return _compartilhado(chave, _volume_fornecedores, agrupamento, ini, fim, top_n)
+
+
+@perfil.medido("analise")
+def atividade_compradores(agrupamento: str, ini: date | None = None, fim: date | None = None,
+                          top_n: int = ANALISE_TOP_N) -> pd.DataFrame:
+    """Pedidos por semana/mês dos top_n compradores do período (periodo, comprador, pedidos)."""
+    chave = ("atividade_compradores", agrupamento, ini, fim, top_n, _versao_analise())
+    return _compartilhado(chave, _atividade_compradores, agrupamento, ini, fim, top_n)
+
+
+@perfil.medido("analise")
+def itens_cidade(cidade: str, ini: date | None = None, fim: date | None = None, top_n: int = 10) -> pd.DataFrame:
+    """Os top_n itens mais comprados para a cidade de destino no período (item, quantidade)."""
+    chave = ("itens_cidade", cidade, ini, fim, top_n, _versao_analise())
+    return _compartilhado(chave, _itens_cidade, cidade, ini, fim, top_n)
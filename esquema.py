@@ -0,0 +1,350 @@
+"""
+Schema do banco de compras: migrações, definições Core das tabelas e helpers
+de gravação que não dependem da interface (usados pelo app.py e pelo
+importar.py).
+"""
+from datetime import date, datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy import text
+
+import rollup
+import tarefas
+from db import engine, ID_AUTOINCREMENT
+
+# Datas gravadas como inteiros: data_compra = dias desde 1970-01-01;
+# criado_em = segundos desde 1970-01-01 00:00 no horário local (sem fuso).
+EPOCH = date(1970, 1, 1)
+
+
+def data_para_dias(d: date) -> int:
+    return (d - EPOCH).days
+
+
+def dias_para_data(dias: int) -> date:
+    return EPOCH + timedelta(days=int(dias))
+
+
+def agora_segundos() -> int:
+    return int((datetime.now().replace(microsecond=0) - datetime(1970, 1, 1)).total_seconds())
+
+
+# Dimensões: coluna exibida -> (tabela de lookup, chave estrangeira em pedidos)
+DIM_TABELAS = {
+    "comprador": ("compradores", "comprador_id"),
+    "fornecedor": ("fornecedores", "fornecedor_id"),
+    "cidade_destino": ("cidades", "cidade_id"),
+}
+
+
+# Expressões de conversão (legado -> inteiro e inteiro -> texto) por banco
+def _sql_datas(dialeto: str) -> dict:
+    if dialeto == "postgresql":
+        return {
+            "texto_para_dias": "(CAST({c} AS DATE) - DATE '1970-01-01')",
+            "texto_para_segundos": "CAST(EXTRACT(EPOCH FROM CAST({c} AS TIMESTAMP)) AS BIGINT)",
+            "dias_para_texto": "CAST(DATE '1970-01-01' + {c} AS TEXT)",
+            "segundos_para_texto": "CAST(TIMESTAMP '1970-01-01' + {c} * INTERVAL '1 second' AS TEXT)",
+        }
+    return {
+        "texto_para_dias": "CAST(julianday({c}) - 2440587.5 AS INTEGER)",
+        "texto_para_segundos": "CAST(strftime('%s', {c}) AS INTEGER)",
+        "dias_para_texto": "date({c} * 86400, 'unixepoch')",
+        "segundos_para_texto": "datetime({c}, 'unixepoch')",
+    }
+
+
+def _migracao_normalizar(conn):
+    """
+    compras (tabela única) -> pedidos (cabeçalho) + pedido_itens (linhas),
+    com compradores / fornecedores / cidades como tabelas de lookup e datas
+    em inteiros. Linhas antigas com o mesmo cabeçalho e o mesmo criado_em
+    (salvas juntas) viram um único pedido. Os ids das linhas são mantidos.
+    No lugar da tabela antiga fica a view `compras`, com o formato de antes.
+    """
+    sql = _sql_datas(conn.dialect.name)
+    for tabela in ("compradores", "fornecedores", "cidades"):
+        conn.execute(text(f"CREATE TABLE {tabela} (id {ID_AUTOINCREMENT}, nome TEXT NOT NULL UNIQUE)"))
+    conn.execute(text(f"""
+        CREATE TABLE pedidos (
+            id {ID_AUTOINCREMENT},
+            comprador_id INTEGER NOT NULL REFERENCES compradores (id),
+            fornecedor_id INTEGER NOT NULL REFERENCES fornecedores (id),
+            cidade_id INTEGER NOT NULL REFERENCES cidades (id),
+            data_compra INTEGER NOT NULL,
+            criado_em BIGINT NOT NULL
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE pedido_itens (
+            id {ID_AUTOINCREMENT},
+            pedido_id INTEGER NOT NULL REFERENCES pedidos (id) ON DELETE CASCADE,
+            item TEXT NOT NULL,
+            quantidade REAL NOT NULL
+        )
+    """))
+    for sql_indice in (
+        "CREATE INDEX idx_pedidos_comprador_data ON pedidos (comprador_id, data_compra)",
+        "CREATE INDEX idx_pedidos_fornecedor_data ON pedidos (fornecedor_id, data_compra)",
+        "CREATE INDEX idx_pedidos_fornecedor_cidade_data ON pedidos (fornecedor_id, cidade_id, data_compra)",
+        "CREATE INDEX idx_pedidos_cidade ON pedidos (cidade_id)",
+        "CREATE INDEX idx_pedidos_data ON pedidos (data_compra, id)",
+        "CREATE INDEX idx_pedido_itens_pedido ON pedido_itens (pedido_id)",
+    ):
+        conn.execute(text(sql_indice))
+
+    for dim, (tabela, _) in DIM_TABELAS.items():
+        conn.execute(text(f"INSERT INTO {tabela} (nome) SELECT DISTINCT {dim} FROM compras"))
+
+    joins_legado = """
+        FROM compras x
+        JOIN compradores c ON c.nome = x.comprador
+        JOIN fornecedores f ON f.nome = x.fornecedor
+        JOIN cidades d ON d.nome = x.cidade_destino
+    """
+    dias = sql["texto_para_dias"].format(c="x.data_compra")
+    segundos = sql["texto_para_segundos"].format(c="x.criado_em")
+    conn.execute(text(f"""
+        INSERT INTO pedidos (comprador_id, fornecedor_id, cidade_id, data_compra, criado_em)
+        SELECT c.id, f.id, d.id, {dias}, {segundos}
+        {joins_legado}
+        GROUP BY c.id, f.id, d.id, {dias}, {segundos}
+        ORDER BY MIN(x.id)
+    """))
+    conn.execute(text(f"""
+        INSERT INTO pedido_itens (id, pedido_id, item, quantidade)
+        SELECT x.id, p.id, x.item, x.quantidade
+        {joins_legado}
+        JOIN pedidos p ON p.fornecedor_id = f.id AND p.cidade_id = d.id
+                      AND p.data_compra = {dias} AND p.comprador_id = c.id
+                      AND p.criado_em = {segundos}
+    """))
+    if conn.dialect.name == "postgresql":
+        # ids copiados explicitamente: avança a sequence para não colidir
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('pedido_itens', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM pedido_itens), 1))"
+        ))
+
+    conn.execute(text("DROP TABLE compras"))
+    conn.execute(text(f"""
+        CREATE VIEW compras AS
+        SELECT i.id, c.nome AS comprador, {sql["dias_para_texto"].format(c="p.data_compra")} AS data_compra,
+               f.nome AS fornecedor, d.nome AS cidade_destino, i.item, i.quantidade,
+               {sql["segundos_para_texto"].format(c="p.criado_em")} AS criado_em
+        FROM pedido_itens i
+        JOIN pedidos p ON p.id = i.pedido_id
+        JOIN compradores c ON c.id = p.comprador_id
+        JOIN fornecedores f ON f.id = p.fornecedor_id
+        JOIN cidades d ON d.id = p.cidade_id
+    """))
+
+
+# Texto de cada linha para a busca: item, fornecedor e cidade de destino
+SQL_TEXTO_BUSCA = """
+    SELECT i.id, i.item, f.nome, d.nome
+    FROM pedido_itens i
+    JOIN pedidos p ON p.id = i.pedido_id
+    JOIN fornecedores f ON f.id = p.fornecedor_id
+    JOIN cidades d ON d.id = p.cidade_id
+"""
+
+
+def _migracao_busca(conn):
+    """
+    Índice de texto (FTS5) das linhas, com rowid = pedido_itens.id. Tokens
+    sem acento e sem diferenciar maiúsculas (unicode61 remove_diacritics 2:
+    "hidráulico" = "HIDRAULICO"). Mantido por triggers em pedido_itens e
+    pedidos, então toda gravação (formulário, importação, API) entra sozinha.
+    compras_busca_termos (fts5vocab) lista as palavras indexadas.
+    Só SQLite: no PostgreSQL a busca usa ILIKE (consultas.buscar_compras).
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    conn.execute(text("""
+        CREATE VIRTUAL TABLE compras_busca USING fts5(
+            item, fornecedor, cidade_destino,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """))
+    conn.execute(text("CREATE VIRTUAL TABLE compras_busca_termos USING fts5vocab(compras_busca, 'row')"))
+    inserir = f"INSERT INTO compras_busca (rowid, item, fornecedor, cidade_destino) {SQL_TEXTO_BUSCA}"
+    for sql_trigger in (
+        f"""
+        CREATE TRIGGER pedido_itens_busca_ai AFTER INSERT ON pedido_itens BEGIN
+            {inserir} WHERE i.id = new.id;
+        END
+        """,
+        """
+        CREATE TRIGGER pedido_itens_busca_ad AFTER DELETE ON pedido_itens BEGIN
+            DELETE FROM compras_busca WHERE rowid = old.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER pedido_itens_busca_au AFTER UPDATE OF item, pedido_id ON pedido_itens BEGIN
+            DELETE FROM compras_busca WHERE rowid = old.id;
+            {inserir} WHERE i.id = new.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER pedidos_busca_au AFTER UPDATE OF fornecedor_id, cidade_id ON pedidos BEGIN
+            DELETE FROM compras_busca WHERE rowid IN (SELECT id FROM pedido_itens WHERE pedido_id = new.id);
+            {inserir} WHERE i.pedido_id = new.id;
+        END
+        """,
+    ):
+        conn.execute(text(sql_trigger))
+    conn.execute(text(inserir))
+    conn.execute(text("INSERT INTO compras_busca (compras_busca) VALUES ('optimize')"))
+
+
+# Migrações do schema: (versão, [comandos SQL ou funções que recebem a conexão]).
+# Só acrescente no final da lista.
+MIGRACOES = [
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_compras_comprador_data ON compras (comprador, data_compra)",
+        "CREATE INDEX IF NOT EXISTS idx_compras_fornecedor_data ON compras (fornecedor, data_compra)",
+        "CREATE INDEX IF NOT EXISTS idx_compras_fornecedor_cidade_data ON compras (fornecedor, cidade_destino, data_compra)",
+        "CREATE INDEX IF NOT EXISTS idx_compras_data ON compras (data_compra, id)",
+    ]),
+    (2, [
+        # comprador e fornecedor já são prefixo de índice; cidade ainda não
+        "CREATE INDEX IF NOT EXISTS idx_compras_cidade ON compras (cidade_destino)",
+    ]),
+    (3, [_migracao_normalizar]),
+    (4, [rollup.reconstruir]),
+    (5, [tarefas.criar_tabela]),
+    (6, [_migracao_busca]),
+    (7, [f"""
+        CREATE TABLE alteracoes (
+            id {ID_AUTOINCREMENT},
+            tipo TEXT NOT NULL,
+            item_id_ini INTEGER NOT NULL,
+            item_id_fim INTEGER NOT NULL,
+            criado_em BIGINT NOT NULL
+        )
+    """]),
+    (8, [
+        # Índices que cobrem as somas do rollup nas análises (consultas.py):
+        # ranking e séries por fornecedor, totais por período e itens por cidade
+        "CREATE INDEX IF NOT EXISTS idx_diarias_fornecedor_data ON compras_diarias (fornecedor_id, data_compra, quantidade)",
+        "CREATE INDEX IF NOT EXISTS idx_diarias_data ON compras_diarias (data_compra, quantidade, linhas)",
+        "CREATE INDEX IF NOT EXISTS idx_diarias_cidade_item ON compras_diarias (cidade_id, item, data_compra, quantidade)",
+    ]),
+    (9, [
+        # O log de alterações vira um contador só: os caches nunca leram
+        # mais que o maior id. A versão continua de onde o log parou.
+        "CREATE TABLE versao_dados (id INTEGER PRIMARY KEY, versao BIGINT NOT NULL)",
+        "INSERT INTO versao_dados (id, versao) SELECT 1, COALESCE(MAX(id), 0) FROM alteracoes",
+        "DROP TABLE alteracoes",
+    ]),
+    # Processo que enviou a tarefa ("host:pid"): ao subir, cada processo só
+    # marca como interrompidas as tarefas de processos que já acabaram
+    (10, ["ALTER TABLE tarefas ADD COLUMN dono TEXT"]),
+]
+
+
+def init_db():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_versao (versao INTEGER NOT NULL)"))
+        # Escrita vazia só para pegar o lock de escrita antes de ler a versão:
+        # processos subindo juntos (app, workers da API) migram um de cada vez.
+        conn.execute(text("UPDATE schema_versao SET versao = versao WHERE 1 = 0"))
+        atual = conn.execute(text("SELECT MAX(versao) FROM schema_versao")).scalar() or 0
+        if atual == 0:
+            # Schema original (tabela única); as migrações partem dele
+            conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS compras (
+                id {ID_AUTOINCREMENT},
+                comprador TEXT NOT NULL,
+                data_compra TEXT NOT NULL,
+                fornecedor TEXT NOT NULL,
+                cidade_destino TEXT NOT NULL,
+                item TEXT NOT NULL,
+                quantidade REAL NOT NULL,
+                criado_em TEXT NOT NULL
+            );
+            """))
+        for versao, comandos in MIGRACOES:
+            if versao <= atual:
+                continue
+            for cmd in comandos:
+                if callable(cmd):
+                    cmd(conn)
+                else:
+                    conn.execute(text(cmd))
+            conn.execute(text("INSERT INTO schema_versao (versao) VALUES (:v)"), {"v": versao})
+
+
+# ----------------------------
+# Versão dos dados
+# ----------------------------
+# Um contador numa linha só (versao_dados), somado na mesma transação de cada
+# gravação ou exclusão. Os caches do processo (resultados compartilhados em
+# consultas.py, catálogo em servico.py) comparam com ele para saber se ainda
+# valem. Toda escrita em pedido_itens precisa passar por aqui.
+def registrar_alteracao(conn) -> int:
+    """
+    Avança a versão dos dados e devolve a nova. Chamar no fim da transação da
+    escrita: no PostgreSQL o lock da linha (até o commit) garante que as
+    versões aparecem na ordem em que as transações terminam.
+    """
+    return conn.execute(
+        text("UPDATE versao_dados SET versao = versao + 1 WHERE id = 1 RETURNING versao")
+    ).scalar_one()
+
+
+# Definições Core das tabelas (usadas nos INSERTs com RETURNING)
+_meta = sa.MetaData()
+pedidos_tbl = sa.Table(
+    "pedidos",
+    _meta,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("comprador_id", sa.Integer),
+    sa.Column("fornecedor_id", sa.Integer),
+    sa.Column("cidade_id", sa.Integer),
+    sa.Column("data_compra", sa.Integer),
+    sa.Column("criado_em", sa.BigInteger),
+)
+pedido_itens_tbl = sa.Table(
+    "pedido_itens",
+    _meta,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("pedido_id", sa.Integer),
+    sa.Column("item", sa.Text),
+    sa.Column("quantidade", sa.Float),
+)
+
+
+def id_dimensao(conn, dimensao: str, nome: str) -> int:
+    """Id do nome na tabela de lookup, criando a linha se ainda não existir."""
+    tabela, _ = DIM_TABELAS[dimensao]
+    conn.execute(
+        text(f"INSERT INTO {tabela} (nome) VALUES (:nome) ON CONFLICT (nome) DO NOTHING"),
+        {"nome": nome},
+    )
+    return conn.execute(text(f"SELECT id FROM {tabela} WHERE nome = :nome"), {"nome": nome}).scalar_one()
+
+
+def ids_dimensao(conn, dimensao: str, nomes, conhecidos: dict | None = None) -> dict:
+    """
+    Versão em lote do id_dimensao: devolve {nome: id} para todos os nomes,
+    criando os que faltam com um executemany. `conhecidos` (nome -> id) evita
+    ir ao banco por nomes já resolvidos e é atualizado com os novos.
+    """
+    conhecidos = {} if conhecidos is None else conhecidos
+    faltando = [n for n in set(nomes) if n not in conhecidos]
+    if faltando:
+        tabela, _ = DIM_TABELAS[dimensao]
+        conn.execute(
+            text(f"INSERT INTO {tabela} (nome) VALUES (:nome) ON CONFLICT (nome) DO NOTHING"),
+            [{"nome": n} for n in faltando],
+        )
+        # IN em blocos: o SQLite limita o número de parâmetros por comando
+        for i in range(0, len(faltando), 500):
+            bloco = faltando[i:i + 500]
+            t = sa.table(tabela, sa.column("id"), sa.column("nome"))
+            conhecidos.update(
+                (nome, id_) for id_, nome in conn.execute(sa.select(t.c.id, t.c.nome).where(t.c.nome.in_(bloco)))
+            )
+    return {n: conhecidos[n] for n in nomes}
@@ -0,0 +1,100 @@
+"""
+Exportação das compras para CSV, Parquet ou Excel, direto do cursor.
+
+As linhas chegam em lotes (yield_per / fetchmany) e cada lote é escrito no
+arquivo antes de buscar o próximo: nada de DataFrame nem do arquivo inteiro
+em memória. No Parquet cada lote vira um row group.
+
+Cada lote é uma lista de tuplas
+    (comprador, data_compra em dias desde 1970, fornecedor, cidade, item, quantidade)
+"""
+import csv
+import io
+
+from esquema import dias_para_data
+
+COLUNAS = ["Comprador", "Data do pedido", "Fornecedor", "Cidade destino", "Item", "Quantidade"]
+LARGURAS_XLSX = [18, 16, 28, 22, 30, 12]
+LIMITE_LINHAS_XLSX = 1_048_575  # linhas de dados que cabem numa planilha
+
+# formato -> (rótulo, extensão, mime)
+FORMATOS = {
+    "xlsx": ("Excel", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV", "csv", "text/csv"),
+    "parquet": ("Parquet", "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def _linhas_formatadas(lotes):
+    """Linhas com a data em dd/mm/aaaa (CSV e Excel)."""
+    datas = {}  # poucas datas distintas: formata cada uma uma vez
+    for lote in lotes:
+        for comprador, dias, fornecedor, cidade, item, qtd in lote:
+            data_txt = datas.get(dias)
+            if data_txt is None:
+                data_txt = datas[dias] = dias_para_data(dias).strftime("%d/%m/%Y")
+            yield comprador, data_txt, fornecedor, cidade, item, qtd
+
+
+def escrever_csv(lotes, arq):
+    """CSV (;) em UTF-8 com BOM, que o Excel abre com acentos certos."""
+    txt = io.TextIOWrapper(arq, encoding="utf-8-sig", newline="")
+    try:
+        writer = csv.writer(txt, delimiter=";")
+        writer.writerow(COLUNAS)
+        writer.writerows(_linhas_formatadas(lotes))
+        txt.flush()
+    finally:
+        txt.detach()
+
+
+def escrever_xlsx(lotes, arq):
+    """openpyxl em modo write-only: as linhas vão direto para o arquivo."""
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Compras")
+    for i, largura in enumerate(LARGURAS_XLSX, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = largura
+    ws.append(COLUNAS)
+    for linha in _linhas_formatadas(lotes):
+        ws.append(linha)
+    wb.save(arq)
+
+
+def escrever_parquet(lotes, arq):
+    """Um row group por lote; data como date32 e quantidade como double."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("comprador", pa.string()),
+        ("data_compra", pa.date32()),
+        ("fornecedor", pa.string()),
+        ("cidade_destino", pa.string()),
+        ("item", pa.string()),
+        ("quantidade", pa.float64()),
+    ])
+    with pq.ParquetWriter(arq, schema, compression="zstd") as writer:
+        for lote in lotes:
+            if not lote:
+                continue
+            comprador, dias, fornecedor, cidade, item, qtd = zip(*lote)
+            writer.write_table(pa.Table.from_arrays([
+                pa.array(comprador, pa.string()),
+                # date32 também é "dias desde 1970": o inteiro do banco entra direto
+                pa.array(dias, pa.int32()).cast(pa.date32()),
+                pa.array(fornecedor, pa.string()),
+                pa.array(cidade, pa.string()),
+                pa.array(item, pa.string()),
+                pa.array(qtd, pa.float64()),
+            ], schema=schema))
+
+
+ESCRITORES = {"csv": escrever_csv, "xlsx": escrever_xlsx, "parquet": escrever_parquet}
+
+
+def exportar(lotes, formato: str, arq):
+    """Escreve os lotes no arquivo binário `arq` no formato pedido."""
+    ESCRITORES[formato](lotes, arq)
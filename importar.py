@@ -0,0 +1,290 @@
+"""
+Importação em lote de compras a partir de CSV ou XLSX.
+
+O arquivo é lido em blocos (LOTE_PADRAO linhas por vez), então a memória
+usada não cresce com o tamanho do arquivo. Cada bloco é validado com as
+mesmas regras do formulário e gravado numa transação própria: lookups,
+cabeçalhos de pedido, linhas e rollup vão em executemany. Linhas recusadas
+vão para um relatório CSV (número da linha, motivo e os valores lidos).
+
+Colunas aceitas (o cabeçalho do Excel/CSV exportado pelo app serve):
+    Comprador; Data do pedido; Fornecedor; Cidade destino; Item; Quantidade
+
+Uso:
+    python importar.py compras.csv [--rejeitadas rejeitadas.csv] [--lote 5000]
+"""
+import argparse
+import csv
+import io
+import operator
+import sys
+import time
+import unicodedata
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+import rollup
+from db import engine
+from esquema import (
+    DIM_TABELAS, agora_segundos, ids_dimensao, init_db, pedidos_tbl, pedido_itens_tbl, registrar_alteracao,
+)
+from validacao import validar_compras
+
+LOTE_PADRAO = 5000
+COLUNAS = ["comprador", "data_compra", "fornecedor", "cidade_destino", "item", "quantidade"]
+
+# Cabeçalho normalizado (sem acento, minúsculo, "_" no lugar de espaço) -> coluna
+ALIASES = {
+    "comprador": "comprador",
+    "solicitante": "comprador",
+    "data_compra": "data_compra",
+    "data_do_pedido": "data_compra",
+    "data_da_compra": "data_compra",
+    "data": "data_compra",
+    "fornecedor": "fornecedor",
+    "cidade_destino": "cidade_destino",
+    "cidade_de_destino": "cidade_destino",
+    "cidade": "cidade_destino",
+    "destino": "cidade_destino",
+    "item": "item",
+    "material": "item",
+    "quantidade": "quantidade",
+    "qtd": "quantidade",
+    "qtde": "quantidade",
+}
+
+
+class ErroImportacao(ValueError):
+    """Arquivo que não dá para importar (formato ou colunas)."""
+
+
+def _normalizar_cabecalho(nome) -> str:
+    sem_acento = unicodedata.normalize("NFKD", str(nome or "")).encode("ascii", "ignore").decode()
+    return "_".join(sem_acento.casefold().split())
+
+
+def _mapear_colunas(cabecalho) -> list:
+    """Nome canônico de cada coluna do arquivo (None para as que não usamos)."""
+    mapa = [ALIASES.get(_normalizar_cabecalho(c)) for c in cabecalho]
+    faltando = [c for c in COLUNAS if c not in mapa]
+    if faltando:
+        raise ErroImportacao(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+    return mapa
+
+
+# ----------------------------
+# Leitura em blocos
+# ----------------------------
+def _blocos_csv(fonte, lote: int, encoding: str):
+    texto = io.TextIOWrapper(fonte, encoding=encoding, newline="")
+    try:
+        primeira = texto.readline()
+        # O app exporta com ";"; planilhas de outras origens costumam vir com ","
+        sep = max(";,\t", key=primeira.count)
+        cabecalho = next(csv.reader([primeira], delimiter=sep))
+        mapa = _mapear_colunas(cabecalho)
+        usar = [i for i, c in enumerate(mapa) if c is not None]
+        leitor = csv.reader(texto, delimiter=sep)
+        colunas = operator.itemgetter(*usar)
+        largura = max(usar) + 1
+        while True:
+            linhas, numeros = [], []
+            for campos in leitor:
+                if len(campos) < largura:
+                    campos += [""] * (largura - len(campos))
+                valores = colunas(campos)
+                # Linhas vazias (em branco ou só separadores) não contam
+                if "".join(valores).strip():
+                    linhas.append(valores)
+                    # line_num do leitor conta a partir da segunda linha do arquivo
+                    numeros.append(leitor.line_num + 1)
+                    if len(linhas) == lote:
+                        break
+            if not linhas:
+                break
+            yield pd.DataFrame(linhas, columns=[mapa[i] for i in usar], index=numeros, dtype="str")
+    finally:
+        # Não deixa o wrapper fechar o arquivo de quem chamou
+        texto.detach()
+
+
+def _blocos_xlsx(fonte, lote: int):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(fonte, read_only=True, data_only=True)
+    try:
+        linhas = wb.active.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        mapa = _mapear_colunas(cabecalho)
+        usar = [i for i, c in enumerate(mapa) if c is not None]
+        inicio = 2  # número da linha na planilha (cabeçalho = linha 1)
+        while True:
+            bloco = list(islice(linhas, lote))
+            if not bloco:
+                break
+            df = pd.DataFrame(bloco, dtype=object, index=range(inicio, inicio + len(bloco)))
+            df = df.reindex(columns=usar)
+            inicio += len(bloco)
+            # Linhas totalmente vazias (comuns no fim da planilha) não contam
+            df = df.dropna(how="all")
+            yield df.rename(columns={i: mapa[i] for i in usar})
+    finally:
+        wb.close()
+
+
+# ----------------------------
+# Validação (mesmas regras do formulário)
+# ----------------------------
+def validar_bloco(bruto: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Devolve (bloco tipado, motivos). motivos é "" nas linhas válidas e a lista
+    de problemas (separados por "; ") nas demais.
+    """
+    validacao = validar_compras(bruto[COLUNAS])
+    return validacao.valores, validacao.motivos
+
+
+# ----------------------------
+# Gravação
+# ----------------------------
+CHAVE_PEDIDO = ["comprador_id", "fornecedor_id", "cidade_id", "data_compra"]
+CHAVE_ROLLUP = ["fornecedor_id", "cidade_id", "item", "data_compra"]
+
+
+def gravar_bloco(conn, validos: pd.DataFrame, conhecidos: dict, criado_em: int) -> int:
+    """
+    Grava as linhas válidas de um bloco. Linhas com o mesmo comprador,
+    fornecedor, cidade e data viram um pedido só. Devolve o número de pedidos.
+    """
+    validos = validos.assign(data_compra=validos["data_compra"].astype("int64"))
+    for dim, (_, fk) in DIM_TABELAS.items():
+        nomes = validos[dim].unique().tolist()
+        validos[fk] = validos[dim].map(ids_dimensao(conn, dim, nomes, conhecidos[dim]))
+
+    # ngroup(sort=False) numera na ordem de aparição, a mesma do drop_duplicates
+    grupo = validos.groupby(CHAVE_PEDIDO, sort=False).ngroup().to_numpy()
+    cabecalhos = validos[CHAVE_PEDIDO].drop_duplicates().assign(criado_em=criado_em)
+    pedido_ids = conn.execute(
+        sa.insert(pedidos_tbl).returning(pedidos_tbl.c.id, sort_by_parameter_order=True),
+        cabecalhos.to_dict("records"),
+    ).scalars().all()
+
+    itens = pd.DataFrame({
+        "pedido_id": np.asarray(pedido_ids, dtype="int64")[grupo],
+        "item": validos["item"].to_numpy(),
+        "quantidade": validos["quantidade"].to_numpy(dtype="float64"),
+    })
+    # Com RETURNING o SQLAlchemy junta as linhas em INSERTs de várias linhas
+    # (insertmanyvalues); um executemany simples dispara um flush do índice de
+    # busca (FTS5, via trigger) a cada linha e deixa a importação 2x mais lenta.
+    conn.execute(
+        sa.insert(pedido_itens_tbl).returning(pedido_itens_tbl.c.id), itens.to_dict("records"),
+    ).all()
+
+    somas = (
+        validos.groupby(CHAVE_ROLLUP, sort=False)["quantidade"]
+        .agg(quantidade="sum", linhas="size")
+        .reset_index()
+    )
+    rollup.somar_agregado(conn, somas.to_dict("records"))
+    registrar_alteracao(conn)
+    return len(pedido_ids)
+
+
+def importar_arquivo(fonte, nome: str, *, rejeitadas=None, lote: int = LOTE_PADRAO,
+                     encoding: str = "utf-8-sig", ao_progredir=None) -> dict:
+    """
+    Importa um CSV/XLSX. fonte: caminho ou arquivo binário; nome: usado para
+    saber o formato pela extensão. rejeitadas: arquivo texto onde gravar o
+    relatório de linhas recusadas (None = não grava).
+    Cada bloco é uma transação: se a gravação falhar no meio, os blocos
+    anteriores ficam gravados e o erro sobe.
+    ao_progredir(resumo) é chamado ao fim de cada bloco.
+    """
+    if isinstance(fonte, (str, Path)):
+        with open(fonte, "rb") as arq:
+            return importar_arquivo(arq, nome, rejeitadas=rejeitadas, lote=lote,
+                                    encoding=encoding, ao_progredir=ao_progredir)
+
+    extensao = Path(nome).suffix.casefold()
+    if extensao == ".csv":
+        blocos = _blocos_csv(fonte, lote, encoding)
+    elif extensao in (".xlsx", ".xlsm"):
+        blocos = _blocos_xlsx(fonte, lote)
+    else:
+        raise ErroImportacao(f"Formato não suportado: {extensao or nome} (use .csv ou .xlsx)")
+
+    relatorio = None
+    if rejeitadas is not None:
+        relatorio = csv.writer(rejeitadas, delimiter=";")
+        relatorio.writerow(["linha", "motivo", *COLUNAS])
+
+    resumo = {"lidas": 0, "importadas": 0, "rejeitadas": 0, "pedidos": 0, "segundos": 0.0}
+    conhecidos = {dim: {} for dim in DIM_TABELAS}
+    inicio = time.perf_counter()
+    # O índice de cada bloco é o número da linha no arquivo (cabeçalho = linha 1)
+    for bruto in blocos:
+        bloco, motivos = validar_bloco(bruto)
+        ok = motivos == ""
+        if ok.any():
+            with engine.begin() as conn:
+                resumo["pedidos"] += gravar_bloco(conn, bloco[ok], conhecidos, agora_segundos())
+        if relatorio is not None and not ok.all():
+            ruins = bruto.loc[~ok, COLUNAS].fillna("")
+            relatorio.writerows(
+                [linha, motivo, *valores]
+                for linha, motivo, valores in zip(ruins.index, motivos[~ok], ruins.itertuples(index=False))
+            )
+        resumo["lidas"] += len(bloco)
+        resumo["importadas"] += int(ok.sum())
+        resumo["rejeitadas"] += int((~ok).sum())
+        resumo["segundos"] = time.perf_counter() - inicio
+        if ao_progredir is not None:
+            ao_progredir(resumo)
+    return resumo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa compras de um CSV ou XLSX.")
+    parser.add_argument("arquivo", type=Path)
+    parser.add_argument("--rejeitadas", type=Path, default=None,
+                        help="relatório das linhas recusadas (padrão: <arquivo>.rejeitadas.csv)")
+    parser.add_argument("--lote", type=int, default=LOTE_PADRAO, help="linhas por transação")
+    parser.add_argument("--encoding", default="utf-8-sig", help="encoding do CSV (ex.: latin-1)")
+    args = parser.parse_args(argv)
+
+    caminho_rej = args.rejeitadas or args.arquivo.with_name(args.arquivo.name + ".rejeitadas.csv")
+    init_db()
+
+    def progresso(r):
+        print(f"\r{r['lidas']:,} linhas lidas ({r['rejeitadas']:,} recusadas)", end="", file=sys.stderr)
+
+    try:
+        with open(caminho_rej, "w", encoding="utf-8-sig", newline="") as rej:
+            resumo = importar_arquivo(args.arquivo, args.arquivo.name, rejeitadas=rej, lote=args.lote,
+                                      encoding=args.encoding, ao_progredir=progresso)
+    except ErroImportacao as e:
+        print(f"erro: {e}", file=sys.stderr)
+        return 2
+    print(file=sys.stderr)
+
+    por_minuto = resumo["lidas"] / resumo["segundos"] * 60 if resumo["segundos"] else 0
+    print(
+        f"{resumo['importadas']:,} linhas importadas em {resumo['pedidos']:,} pedidos; "
+        f"{resumo['rejeitadas']:,} recusadas; {resumo['segundos']:.1f}s ({por_minuto:,.0f} linhas/min)"
+    )
+    if resumo["rejeitadas"]:
+        print(f"relatório das recusadas: {caminho_rej}")
+    else:
+        caminho_rej.unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+Geração do PDF do pedido de compra (ReportLab).
+
+O ReportLab só é importado no primeiro PDF; estilos e comandos de tabela
+são montados uma vez por processo.
+Pedidos em lote são renderizados num pool de processos (a renderização é
+CPU-bound e não paraleliza com threads por causa do GIL).
+"""
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+# ----------------------------
+# Estilos (cache do módulo)
+# ----------------------------
+# O ReportLab (~200 ms só de import) é carregado no primeiro PDF do processo,
+# não na importação deste módulo: o app importa nome_arquivo_pdf e
+# pedidos_em_lote em todo rerun, e quem só lança compras não usa o PDF.
+# Estilos e comandos de tabela são montados uma vez e ficam em _estilos.
+_estilos = {}
+_estilos_lock = threading.Lock()
+
+MM = 72 / 2.54 * 0.1  # pontos por milímetro, como reportlab.lib.units.mm
+COL_MATERIAL = 130 * MM
+COL_QUANTIDADE = 35 * MM
+PADDING_H = 8 + 8
+PADDING_V = 6 + 6
+# Texto que cabe na largura útil da coluna Material (medido na fonte da
+# tabela) vai como string simples, bem mais barato; o resto vira Paragraph,
+# que quebra linha.
+LARGURA_MATERIAL = COL_MATERIAL - PADDING_H
+
+
+def _estilos_pdf() -> dict:
+    with _estilos_lock:
+        if not _estilos:
+            _estilos.update(_montar_estilos())
+        return _estilos
+
+
+def _montar_estilos() -> dict:
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+
+    azul_escuro = colors.HexColor("#1f2a6d")
+    azul_medio = colors.HexColor("#2b2f88")
+    cinza_txt = colors.HexColor("#334155")
+    zebra = [colors.whitesmoke, colors.HexColor("#eef2ff")]
+
+    styles = getSampleStyleSheet()
+    value = ParagraphStyle(
+        "Value",
+        parent=styles["Normal"],
+        fontName="Helvetica",
+        fontSize=10,
+        textColor=cinza_txt,
+        leading=13,
+    )
+    return {
+        "titulo": ParagraphStyle(
+            "TitleCustom",
+            parent=styles["Title"],
+            fontName="Helvetica-Bold",
+            fontSize=18,
+            textColor=azul_escuro,
+            spaceAfter=10,
+        ),
+        "rotulo": ParagraphStyle(
+            "Label",
+            parent=styles["Normal"],
+            fontName="Helvetica-Bold",
+            fontSize=10,
+            textColor=azul_escuro,
+            leading=13,
+        ),
+        "valor": value,
+        "tabela_info": TableStyle([
+            ("BACKGROUND", (0, 0), (-1, -1), colors.whitesmoke),
+            ("BOX", (0, 0), (-1, -1), 0.6, colors.HexColor("#cbd5e1")),
+            ("INNERGRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#e2e8f0")),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("LEFTPADDING", (0, 0), (-1, -1), 8),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+            ("TOPPADDING", (0, 0), (-1, -1), 6),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+        ]),
+        # Células de texto simples herdam fonte/cor daqui (mesmo visual do estilo "valor")
+        "tabela_itens": TableStyle([
+            ("FONTNAME", (0, 0), (-1, -1), value.fontName),
+            ("FONTSIZE", (0, 0), (-1, -1), value.fontSize),
+            ("LEADING", (0, 0), (-1, -1), value.leading),
+            ("TEXTCOLOR", (0, 1), (-1, -1), cinza_txt),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("BACKGROUND", (0, 0), (-1, 0), azul_medio),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("ROWBACKGROUNDS", (0, 1), (-1, -1), zebra),
+            ("ALIGN", (1, 1), (1, -1), "RIGHT"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("BOX", (0, 0), (-1, -1), 0.8, colors.HexColor("#94a3b8")),
+            ("INNERGRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#cbd5e1")),
+            ("LEFTPADDING", (0, 0), (-1, -1), 8),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+            ("TOPPADDING", (0, 0), (-1, -1), 6),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+        ]),
+    }
+
+
+def _celula_material(texto: str, estilo):
+    """Devolve (célula, altura da linha)."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    linhas = texto.split("\n")
+    if max(stringWidth(linha, estilo.fontName, estilo.fontSize) for linha in linhas) <= LARGURA_MATERIAL:
+        return texto, estilo.leading * len(linhas) + PADDING_V
+    from reportlab.platypus import Paragraph
+
+    p = Paragraph(escape(texto), estilo)
+    _, altura = p.wrap(LARGURA_MATERIAL, 10_000)
+    return p, max(altura, estilo.leading) + PADDING_V
+
+
+def gerar_pdf_pedido(
+    *,
+    numero_pedido: str,
+    data_pedido: date,
+    cnpj_faturamento: str,
+    solicitante: str,
+    fornecedor: str,
+    destino: str,
+    observacoes: str,
+    itens_df: pd.DataFrame,
+) -> bytes:
+    """
+    Gera PDF bonito (A4) com cabeçalho azul e tabela de itens.
+    itens_df precisa ter colunas: Material, Quantidade
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+
+    e = _estilos_pdf()
+    buf = BytesIO()
+    doc = SimpleDocTemplate(
+        buf,
+        pagesize=A4,
+        leftMargin=18 * MM,
+        rightMargin=18 * MM,
+        topMargin=16 * MM,
+        bottomMargin=16 * MM,
+        title="Pedido de Compra",
+        author="Sistema de Compras",
+    )
+
+    elements = []
+
+    elements.append(Paragraph("PEDIDO DE COMPRA", e["titulo"]))
+
+    # Bloco de informações (2 colunas)
+    info_rows = [
+        [Paragraph("Nº do pedido:", e["rotulo"]), Paragraph(numero_pedido or "-", e["valor"]),
+         Paragraph("Data:", e["rotulo"]), Paragraph(data_pedido.strftime("%d/%m/%Y"), e["valor"])],
+        [Paragraph("CNPJ faturamento:", e["rotulo"]), Paragraph(cnpj_faturamento or "-", e["valor"]),
+         Paragraph("Solicitante:", e["rotulo"]), Paragraph(solicitante or "-", e["valor"])],
+        [Paragraph("Fornecedor:", e["rotulo"]), Paragraph(fornecedor or "-", e["valor"]),
+         Paragraph("Destino (cidade):", e["rotulo"]), Paragraph(destino or "-", e["valor"])],
+    ]
+    info_table = Table(info_rows, colWidths=[32*MM, 63*MM, 28*MM, 55*MM])
+    info_table.setStyle(e["tabela_info"])
+    elements.append(info_table)
+    elements.append(Spacer(1, 10))
+
+    if observacoes and observacoes.strip():
+        obs = observacoes.strip().replace("\n", "<br/>")
+        elements.append(Paragraph("Observações:", e["rotulo"]))
+        elements.append(Paragraph(obs, e["valor"]))
+        elements.append(Spacer(1, 10))
+
+    # Tabela de itens: colunas extraídas de uma vez, sem iterrows
+    materiais = itens_df["Material"].fillna("").astype(str).str.strip().tolist()
+    quantidades = itens_df["Quantidade"].astype(str).tolist()
+
+    data = [["Material", "Quantidade"]]
+    alturas = [e["valor"].leading + PADDING_V]
+    for m, q in zip(materiais, quantidades):
+        celula, altura = _celula_material(m, e["valor"])
+        data.append([celula, q])
+        alturas.append(altura)
+
+    # Alturas já calculadas: o ReportLab não precisa medir todas as linhas de
+    # novo a cada quebra de página. repeatRows=1 repete o cabeçalho por página.
+    t = Table(data, colWidths=[COL_MATERIAL, COL_QUANTIDADE], rowHeights=alturas, repeatRows=1)
+    t.setStyle(e["tabela_itens"])
+    elements.append(t)
+
+    doc.build(elements)
+    return buf.getvalue()
+
+
+def nome_arquivo_pdf(fornecedor: str, destino: str, data_pedido: date) -> str:
+    nome = f"pedido_{fornecedor}_{destino}_{data_pedido.strftime('%Y-%m-%d')}.pdf"
+    return nome.replace(" ", "_").replace("/", "-")
+
+
+# ----------------------------
+# Lote (pool de processos)
+# ----------------------------
+PDF_MAX_WORKERS = int(os.environ.get("COMPRAS_PDF_WORKERS", min(4, os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pool_pdf() -> ProcessPoolExecutor:
+    """Pool único por processo: o limite de workers vale para todas as sessões."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: o servidor do Streamlit tem várias threads, e fork nesse
+            # cenário pode herdar locks travados.
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def pedidos_em_lote(lote: pd.DataFrame, *, numero_pedido: str, data_pedido: date, **cabecalho) -> dict:
+    """
+    Um pedido por fornecedor + destino a partir dos itens somados do lote
+    (colunas fornecedor, cidade_destino, Material, Quantidade).
+    Devolve nome do arquivo -> argumentos de gerar_pdf_pedido; o nº do pedido,
+    se informado, ganha um sufixo sequencial.
+    """
+    pedidos = {}
+    grupos = lote.groupby(["fornecedor", "cidade_destino"], sort=True)
+    for seq, ((forn, cidade), grupo) in enumerate(grupos, start=1):
+        nome = f"{seq:03d}_{nome_arquivo_pdf(forn, cidade, data_pedido)}"
+        pedidos[nome] = dict(
+            numero_pedido=f"{numero_pedido}-{seq:03d}" if numero_pedido else "",
+            data_pedido=data_pedido,
+            fornecedor=forn,
+            destino=cidade,
+            itens_df=grupo[["Material", "Quantidade"]].reset_index(drop=True),
+            **cabecalho,
+        )
+    return pedidos
+
+
+def _gerar_pdf_campos(campos: dict) -> bytes:
+    return gerar_pdf_pedido(**campos)
+
+
+def gerar_pdfs_lote(pedidos: dict):
+    """
+    pedidos: nome do arquivo -> argumentos de gerar_pdf_pedido.
+    Devolve (nome, bytes) na ordem em que os PDFs ficam prontos.
+    """
+    global _pool
+    pool = _pool_pdf()
+    futuros = {pool.submit(_gerar_pdf_campos, campos): nome for nome, campos in pedidos.items()}
+    try:
+        for fut in as_completed(futuros):
+            yield futuros[fut], fut.result()
+    except BrokenProcessPool:
+        # Um worker morreu: descarta o pool para o próximo lote criar outro
+        with _pool_lock:
+            _pool = None
+        raise
+    finally:
+        for fut in futuros:
+            fut.cancel()
+
+
+def zip_pedidos(pedidos: dict, arq, ao_progredir=None):
+    """
+    Gera os PDFs em paralelo e grava cada um no ZIP (arquivo binário `arq`)
+    assim que fica pronto. ao_progredir(prontos, total) é chamado a cada PDF concluído.
+    """
+    with zipfile.ZipFile(arq, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for i, (nome, pdf) in enumerate(gerar_pdfs_lote(pedidos), start=1):
+            zf.writestr(nome, pdf)
+            if ao_progredir is not None:
+                ao_progredir(i, len(pedidos))
@@ -0,0 +1,201 @@
+"""
+Medição de tempo por etapa (KPIs, grade, exportação, PDF...)
+e por consulta SQL.
+
+    with perfil.medir("kpis"):
+        ...
+
+    @perfil.medido("pdf")
+    def gerar(...): ...
+
+Cada rerun do app abre uma coleta (iniciar_rerun / fim_rerun); o Streamlit
+roda cada sessão numa thread, então a coleta é por thread. Além disso, as
+últimas JANELA medições de cada etapa ficam num acumulado do processo
+(todas as sessões) para p50/p95. Com COMPRAS_PERFIL_LOG definido, cada rerun
+vira uma linha JSON nesse arquivo, e o resumo do log sai com:
+
+    python perfil.py compras_perfil.jsonl
+
+Variáveis de ambiente:
+  COMPRAS_PERFIL_LOG    arquivo JSON-lines com os tempos de cada rerun
+  COMPRAS_ADMIN_TOKEN   libera o painel "Desempenho" na sidebar (?admin=<token>)
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+from sqlalchemy import event
+
+from db import engine
+
+ARQUIVO_LOG = os.environ.get("COMPRAS_PERFIL_LOG") or None
+ADMIN_TOKEN = os.environ.get("COMPRAS_ADMIN_TOKEN") or None
+JANELA = 2000  # medições guardadas por etapa para os percentis
+
+_local = threading.local()
+_lock = threading.Lock()
+_etapas = defaultdict(lambda: deque(maxlen=JANELA))
+_consultas = defaultdict(lambda: deque(maxlen=JANELA))
+
+
+# ----------------------------
+# Coleta
+# ----------------------------
+def _somar_no_rerun(etapa: str, ms: float):
+    coleta = getattr(_local, "coleta", None)
+    if coleta is not None:
+        coleta[etapa] = coleta.get(etapa, 0.0) + ms
+
+
+def _registrar(etapa: str, ms: float):
+    with _lock:
+        _etapas[etapa].append(ms)
+    _somar_no_rerun(etapa, ms)
+
+
+@contextmanager
+def medir(etapa: str):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar(etapa, (time.perf_counter() - inicio) * 1000)
+
+
+def medido(etapa: str):
+    """Decorator: mede cada chamada da função como `etapa`."""
+    def decorar(funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            with medir(etapa):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorar
+
+
+def iniciar_rerun():
+    _local.coleta = {}
+    _local.inicio = time.perf_counter()
+    _local.sql = 0
+
+
+def fim_rerun(sessao: str | None = None) -> dict:
+    """Fecha a coleta do rerun, grava no log (se ligado) e devolve {etapa: ms}."""
+    coleta = getattr(_local, "coleta", None)
+    if coleta is None:
+        return {}
+    total = (time.perf_counter() - _local.inicio) * 1000
+    _local.coleta = None
+    _registrar("rerun", total)
+    # "sql" no acumulado é o total de SQL do rerun (por consulta: resumo_sql)
+    with _lock:
+        _etapas["sql"].append(coleta.get("sql", 0.0))
+    coleta = {"rerun": total, **coleta}
+    if ARQUIVO_LOG:
+        linha = {
+            "ts": round(time.time(), 3),
+            "pid": os.getpid(),
+            "sessao": sessao,
+            "consultas_sql": _local.sql,
+            "etapas": {k: round(v, 2) for k, v in coleta.items()},
+        }
+        with _lock, open(ARQUIVO_LOG, "a", encoding="utf-8") as arq:
+            arq.write(json.dumps(linha, ensure_ascii=False) + "\n")
+    return coleta
+
+
+# ----------------------------
+# SQL (eventos do SQLAlchemy)
+# ----------------------------
+def _assinatura(sql: str) -> str:
+    """Consulta sem espaços repetidos e cortada, para agrupar no resumo."""
+    return re.sub(r"\s+", " ", sql).strip()[:90]
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("perfil_inicio", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info["perfil_inicio"].pop()
+    ms = (time.perf_counter() - inicio) * 1000
+    with _lock:
+        _consultas[_assinatura(statement)].append(ms)
+    if getattr(_local, "coleta", None) is not None:
+        _somar_no_rerun("sql", ms)
+        _local.sql += 1
+
+
+@event.listens_for(engine, "handle_error")
+def _erro_sql(contexto):
+    # Sem after_cursor_execute quando a consulta falha: descarta o início
+    if contexto.connection is not None and contexto.connection.info.get("perfil_inicio"):
+        contexto.connection.info["perfil_inicio"].pop()
+
+
+# ----------------------------
+# Resumo
+# ----------------------------
+def _percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def _resumir(series: dict, chave: str) -> list[dict]:
+    linhas = [
+        {
+            chave: nome,
+            "n": len(valores),
+            "p50_ms": round(_percentil(valores, 0.50), 2),
+            "p95_ms": round(_percentil(valores, 0.95), 2),
+            "max_ms": round(max(valores), 2),
+        }
+        for nome, valores in series.items() if valores
+    ]
+    return sorted(linhas, key=lambda l: l["p95_ms"], reverse=True)
+
+
+def resumo_etapas() -> list[dict]:
+    """p50/p95 por etapa no processo (todas as sessões)."""
+    with _lock:
+        series = {k: list(v) for k, v in _etapas.items()}
+    return _resumir(series, "etapa")
+
+
+def resumo_sql(limite: int = 15) -> list[dict]:
+    """Consultas mais lentas (p95) no processo."""
+    with _lock:
+        series = {k: list(v) for k, v in _consultas.items()}
+    return _resumir(series, "consulta")[:limite]
+
+
+def resumo_log(caminho: str) -> list[dict]:
+    """p50/p95 por etapa a partir do log JSON-lines (todos os processos)."""
+    series = defaultdict(list)
+    with open(caminho, encoding="utf-8") as arq:
+        for linha in arq:
+            if linha.strip():
+                for etapa, ms in json.loads(linha)["etapas"].items():
+                    series[etapa].append(ms)
+    return _resumir(series, "etapa")
+
+
+def admin_liberado(query_params) -> bool:
+    return ADMIN_TOKEN is not None and query_params.get("admin") == ADMIN_TOKEN
+
+
+if __name__ == "__main__":
+    caminho = sys.argv[1] if len(sys.argv) > 1 else ARQUIVO_LOG
+    if not caminho:
+        sys.exit("uso: python perfil.py <arquivo.jsonl>")
+    print(f"{'etapa':<24}{'n':>8}{'p50 ms':>12}{'p95 ms':>12}{'max ms':>12}")
+    for l in resumo_log(caminho):
+        print(f"{l['etapa']:<24}{l['n']:>8}{l['p50_ms']:>12.2f}{l['p95_ms']:>12.2f}{l['max_ms']:>12.2f}")
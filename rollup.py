@@ -0,0 +1,97 @@
+"""
+Rollup diário das quantidades compradas: compras_diarias.
+
+Uma linha por (fornecedor, cidade destino, item, dia) com a quantidade somada
+e o número de linhas de pedido que entraram na soma. É mantido na mesma
+transação das gravações/exclusões em pedido_itens, então montar um pedido lê
+poucas linhas já somadas em vez de todo o histórico.
+
+Reconstruir a partir dos dados existentes:
+    python rollup.py
+"""
+from sqlalchemy import text
+
+from db import engine
+
+SQL_CRIAR = """
+    CREATE TABLE IF NOT EXISTS compras_diarias (
+        fornecedor_id INTEGER NOT NULL,
+        cidade_id INTEGER NOT NULL,
+        item TEXT NOT NULL,
+        data_compra INTEGER NOT NULL,
+        quantidade REAL NOT NULL,
+        linhas INTEGER NOT NULL,
+        PRIMARY KEY (fornecedor_id, cidade_id, item, data_compra)
+    )
+"""
+
+SQL_SOMAR = """
+    INSERT INTO compras_diarias (fornecedor_id, cidade_id, item, data_compra, quantidade, linhas)
+    VALUES (:fornecedor_id, :cidade_id, :item, :data_compra, :quantidade, :linhas)
+    ON CONFLICT (fornecedor_id, cidade_id, item, data_compra) DO UPDATE SET
+        quantidade = compras_diarias.quantidade + excluded.quantidade,
+        linhas = compras_diarias.linhas + excluded.linhas
+"""
+
+SQL_SUBTRAIR = """
+    UPDATE compras_diarias
+    SET quantidade = quantidade - :quantidade, linhas = linhas - 1
+    WHERE fornecedor_id = :fornecedor_id AND cidade_id = :cidade_id
+      AND item = :item AND data_compra = :data_compra
+"""
+
+SQL_LIMPAR = """
+    DELETE FROM compras_diarias
+    WHERE fornecedor_id = :fornecedor_id AND cidade_id = :cidade_id
+      AND item = :item AND data_compra = :data_compra AND linhas <= 0
+"""
+
+
+def criar_tabela(conn):
+    conn.execute(text(SQL_CRIAR))
+
+
+def somar_linhas(conn, chave: dict, itens: list[dict]):
+    """
+    Soma as linhas novas no rollup (executemany).
+    chave: fornecedor_id, cidade_id, data_compra; itens: dicts com item e quantidade.
+    """
+    if itens:
+        somar_agregado(conn, [{**chave, "item": it["item"], "quantidade": it["quantidade"], "linhas": 1} for it in itens])
+
+
+def somar_agregado(conn, linhas: list[dict]):
+    """
+    Soma no rollup linhas já agregadas (importação em lote): cada dict tem
+    fornecedor_id, cidade_id, item, data_compra, quantidade e linhas.
+    """
+    if linhas:
+        conn.execute(text(SQL_SOMAR), linhas)
+
+
+def subtrair_linha(conn, linha: dict):
+    """Tira uma linha excluída do rollup (fornecedor_id, cidade_id, data_compra, item, quantidade)."""
+    params = {k: linha[k] for k in ("fornecedor_id", "cidade_id", "item", "data_compra", "quantidade")}
+    conn.execute(text(SQL_SUBTRAIR), params)
+    conn.execute(text(SQL_LIMPAR), params)
+
+
+def reconstruir(conn=None):
+    """Refaz compras_diarias inteira a partir de pedidos + pedido_itens."""
+    if conn is None:
+        with engine.begin() as conn:
+            return reconstruir(conn)
+    criar_tabela(conn)
+    conn.execute(text("DELETE FROM compras_diarias"))
+    conn.execute(text("""
+        INSERT INTO compras_diarias (fornecedor_id, cidade_id, item, data_compra, quantidade, linhas)
+        SELECT p.fornecedor_id, p.cidade_id, i.item, p.data_compra, SUM(i.quantidade), COUNT(*)
+        FROM pedido_itens i JOIN pedidos p ON p.id = i.pedido_id
+        GROUP BY p.fornecedor_id, p.cidade_id, i.item, p.data_compra
+    """))
+    return conn.execute(text("SELECT COUNT(*) FROM compras_diarias")).scalar_one()
+
+
+if __name__ == "__main__":
+    total = reconstruir()
+    print(f"compras_diarias reconstruída: {total} linhas")
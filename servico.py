@@ -0,0 +1,535 @@
+"""
+Serviços do sistema de compras, sem interface: gravação e exclusão de
+compras, catálogo de opções das dimensões, busca por texto, exportação em
+arquivo, PDFs dos pedidos e as funções que as tarefas em segundo plano
+executam.
+
+O app.py é só a tela: chama iniciar() no começo de cada rerun (o banco é
+preparado uma vez por processo) e aquecer() no primeiro, e usa estas funções
+e as de consultas.py. `python servico.py` aquece o banco antes de o
+container subir os servidores.
+Os caches daqui são do processo, compartilhados por todas as sessões.
+"""
+import bisect
+import difflib
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy import text
+
+import perfil
+import rollup
+from consultas import (
+    SQL_FROM_COMPRAS, FiltrosCompras, ResultadoBusca, buscar_compras,
+    iter_lotes_export, kpis_compras, pagina_compras, termos_busca, versao_tabela,
+)
+from db import engine
+from esquema import (
+    DIM_TABELAS, agora_segundos, data_para_dias, id_dimensao, init_db, pedidos_tbl, pedido_itens_tbl,
+    registrar_alteracao,
+)
+from exportar import exportar
+from importar import importar_arquivo
+from pedido_pdf import gerar_pdf_pedido, zip_pedidos
+
+DIMENSOES = ("comprador", "fornecedor", "cidade_destino")
+CAMPOS_BUSCA = ("item", "fornecedor", "cidade_destino")
+BUSCA_MAX_ALTERNATIVAS = 30  # palavras do índice que um prefixo digitado pode virar
+PALAVRAS_VAZIAS = {"a", "o", "e", "de", "da", "do", "das", "dos", "em", "na", "no", "para", "com"}
+EXPORT_CACHE_MAX_ARQUIVOS = 8
+PDF_CACHE_MAX_ITENS = 32
+PDF_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_inicio_lock = threading.Lock()
+_iniciado = False
+_aquecido = False
+
+
+def iniciar():
+    """Prepara o banco (migrações) na primeira chamada do processo; depois não faz nada."""
+    global _iniciado
+    if _iniciado:
+        return
+    with _inicio_lock:
+        if not _iniciado:
+            init_db()
+            _iniciado = True
+
+
+@perfil.medido("aquecer")
+def aquecer(limite_pagina: int | None = None):
+    """
+    Deixa o processo pronto para o primeiro usuário: banco preparado,
+    catálogo de opções, vocabulário da busca e, no cache compartilhado, os
+    KPIs e a primeira página da grade sem filtros (a tela de quem abre o
+    app). `limite_pagina` é o tamanho de página da tela (None = não busca
+    a página). Só a primeira chamada do processo faz algo.
+    """
+    global _aquecido
+    with _inicio_lock:
+        if _aquecido:
+            return
+        _aquecido = True
+    iniciar()
+    with _catalogo["lock"]:
+        _catalogo_conferir()
+        _termos()
+    versao = versao_tabela()
+    kpis_compras(FiltrosCompras(), versao)
+    if limite_pagina:
+        pagina_compras(FiltrosCompras(), None, limite_pagina, versao)
+
+
+# ----------------------------
+# Gravação
+# ----------------------------
+def inserir_compras_lote(cabecalho: dict, linhas) -> list[int]:
+    """
+    Grava uma compra (um pedido + suas linhas) numa única transação; as linhas
+    vão num executemany.
+    cabecalho: comprador, data_compra, fornecedor, cidade_destino
+    linhas: pares (item, quantidade)
+    Se qualquer linha falhar, nada é gravado. Devolve os ids novos das linhas, na ordem.
+    """
+    return inserir_pedidos([(cabecalho, linhas)])[0]
+
+
+def inserir_pedidos(pedidos) -> list[list[int]]:
+    """
+    Grava vários pedidos, pares (cabeçalho, linhas) como os de
+    inserir_compras_lote, numa única transação: se qualquer um falhar, nenhum
+    é gravado. Devolve, para cada pedido, os ids novos das linhas, na ordem.
+    """
+    preparados = []
+    for cabecalho, linhas in pedidos:
+        cab = {
+            "comprador": cabecalho["comprador"].strip(),
+            "fornecedor": cabecalho["fornecedor"].strip(),
+            "cidade_destino": cabecalho["cidade_destino"].strip(),
+        }
+        itens = [{"item": str(item).strip(), "quantidade": float(quantidade)} for item, quantidade in linhas]
+        preparados.append((cab, data_para_dias(cabecalho["data_compra"]), itens))
+    if not any(itens for _, _, itens in preparados):
+        return [[] for _ in preparados]
+    criado_em = agora_segundos()
+
+    resultado, registros = [], []
+    with engine.begin() as conn:
+        for cab, dias, itens in preparados:
+            if not itens:
+                resultado.append([])
+                continue
+            chave = {
+                "fornecedor_id": id_dimensao(conn, "fornecedor", cab["fornecedor"]),
+                "cidade_id": id_dimensao(conn, "cidade_destino", cab["cidade_destino"]),
+                "data_compra": dias,
+            }
+            pedido_id = conn.execute(
+                sa.insert(pedidos_tbl).returning(pedidos_tbl.c.id),
+                {
+                    "comprador_id": id_dimensao(conn, "comprador", cab["comprador"]),
+                    **chave,
+                    "criado_em": criado_em,
+                },
+            ).scalar_one()
+            ids = conn.execute(
+                sa.insert(pedido_itens_tbl).returning(pedido_itens_tbl.c.id, sort_by_parameter_order=True),
+                [{"pedido_id": pedido_id, **it} for it in itens],
+            ).scalars().all()
+            rollup.somar_linhas(conn, chave, itens)
+            resultado.append(ids)
+            registros += [
+                {"pedido_id": pedido_id, **cab, "data_compra": dias, **it, "criado_em": criado_em}
+                for it in itens
+            ]
+        versao = registrar_alteracao(conn)
+
+    _catalogo_inserir(versao, registros)
+    return resultado
+
+
+def inserir_compra(comprador, data_compra, fornecedor, cidade_destino, item, quantidade):
+    cabecalho = {
+        "comprador": comprador,
+        "data_compra": data_compra,
+        "fornecedor": fornecedor,
+        "cidade_destino": cidade_destino,
+    }
+    return inserir_compras_lote(cabecalho, [(item, quantidade)])[0]
+
+
+def deletar_compra(compra_id: int) -> bool:
+    """Exclui uma linha; o pedido some junto quando fica sem linhas. False se o id não existia."""
+    with engine.begin() as conn:
+        removido = conn.execute(
+            text(f"""
+                SELECT i.pedido_id, c.nome AS comprador, f.nome AS fornecedor, d.nome AS cidade_destino,
+                       p.fornecedor_id, p.cidade_id, p.data_compra, i.item, i.quantidade
+                {SQL_FROM_COMPRAS}
+                WHERE i.id = :id
+            """),
+            {"id": compra_id},
+        ).mappings().first()
+        if removido is not None:
+            conn.execute(text("DELETE FROM pedido_itens WHERE id = :id"), {"id": compra_id})
+            rollup.subtrair_linha(conn, removido)
+            conn.execute(
+                text("""
+                    DELETE FROM pedidos
+                    WHERE id = :pid AND NOT EXISTS (SELECT 1 FROM pedido_itens WHERE pedido_id = :pid)
+                """),
+                {"pid": removido["pedido_id"]},
+            )
+            versao = registrar_alteracao(conn)
+    if removido is not None:
+        _catalogo_remover(versao, dict(removido))
+    return removido is not None
+
+
+# ----------------------------
+# Catálogo de opções (comprador / fornecedor / cidade)
+# ----------------------------
+# Valores distintos de cada dimensão, por processo.
+# "valores": lista ordenada (ordem de exibição)
+# "busca": lista ordenada de (valor.casefold(), valor) para busca por prefixo
+# "versao": versao_tabela() que o catálogo representa
+# "termos": palavras do índice de busca, em ordem (None = carregar na próxima busca)
+# Atualizado incrementalmente nas escritas deste processo; reconstruído a
+# partir das tabelas de lookup quando a versão dos dados andou por outro
+# caminho (outro processo, como os workers da API).
+_catalogo = {"lock": threading.Lock(), "versao": None, "valores": {}, "busca": {}, "termos": None}
+
+
+@perfil.medido("catalogo")
+def _catalogo_reconstruir():
+    with engine.connect() as conn:
+        for dim in DIMENSOES:
+            tabela, fk = DIM_TABELAS[dim]
+            # Só nomes que ainda têm pedido (o lookup guarda nomes antigos também)
+            valores = conn.execute(text(f"""
+                SELECT t.nome FROM {tabela} t
+                WHERE EXISTS (SELECT 1 FROM pedidos p WHERE p.{fk} = t.id)
+            """)).scalars().all()
+            _catalogo["valores"][dim] = sorted(valores)
+            _catalogo["busca"][dim] = sorted((v.casefold(), v) for v in valores)
+    _catalogo["termos"] = None
+
+
+def _catalogo_conferir():
+    """Reconstrói o catálogo se os dados mudaram desde a última vez (chamar com o lock)."""
+    versao = versao_tabela()
+    if versao != _catalogo["versao"]:
+        _catalogo_reconstruir()
+        _catalogo["versao"] = versao
+
+
+def _catalogo_inserir(versao: int, registros: list[dict]):
+    with _catalogo["lock"]:
+        # Houve outra escrita no meio: a próxima conferência reconstrói
+        if _catalogo["versao"] != versao - 1:
+            return
+        for dim in DIMENSOES:
+            for valor in {r[dim] for r in registros}:
+                valores = _catalogo["valores"][dim]
+                i = bisect.bisect_left(valores, valor)
+                if i == len(valores) or valores[i] != valor:
+                    valores.insert(i, valor)
+                    bisect.insort(_catalogo["busca"][dim], (valor.casefold(), valor))
+        termos = _catalogo["termos"]
+        if termos is not None:
+            novos = {t for r in registros for campo in CAMPOS_BUSCA for t in _normalizar(r[campo])}
+            for termo in novos:
+                i = bisect.bisect_left(termos, termo)
+                if i == len(termos) or termos[i] != termo:
+                    termos.insert(i, termo)
+        _catalogo["versao"] = versao
+
+
+def _catalogo_remover(versao: int, linha: dict):
+    """Tira o valor do catálogo se a linha excluída era a última com ele."""
+    with _catalogo["lock"]:
+        if _catalogo["versao"] != versao - 1:
+            return
+        with engine.connect() as conn:
+            for dim in DIMENSOES:
+                valor = linha[dim]
+                tabela, fk = DIM_TABELAS[dim]
+                ainda_existe = conn.execute(
+                    text(f"""
+                        SELECT 1 FROM pedidos p JOIN {tabela} t ON t.id = p.{fk}
+                        WHERE t.nome = :v LIMIT 1
+                    """),
+                    {"v": valor},
+                ).first()
+                if ainda_existe:
+                    continue
+                valores = _catalogo["valores"][dim]
+                i = bisect.bisect_left(valores, valor)
+                if i < len(valores) and valores[i] == valor:
+                    del valores[i]
+                busca = _catalogo["busca"][dim]
+                j = bisect.bisect_left(busca, (valor.casefold(), valor))
+                if j < len(busca) and busca[j] == (valor.casefold(), valor):
+                    del busca[j]
+        _catalogo["versao"] = versao
+
+
+def opcoes(dimensao: str, prefixo: str = "", limite: int | None = None) -> list[str]:
+    """
+    Valores distintos de uma dimensão (comprador, fornecedor ou cidade_destino).
+    Com prefixo, faz busca sem diferenciar maiúsculas (busca binária).
+    """
+    with _catalogo["lock"]:
+        _catalogo_conferir()
+        if not prefixo:
+            valores = _catalogo["valores"][dimensao]
+            return list(valores[:limite] if limite else valores)
+        busca = _catalogo["busca"][dimensao]
+        chave = prefixo.casefold()
+        ini = bisect.bisect_left(busca, (chave,))
+        resultado = []
+        for k, valor in busca[ini:]:
+            if not k.startswith(chave) or (limite and len(resultado) >= limite):
+                break
+            resultado.append(valor)
+        return resultado
+
+
+# ----------------------------
+# Busca por texto (item / fornecedor / cidade)
+# ----------------------------
+def _normalizar(texto: str) -> list[str]:
+    """Palavras como o índice de busca guarda: sem acento e em minúsculas."""
+    sem_acento = "".join(c for c in unicodedata.normalize("NFD", texto) if not unicodedata.combining(c))
+    return re.findall(r"[^\W_]+", sem_acento.casefold())
+
+
+def _termos() -> list[str]:
+    """Vocabulário da busca (chamar com o lock); lido do banco depois de cada reconstrução."""
+    if _catalogo["termos"] is None:
+        _catalogo["termos"] = termos_busca()
+    return _catalogo["termos"]
+
+
+def _alternativas(palavra: str, termos: list[str]) -> tuple[str, ...] | None:
+    """
+    Palavras do índice que começam com `palavra` (busca binária). Um prefixo
+    exato ("x*") no FTS5 junta a lista de todas essas palavras a cada consulta;
+    expandido em OR fica dentro do índice. Muitas alternativas: prefixo mesmo.
+    None quando nenhuma palavra do índice começa assim.
+    """
+    i = bisect.bisect_left(termos, palavra)
+    achadas = []
+    while i < len(termos) and termos[i].startswith(palavra) and len(achadas) <= BUSCA_MAX_ALTERNATIVAS:
+        achadas.append(termos[i])
+        i += 1
+    if not achadas:
+        return None
+    if len(achadas) <= BUSCA_MAX_ALTERNATIVAS:
+        return tuple(achadas)
+    return (palavra,) if achadas[0] == palavra else (palavra + "*",)
+
+
+def buscar(texto: str, pagina: int = 0, limite: int = 50) -> ResultadoBusca | None:
+    """
+    Busca por texto livre em item, fornecedor e cidade de destino, sem
+    diferenciar acentos e maiúsculas; todas as palavras precisam aparecer.
+    Sem resultado, palavras que não existem no índice viram a mais parecida
+    ("fornecdor" -> "fornecedor") e a busca é refeita; `correcao` diz o que
+    foi buscado. None se o texto não tem palavras.
+    """
+    palavras = [p for p in _normalizar(texto) if p not in PALAVRAS_VAZIAS] or _normalizar(texto)
+    if not palavras:
+        return None
+    with _catalogo["lock"]:
+        _catalogo_conferir()
+        termos = _termos()
+        alternativas = [_alternativas(p, termos) for p in palavras]
+    # Palavra fora do vocabulário (ou que chegou depois dele): prefixo no FTS5
+    resultado = buscar_compras(
+        [alt or (p + "*",) for p, alt in zip(palavras, alternativas)], pagina, limite,
+    )
+    if resultado.total or all(alternativas):
+        return resultado
+
+    with _catalogo["lock"]:
+        candidatos = [t for t in _termos() if not t.isdigit()]
+    corrigidas = [
+        p if alt else next(iter(difflib.get_close_matches(p, candidatos, n=1, cutoff=0.75)), p)
+        for p, alt in zip(palavras, alternativas)
+    ]
+    if corrigidas == palavras:
+        return resultado
+    with _catalogo["lock"]:
+        alternativas = [_alternativas(p, _termos()) for p in corrigidas]
+    resultado = buscar_compras(
+        [alt or (p + "*",) for p, alt in zip(corrigidas, alternativas)], pagina, limite,
+    )
+    return resultado._replace(correcao=" ".join(corrigidas))
+
+
+# ----------------------------
+# Exportação em arquivo (LRU em disco)
+# ----------------------------
+# Arquivos exportados, em disco (não em memória): chave -> caminho.
+# LRU limitado a EXPORT_CACHE_MAX_ARQUIVOS; o arquivo que sai do cache é apagado.
+_exports = {"lock": threading.Lock(), "pasta": None, "arquivos": OrderedDict()}
+
+
+def ler_export(filtros: FiltrosCompras, versao, formato: str) -> bytes:
+    """
+    Conteúdo da exportação, gerando o arquivo se ainda não existir.
+    `versao` (consultas.versao_tabela()) entra na chave: dados novos, arquivo novo.
+    """
+    # O download_button lê tudo e não fecha o que recebe: lê e fecha aqui
+    with _abrir_export(filtros, versao, formato) as arq:
+        return arq.read()
+
+
+def _abrir_export(filtros: FiltrosCompras, versao, formato: str):
+    """Arquivo da exportação, aberto para leitura; quem chama fecha."""
+    chave = (filtros, versao, formato)
+    with _exports["lock"]:
+        caminho = _exports["arquivos"].get(chave)
+        if caminho is not None and os.path.exists(caminho):
+            _exports["arquivos"].move_to_end(chave)
+            return open(caminho, "rb")
+        if _exports["pasta"] is None:
+            _exports["pasta"] = tempfile.mkdtemp(prefix="compras_export_")
+
+    # Gera fora do lock (outras exportações não esperam esta) num nome
+    # temporário; só entra no cache quando estiver completo.
+    fd, caminho = tempfile.mkstemp(suffix="." + formato, dir=_exports["pasta"])
+    try:
+        with os.fdopen(fd, "wb") as arq, perfil.medir(f"exportacao_{formato}"):
+            exportar(iter_lotes_export(filtros), formato, arq)
+    except BaseException:
+        os.remove(caminho)
+        raise
+
+    with _exports["lock"]:
+        antigo = _exports["arquivos"].pop(chave, None)
+        _exports["arquivos"][chave] = caminho
+        removidos = [antigo] if antigo else []
+        while len(_exports["arquivos"]) > EXPORT_CACHE_MAX_ARQUIVOS:
+            removidos.append(_exports["arquivos"].popitem(last=False)[1])
+        # Aberto ainda com o lock: se sair do cache logo depois, o handle continua válido
+        arq = open(caminho, "rb")
+    for velho in removidos:
+        try:
+            os.remove(velho)
+        except FileNotFoundError:
+            pass
+    return arq
+
+
+# ----------------------------
+# PDF em cache (LRU por conteúdo)
+# ----------------------------
+_pdfs = {"lock": threading.Lock(), "pdfs": OrderedDict(), "bytes": 0}
+
+
+def _chave_pdf_pedido(campos: dict) -> str:
+    """Hash de todos os dados que entram no PDF (cabeçalho + itens)."""
+    h = hashlib.sha256()
+    for k in sorted(campos):
+        if k != "itens_df":
+            h.update(f"{k}={campos[k]}\x1f".encode("utf-8"))
+    itens = campos["itens_df"][["Material", "Quantidade"]].astype(str)
+    h.update(pd.util.hash_pandas_object(itens, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def obter_pdf_pedido(campos: dict, gerar: bool = False) -> bytes | None:
+    """
+    Devolve o PDF já gerado para esses dados, se estiver no cache.
+    Com gerar=True, monta o PDF quando não estiver (e guarda no cache).
+    O cache é LRU, limitado por quantidade e por tamanho total.
+    """
+    chave = _chave_pdf_pedido(campos)
+    with _pdfs["lock"]:
+        pdf = _pdfs["pdfs"].get(chave)
+        if pdf is not None:
+            _pdfs["pdfs"].move_to_end(chave)
+            return pdf
+    if not gerar:
+        return None
+
+    with perfil.medir("pdf"):
+        pdf = gerar_pdf_pedido(**campos)
+    with _pdfs["lock"]:
+        if chave not in _pdfs["pdfs"]:
+            _pdfs["pdfs"][chave] = pdf
+            _pdfs["bytes"] += len(pdf)
+        while _pdfs["pdfs"] and (
+            len(_pdfs["pdfs"]) > PDF_CACHE_MAX_ITENS or _pdfs["bytes"] > PDF_CACHE_MAX_BYTES
+        ):
+            _, antigo = _pdfs["pdfs"].popitem(last=False)
+            _pdfs["bytes"] -= len(antigo)
+    return pdf
+
+
+# ----------------------------
+# Tarefas em segundo plano (funções para tarefas.enviar)
+# ----------------------------
+def tarefa_exportar(filtros: FiltrosCompras, formato: str, total: int):
+    def executar(arq, progresso):
+        def lotes():
+            feitas = 0
+            for lote in iter_lotes_export(filtros):
+                yield lote
+                feitas += len(lote)
+                progresso(feitas / max(total, 1), f"{feitas} de {total} linhas")
+        exportar(lotes(), formato, arq)
+    return executar
+
+
+def tarefa_importar(caminho: str, nome: str):
+    """Importa o arquivo salvo em `caminho`; o resultado é o relatório de recusadas."""
+    def executar(arq, progresso):
+        tamanho = max(os.path.getsize(caminho), 1)
+        rejeitadas = io.TextIOWrapper(arq, encoding="utf-8-sig", newline="")
+        try:
+            with open(caminho, "rb") as fonte:
+                resumo = importar_arquivo(
+                    fonte, nome, rejeitadas=rejeitadas,
+                    ao_progredir=lambda r: progresso(
+                        min(fonte.tell() / tamanho, 0.99), f"{r['lidas']} linhas lidas"
+                    ),
+                )
+            rejeitadas.flush()
+        finally:
+            rejeitadas.detach()
+            os.remove(caminho)
+        if not resumo["rejeitadas"]:
+            arq.seek(0)
+            arq.truncate()
+        return (
+            f"{resumo['importadas']} linha(s) importada(s) em {resumo['pedidos']} pedido(s); "
+            f"{resumo['rejeitadas']} recusada(s)."
+        )
+    return executar
+
+
+def tarefa_pedidos_zip(pedidos: dict):
+    """ZIP com um PDF por pedido (pedido_pdf.pedidos_em_lote)."""
+    def executar(arq, progresso):
+        zip_pedidos(
+            pedidos, arq,
+            ao_progredir=lambda prontos, total: progresso(prontos / total, f"{prontos}/{total} pedidos gerados"),
+        )
+    return executar
+
+
+if __name__ == "__main__":
+    # No container, antes de subir os servidores: migrações feitas e o
+    # arquivo do banco no cache do sistema operacional
+    aquecer()
@@ -0,0 +1,283 @@
+"""
+Fila de tarefas pesadas: exportações grandes, pedidos em lote, importações.
+
+As tarefas rodam num pool de threads do processo, fora do rerun do
+Streamlit; o estado (fila / rodando / pronta / erro, progresso, arquivo
+gerado) fica na tabela `tarefas`, que a interface consulta para mostrar o
+andamento e liberar o download. Os arquivos gerados ficam em disco e
+expiram depois de COMPRAS_TAREFAS_EXPIRACAO segundos.
+
+Cada tarefa guarda o processo que a enviou (`dono`, "host:pid"). Ao subir
+o pool, as tarefas na fila ou rodando cujo dono já encerrou são marcadas
+como erro; as de outros processos vivos (app e workers da API juntos)
+continuam.
+
+Variáveis de ambiente:
+  COMPRAS_TAREFAS_WORKERS      tarefas rodando ao mesmo tempo (padrão: 2)
+  COMPRAS_TAREFAS_POR_USUARIO  tarefas na fila/rodando por usuário (padrão: 2)
+  COMPRAS_TAREFAS_EXPIRACAO    segundos até apagar o resultado (padrão: 3600)
+  COMPRAS_TAREFAS_DIR          pasta dos arquivos gerados
+"""
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from db import engine
+
+TAREFAS_WORKERS = int(os.environ.get("COMPRAS_TAREFAS_WORKERS", 2))
+LIMITE_POR_USUARIO = int(os.environ.get("COMPRAS_TAREFAS_POR_USUARIO", 2))
+EXPIRACAO_SEGUNDOS = int(os.environ.get("COMPRAS_TAREFAS_EXPIRACAO", 3600))
+PASTA = os.environ.get("COMPRAS_TAREFAS_DIR") or os.path.join(tempfile.gettempdir(), "compras_tarefas")
+INTERVALO_PROGRESSO = 0.5  # segundos entre gravações de progresso
+INTERVALO_LIMPEZA = 60
+HOST = socket.gethostname()
+
+FILA, RODANDO, PRONTA, ERRO = "fila", "rodando", "pronta", "erro"
+
+SQL_CRIAR = """
+    CREATE TABLE IF NOT EXISTS tarefas (
+        id TEXT PRIMARY KEY,
+        usuario TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        descricao TEXT NOT NULL,
+        status TEXT NOT NULL,
+        progresso REAL NOT NULL DEFAULT 0,
+        mensagem TEXT,
+        arquivo TEXT,
+        nome_arquivo TEXT,
+        mime TEXT,
+        criada_em BIGINT NOT NULL,
+        concluida_em BIGINT,
+        expira_em BIGINT
+    )
+"""
+
+
+class LimiteTarefas(RuntimeError):
+    """O usuário já tem LIMITE_POR_USUARIO tarefas na fila ou rodando."""
+
+
+def criar_tabela(conn):
+    conn.execute(text(SQL_CRIAR))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_tarefas_usuario ON tarefas (usuario, status)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_tarefas_expira ON tarefas (expira_em)"))
+
+
+# ----------------------------
+# Pool (um por processo)
+# ----------------------------
+_pool = None
+_pool_lock = threading.Lock()
+_envio_lock = threading.Lock()
+_ultima_limpeza = 0.0
+
+
+def _dono() -> str:
+    # Na hora de usar, não no import: workers criados por fork têm outro pid
+    return f"{HOST}:{os.getpid()}"
+
+
+def _processo_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # existe, de outro usuário
+    return True
+
+
+def _interrompida(dono: str | None) -> bool:
+    """
+    O processo dono da tarefa acabou? Sem dono (tarefas de antes da coluna):
+    sim. De outro host: não dá para saber daqui, fica como está. Com o pid
+    deste processo: era de um anterior com o mesmo pid (contêiner
+    reiniciado), porque este ainda não enviou nada.
+    """
+    if dono is None:
+        return True
+    host, _, pid = dono.rpartition(":")
+    if host != HOST:
+        return False
+    return int(pid) == os.getpid() or not _processo_vivo(int(pid))
+
+
+def _recuperar_interrompidas(conn):
+    pendentes = conn.execute(
+        text("SELECT id, dono FROM tarefas WHERE status IN (:fila, :rodando)"),
+        {"fila": FILA, "rodando": RODANDO},
+    ).all()
+    agora = int(time.time())
+    interrompidas = [
+        {"id": tarefa_id, "erro": ERRO, "agora": agora, "expira": agora + EXPIRACAO_SEGUNDOS}
+        for tarefa_id, dono in pendentes if _interrompida(dono)
+    ]
+    if interrompidas:
+        conn.execute(
+            text("""
+                UPDATE tarefas
+                SET status = :erro, mensagem = 'Interrompida (servidor reiniciado)',
+                    concluida_em = :agora, expira_em = :expira
+                WHERE id = :id
+            """),
+            interrompidas,
+        )
+
+
+def _pool_tarefas() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            os.makedirs(PASTA, exist_ok=True)
+            with engine.begin() as conn:
+                _recuperar_interrompidas(conn)
+            _pool = ThreadPoolExecutor(max_workers=TAREFAS_WORKERS, thread_name_prefix="tarefa")
+        return _pool
+
+
+def _atualizar(tarefa_id: str, **campos):
+    sets = ", ".join(f"{k} = :{k}" for k in campos)
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE tarefas SET {sets} WHERE id = :id"), {**campos, "id": tarefa_id})
+
+
+def _concluir(tarefa_id: str, **campos):
+    agora = int(time.time())
+    _atualizar(tarefa_id, concluida_em=agora, expira_em=agora + EXPIRACAO_SEGUNDOS, **campos)
+
+
+def _executar(tarefa_id: str, funcao):
+    caminho = os.path.join(PASTA, tarefa_id)
+    _atualizar(tarefa_id, status=RODANDO)
+    ultimo = 0.0
+
+    def progresso(fracao: float, texto: str | None = None):
+        # Limita as gravações: o callback pode ser chamado a cada lote
+        nonlocal ultimo
+        agora = time.monotonic()
+        if agora - ultimo < INTERVALO_PROGRESSO:
+            return
+        ultimo = agora
+        _atualizar(tarefa_id, progresso=min(max(float(fracao), 0.0), 1.0), mensagem=texto)
+
+    try:
+        with open(caminho, "wb") as arq:
+            mensagem = funcao(arq, progresso)
+    except Exception as e:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        _concluir(tarefa_id, status=ERRO, mensagem=str(e) or e.__class__.__name__)
+        return
+
+    # Tarefa sem arquivo de saída (ex.: importação sem linhas recusadas)
+    if os.path.getsize(caminho) == 0:
+        os.remove(caminho)
+        caminho = None
+    _concluir(tarefa_id, status=PRONTA, progresso=1.0, mensagem=mensagem, arquivo=caminho)
+
+
+# ----------------------------
+# API usada pela interface
+# ----------------------------
+def enviar(usuario: str, tipo: str, descricao: str, funcao, *,
+           nome_arquivo: str | None = None, mime: str | None = None) -> str:
+    """
+    Põe uma tarefa na fila e devolve o id.
+    funcao(arq, progresso) grava o resultado em `arq` (binário) e pode
+    devolver uma mensagem; progresso(fração, texto) atualiza o andamento.
+    Levanta LimiteTarefas se o usuário já estiver no limite.
+    """
+    pool = _pool_tarefas()
+    limpar_expiradas()
+    tarefa_id = uuid.uuid4().hex
+    with _envio_lock:
+        with engine.begin() as conn:
+            ativas = conn.execute(
+                text("SELECT COUNT(*) FROM tarefas WHERE usuario = :u AND status IN (:fila, :rodando)"),
+                {"u": usuario, "fila": FILA, "rodando": RODANDO},
+            ).scalar_one()
+            if ativas >= LIMITE_POR_USUARIO:
+                raise LimiteTarefas(
+                    f"Você já tem {ativas} tarefa(s) em andamento; aguarde uma terminar."
+                )
+            conn.execute(
+                text("""
+                    INSERT INTO tarefas (id, usuario, tipo, descricao, status, nome_arquivo, mime, criada_em, dono)
+                    VALUES (:id, :usuario, :tipo, :descricao, :status, :nome_arquivo, :mime, :agora, :dono)
+                """),
+                {"id": tarefa_id, "usuario": usuario, "tipo": tipo, "descricao": descricao,
+                 "status": FILA, "nome_arquivo": nome_arquivo, "mime": mime, "agora": int(time.time()),
+                 "dono": _dono()},
+            )
+    pool.submit(_executar, tarefa_id, funcao)
+    return tarefa_id
+
+
+def listar(usuario: str) -> list[dict]:
+    """Tarefas do usuário, da mais nova para a mais antiga (expiradas já somem)."""
+    limpar_expiradas()
+    with engine.connect() as conn:
+        linhas = conn.execute(
+            text("""
+                SELECT id, tipo, descricao, status, progresso, mensagem, arquivo, nome_arquivo, mime,
+                       criada_em, concluida_em, expira_em
+                FROM tarefas WHERE usuario = :u ORDER BY criada_em DESC
+            """),
+            {"u": usuario},
+        ).mappings().all()
+    return [dict(l) for l in linhas]
+
+
+def ler_arquivo(tarefa_id: str) -> bytes:
+    """Conteúdo do resultado da tarefa (FileNotFoundError se já expirou)."""
+    with engine.connect() as conn:
+        caminho = conn.execute(
+            text("SELECT arquivo FROM tarefas WHERE id = :id"), {"id": tarefa_id}
+        ).scalar()
+    if caminho is None:
+        raise FileNotFoundError(tarefa_id)
+    with open(caminho, "rb") as arq:
+        return arq.read()
+
+
+def descartar(tarefa_id: str, usuario: str):
+    """Apaga uma tarefa concluída (e o arquivo) antes de expirar."""
+    with engine.begin() as conn:
+        caminho = conn.execute(
+            text("""
+                DELETE FROM tarefas WHERE id = :id AND usuario = :u AND status IN (:pronta, :erro)
+                RETURNING arquivo
+            """),
+            {"id": tarefa_id, "u": usuario, "pronta": PRONTA, "erro": ERRO},
+        ).scalar()
+    _remover_arquivos([caminho])
+
+
+def limpar_expiradas(forcar: bool = False):
+    """Apaga tarefas vencidas e seus arquivos (no máximo uma vez por INTERVALO_LIMPEZA)."""
+    global _ultima_limpeza
+    agora = time.monotonic()
+    if not forcar and agora - _ultima_limpeza < INTERVALO_LIMPEZA:
+        return
+    _ultima_limpeza = agora
+    with engine.begin() as conn:
+        caminhos = conn.execute(
+            text("DELETE FROM tarefas WHERE expira_em < :agora RETURNING arquivo"),
+            {"agora": int(time.time())},
+        ).scalars().all()
+    _remover_arquivos(caminhos)
+
+
+def _remover_arquivos(caminhos):
+    for caminho in caminhos:
+        if caminho:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,37 @@
+"""
+Os testes rodam num banco SQLite temporário: COMPRAS_DATABASE_URL precisa
+estar definida antes do primeiro import de db.py (o engine é do processo).
+"""
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+_pasta = tempfile.mkdtemp(prefix="compras_testes_")
+os.environ["COMPRAS_DATABASE_URL"] = f"sqlite:///{os.path.join(_pasta, 'compras.db')}"
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def banco():
+    """Banco migrado, com alguns pedidos de várias linhas em datas repetidas."""
+    from datetime import date, timedelta
+
+    import servico
+
+    servico.iniciar()
+    inicio = date(2025, 1, 1)
+    for n in range(60):
+        servico.inserir_compras_lote(
+            {
+                "comprador": f"Comprador {n % 3}",
+                "data_compra": inicio + timedelta(days=n % 7),
+                "fornecedor": f"Fornecedor {n % 5}",
+                "cidade_destino": f"Cidade {n % 2}",
+            },
+            [(f"Item {n}-{k}", k + 1) for k in range(n % 4 + 1)],
+        )
+    return servico
@@ -0,0 +1,111 @@
+import asyncio
+import json
+from datetime import date
+from typing import NamedTuple
+from urllib.parse import unquote, urlencode
+
+import pytest
+
+import api
+from consultas import FiltrosCompras, pagina_compras_linhas
+from pedido_pdf import nome_arquivo_pdf
+
+
+class Resposta(NamedTuple):
+    status: int
+    cabecalhos: dict
+    corpo: bytes
+
+    def json(self):
+        return json.loads(self.corpo)
+
+
+def _chamar(metodo: str, caminho: str, query: dict | None = None, corpo=None) -> Resposta:
+    """Uma requisição direto no app ASGI (sem servidor nem cliente HTTP)."""
+    if corpo is not None and not isinstance(corpo, bytes):
+        corpo = json.dumps(corpo).encode()
+    mensagens = [{"type": "http.request", "body": corpo or b"", "more_body": False}]
+    resposta = {"status": None, "cabecalhos": {}, "corpo": b""}
+
+    async def receber():
+        return mensagens.pop(0) if mensagens else {"type": "http.disconnect"}
+
+    async def enviar(mensagem):
+        if mensagem["type"] == "http.response.start":
+            resposta["status"] = mensagem["status"]
+            resposta["cabecalhos"] = {k.decode("latin-1"): v.decode("latin-1") for k, v in mensagem["headers"]}
+        elif mensagem["type"] == "http.response.body":
+            resposta["corpo"] += mensagem.get("body", b"")
+
+    escopo = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http",
+        "method": metodo, "path": caminho, "raw_path": caminho.encode(), "root_path": "",
+        "query_string": urlencode(query or {}).encode(),
+        "headers": [(b"host", b"teste"), (b"content-type", b"application/json")],
+        "server": ("teste", 80), "client": ("127.0.0.1", 1234),
+    }
+    asyncio.run(api.app(escopo, receber, enviar))
+    return Resposta(**resposta)
+
+
+@pytest.mark.parametrize("query, mensagem", [
+    ({"limite": "0"}, "limite: fora do intervalo 1..1000"),
+    ({"limite": "muitos"}, "limite: número inteiro esperado"),
+    ({"data_ini": "01/02/2025"}, "data_ini: data inválida (use AAAA-MM-DD)"),
+    ({"apos": "20000:15"}, "apos: cursor inválido"),
+    ({"apos": "a:b:c"}, "apos: cursor inválido"),
+])
+def test_listar_parametros_invalidos(banco, query, mensagem):
+    resposta = _chamar("GET", "/api/compras", query)
+    assert resposta.status == 400
+    assert resposta.json() == {"erro": mensagem}
+
+
+@pytest.mark.parametrize("corpo, mensagem", [
+    (b"{nao e json", "corpo deve ser JSON"),
+    ([], "envie de 1 a 1000 pedidos"),
+    ({"fornecedor": "F", "cidade_destino": "C", "itens": [{"item": "x", "quantidade": 1}]},
+     "pedido 1: comprador: obrigatório"),
+    ({"comprador": "A", "fornecedor": "F", "cidade_destino": "C", "itens": []},
+     "pedido 1: itens: lista com ao menos um item"),
+    ({"comprador": "A", "fornecedor": "F", "cidade_destino": "C", "itens": [{"item": "x", "quantidade": 0}]},
+     "pedido 1: itens[1]: quantidade deve ser maior que zero"),
+])
+def test_criar_corpo_invalido(banco, corpo, mensagem):
+    resposta = _chamar("POST", "/api/compras", corpo=corpo)
+    assert resposta.status == 400
+    assert resposta.json() == {"erro": mensagem}
+
+
+def test_cursor_percorre_todas_as_linhas(banco):
+    esperado = [l["id"] for l in pagina_compras_linhas(FiltrosCompras(), None, 10_000)]
+    vistos, query = [], {"limite": "7"}
+    while True:
+        resposta = _chamar("GET", "/api/compras", query)
+        assert resposta.status == 200
+        dados = resposta.json()
+        vistos += [c["id"] for c in dados["compras"]]
+        if dados["proxima"] is None:
+            break
+        assert len(dados["proxima"].split(":")) == 3
+        query = {"limite": "7", "apos": dados["proxima"]}
+    assert vistos == esperado
+
+
+def test_pdf_com_nome_fora_do_latin1(banco):
+    fornecedor, cidade = "Łódź Ltda", 'São "Paulo"'
+    banco.inserir_compras_lote(
+        {"comprador": "Teste", "data_compra": date(2025, 4, 1), "fornecedor": fornecedor, "cidade_destino": cidade},
+        [("Cimento", 10)],
+    )
+    resposta = _chamar("GET", "/api/pedido.pdf", {
+        "fornecedor": fornecedor, "cidade": cidade, "data_pedido": "2025-04-02",
+    })
+    assert resposta.status == 200
+    assert resposta.corpo.startswith(b"%PDF")
+
+    disposicao = resposta.cabecalhos["content-disposition"]
+    assert disposicao.isascii()
+    ascii_, utf8 = disposicao.split("; filename*=UTF-8''")
+    assert ascii_ == 'attachment; filename="pedido__odz_Ltda_Sao__Paulo__2025-04-02.pdf"'
+    assert unquote(utf8) == nome_arquivo_pdf(fornecedor, cidade, date(2025, 4, 2))
@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.bench_inicio import ORCAMENTO_INICIO_S, ORCAMENTO_RERUN_S
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Folga sobre o orçamento do bench_inicio: aqui o banco é pequeno, mas a
+# máquina do CI pode ser lenta; o teste pega regressões grosseiras, o
+# benchmark mede de verdade
+FOLGA = 5
+
+
+def test_rerun_nao_importa_pdf_nem_excel(banco):
+    # Processo novo: neste, outros testes já importaram ReportLab e openpyxl.
+    # O filho usa o mesmo banco (COMPRAS_DATABASE_URL do conftest), já migrado.
+    saida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_inicio", "--filho", "--reruns", "3"],
+        cwd=RAIZ, env=os.environ.copy(), capture_output=True, text=True, timeout=600,
+    )
+    assert saida.returncode == 0, saida.stderr
+    r = json.loads(saida.stdout.strip().splitlines()[-1])
+
+    assert r["carregados"] == []
+    assert r["inicio_s"] < ORCAMENTO_INICIO_S * FOLGA
+    assert r["rerun_mediana_s"] < ORCAMENTO_RERUN_S * FOLGA
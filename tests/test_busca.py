@@ -0,0 +1,75 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+import consultas
+from db import engine
+
+CABECALHO = {"comprador": "Busca", "data_compra": date(2025, 6, 1), "fornecedor": "Distribuidora Açaí",
+             "cidade_destino": "Itabuna"}
+
+
+def _ids(resultado) -> list[int]:
+    return resultado.linhas["id"].tolist()
+
+
+def _indexados(ids: list[int]) -> set[int]:
+    with engine.connect() as conn:
+        return set(conn.execute(
+            text("SELECT rowid FROM compras_busca WHERE rowid IN (SELECT value FROM json_each(:ids))"),
+            {"ids": str(ids)},
+        ).scalars())
+
+
+@pytest.fixture(scope="module")
+def linhas_busca(banco):
+    return banco.inserir_compras_lote(
+        CABECALHO, [("Açúcar cristal", 5), ("Tubo HIDRÁULICO", 2), ("Cimento", 1)],
+    )
+
+
+@pytest.mark.parametrize("texto", ["acucar", "AÇÚCAR", "Açucar Cristal", "acuc", "acai acucar"])
+def test_busca_sem_acento_e_sem_maiusculas(banco, linhas_busca, texto):
+    assert _ids(banco.buscar(texto)) == [linhas_busca[0]]
+
+
+def test_busca_palavras_em_colunas_diferentes(banco, linhas_busca):
+    # "hidraulico" no item, "itabuna" na cidade; "cimento" sozinho acha linhas de outros testes
+    assert _ids(banco.buscar("hidraulico itabuna")) == [linhas_busca[1]]
+    assert _ids(banco.buscar("cimento acai")) == [linhas_busca[2]]
+    assert banco.buscar("acucar inexistentexyz").total == 0
+
+
+def test_triggers_mantem_o_indice(banco, linhas_busca):
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM compras_busca")).scalar_one() == \
+            conn.execute(text("SELECT COUNT(*) FROM pedido_itens")).scalar_one()
+
+    [nova] = banco.inserir_compras_lote(CABECALHO, [("Parafuso sextavado", 10)])
+    assert _indexados([nova]) == {nova}
+    # "sextavado" não estava no vocabulário carregado: vai como prefixo
+    assert _ids(banco.buscar("sextavado")) == [nova]
+
+    assert banco.deletar_compra(nova)
+    assert _indexados([nova]) == set()
+    assert banco.buscar("sextavado").total == 0
+
+
+def test_sem_fts_usa_like(banco, linhas_busca, monkeypatch):
+    palavras = [("cristal",), ("itabuna",)]
+    com_fts = consultas.buscar_compras(palavras)
+
+    monkeypatch.setattr(consultas, "BUSCA_FTS", False)
+    sem_fts = consultas.buscar_compras(palavras)
+    assert _ids(sem_fts) == _ids(com_fts) == [linhas_busca[0]]
+    assert (sem_fts.total, sem_fts.ranqueada) == (1, False)
+
+    # Sem maiúsculas; prefixo ("x*") vira substring; sem índice, acento conta
+    assert _ids(consultas.buscar_compras([("hidr*",), ("tubo",)])) == [linhas_busca[1]]
+    assert consultas.buscar_compras([("acucar",)]).total == 0
+
+    # Mais recentes primeiro, paginado por deslocamento
+    todas = _ids(consultas.buscar_compras([("itabuna",)]))
+    assert todas == sorted(todas, reverse=True)
+    assert _ids(consultas.buscar_compras([("itabuna",)], pagina=1, limite=1)) == todas[1:2]
@@ -0,0 +1,32 @@
+from sqlalchemy import text
+
+import consultas
+from consultas import FiltrosCompras
+
+
+def _plano(sql: str, params: dict) -> str:
+    with consultas.engine.connect() as conn:
+        linhas = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+    return "\n".join(str(linha[-1]) for linha in linhas)
+
+
+def test_primeira_pagina_sem_ordenar_o_resultado(banco):
+    where, params = consultas._where_pagina(FiltrosCompras(), None)
+    plano = _plano(*consultas._sql_compras(where, params, 101))
+    assert "TEMP B-TREE FOR ORDER BY" not in plano
+    assert "idx_pedidos_data" in plano
+
+
+def test_paginas_por_chave_cobrem_tudo_na_ordem(banco):
+    total = consultas.kpis_compras(FiltrosCompras())["registros"]
+    vistos, apos = [], None
+    while True:
+        pagina = consultas.pagina_compras_linhas(FiltrosCompras(), apos, 7)
+        if not pagina:
+            break
+        vistos += pagina
+        ultima = pagina[-1]
+        apos = (ultima["data_compra"], ultima["pedido_id"], ultima["id"])
+    chaves = [(l["data_compra"], l["pedido_id"], l["id"]) for l in vistos]
+    assert len(chaves) == total
+    assert chaves == sorted(chaves, reverse=True)
@@ -0,0 +1,102 @@
+import csv
+import io
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+import importar
+from db import engine
+
+
+def _importadas(fornecedor: str) -> list[tuple[str, float]]:
+    with engine.connect() as conn:
+        return [tuple(l) for l in conn.execute(text("""
+            SELECT i.item, i.quantidade FROM pedido_itens i
+            JOIN pedidos p ON p.id = i.pedido_id JOIN fornecedores f ON f.id = p.fornecedor_id
+            WHERE f.nome = :f ORDER BY i.item
+        """), {"f": fornecedor})]
+
+
+def _importar(conteudo: bytes, nome: str, lote: int) -> tuple[dict, list[list[str]]]:
+    rejeitadas = io.StringIO()
+    resumo = importar.importar_arquivo(io.BytesIO(conteudo), nome, rejeitadas=rejeitadas, lote=lote)
+    relatorio = list(csv.reader(io.StringIO(rejeitadas.getvalue()), delimiter=";"))
+    assert relatorio[0] == ["linha", "motivo", *importar.COLUNAS]
+    return resumo, relatorio[1:]
+
+
+@pytest.mark.parametrize("lote", [1, 4, 1000])
+def test_csv_rejeitadas_com_a_linha_do_arquivo(banco, lote):
+    fornecedor = f"Importação CSV {lote}"
+    linhas = ["Comprador;Data do pedido;Fornecedor;Cidade destino;Material;Qtd"]  # linha 1
+    for n in range(2, 12):
+        linhas.append(f"Ana;05/03/2025;{fornecedor};Recife;Item {n:02};{n}")
+    linhas[4] = f"Ana;31/02/2025;{fornecedor};Recife;Item 05;5"   # linha 5
+    linhas[5] = f";05/03/2025;{fornecedor};Recife;Item 06;0"      # linha 6
+    linhas.insert(8, "")                                           # linha 9 em branco
+    linhas[10] = f"Ana;05/03/2025;{fornecedor};Recife;Item 10;abc"  # linha 11
+    conteudo = ("\n".join(linhas) + "\n\n").encode()
+
+    resumo, rejeitadas = _importar(conteudo, "compras.csv", lote)
+
+    assert [(l[0], l[1]) for l in rejeitadas] == [
+        ("5", "data inválida"),
+        ("6", "comprador vazio; quantidade deve ser maior que zero"),
+        ("11", "quantidade inválida"),
+    ]
+    assert rejeitadas[2][2:] == ["Ana", "05/03/2025", fornecedor, "Recife", "Item 10", "abc"]
+    assert (resumo["lidas"], resumo["importadas"], resumo["rejeitadas"]) == (10, 7, 3)
+    assert _importadas(fornecedor) == [
+        ("Item 02", 2), ("Item 03", 3), ("Item 04", 4), ("Item 07", 7),
+        ("Item 08", 8), ("Item 09", 9), ("Item 11", 11),
+    ]
+
+
+def test_csv_campo_com_quebra_de_linha(banco):
+    fornecedor = "Importação CSV aspas"
+    conteudo = (
+        "Comprador,Data,Fornecedor,Cidade,Item,Quantidade\n"
+        f'Ana,2025-03-05,{fornecedor},Recife,"Cabo\nflexível",1\n'   # linhas 2 e 3
+        f"Ana,2025-03-05,{fornecedor},Recife,Toner,0\n"             # linha 4
+    ).encode()
+
+    resumo, rejeitadas = _importar(conteudo, "compras.csv", lote=1)
+
+    assert [(l[0], l[1]) for l in rejeitadas] == [("4", "quantidade deve ser maior que zero")]
+    assert _importadas(fornecedor) == [("Cabo\nflexível", 1)]
+
+
+def test_xlsx(banco):
+    from openpyxl import Workbook
+
+    fornecedor = "Importação XLSX"
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Solicitante", "Data", "Fornecedor", "Cidade", "Observação", "Material", "Quantidade"])
+    ws.append(["Bia", datetime(2025, 3, 5), fornecedor, "Natal", "", "Cabo", 2])             # linha 2
+    ws.append(["Bia", datetime(2025, 3, 5), fornecedor, "Natal", "urgente", "Toner", 1.5])   # linha 3
+    ws.append([None] * 7)                                                                     # linha 4
+    ws.append(["Bia", "06/03/2025", fornecedor, "Natal", None, "Papel", "1.234,5"])         # linha 5
+    ws.append(["Bia", datetime(2025, 3, 6), fornecedor, None, None, "Caneta", 3])            # linha 6
+    ws.append(["Bia", "sem data", fornecedor, "Natal", None, None, -1])                      # linha 7
+    arq = io.BytesIO()
+    wb.save(arq)
+
+    resumo, rejeitadas = _importar(arq.getvalue(), "compras.xlsx", lote=2)
+
+    assert [(l[0], l[1]) for l in rejeitadas] == [
+        ("6", "cidade destino vazia"),
+        ("7", "item vazio; data inválida; quantidade deve ser maior que zero"),
+    ]
+    assert (resumo["lidas"], resumo["importadas"], resumo["rejeitadas"]) == (5, 3, 2)
+    # Cabo e Toner no mesmo pedido (mesma data); Papel em outro
+    assert resumo["pedidos"] == 2
+    assert _importadas(fornecedor) == [("Cabo", 2), ("Papel", 1234.5), ("Toner", 1.5)]
+
+
+def test_formato_e_colunas(banco):
+    with pytest.raises(importar.ErroImportacao, match="Formato não suportado"):
+        importar.importar_arquivo(io.BytesIO(b""), "compras.txt")
+    with pytest.raises(importar.ErroImportacao, match="ausentes: item, quantidade"):
+        importar.importar_arquivo(io.BytesIO(b"Comprador;Data;Fornecedor;Cidade\n"), "compras.csv")
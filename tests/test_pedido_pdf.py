@@ -0,0 +1,33 @@
+from datetime import date
+
+import pandas as pd
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Paragraph
+
+import pedido_pdf
+from pedido_pdf import LARGURA_MATERIAL, _celula_material, _estilos_pdf, gerar_pdf_pedido
+
+
+def test_texto_curto_vai_como_string():
+    texto, altura = _celula_material("Cabo de rede cat6", _estilos_pdf()["valor"])
+    assert texto == "Cabo de rede cat6"
+    assert altura == _estilos_pdf()["valor"].leading + pedido_pdf.PADDING_V
+
+
+def test_texto_largo_com_poucos_caracteres_quebra_linha():
+    estilo = _estilos_pdf()["valor"]
+    for texto in ("W" * 60, "CABO DE REDE BLINDADO CAT6A PARA AMBIENTE INDUSTRIAL EXTERNO"):
+        assert len(texto) <= 60
+        assert stringWidth(texto, estilo.fontName, estilo.fontSize) > LARGURA_MATERIAL
+        celula, altura = _celula_material(texto, estilo)
+        assert isinstance(celula, Paragraph)
+        assert altura > estilo.leading + pedido_pdf.PADDING_V
+
+
+def test_pdf_com_materiais_largos():
+    conteudo = gerar_pdf_pedido(
+        numero_pedido="PC-1", data_pedido=date(2026, 1, 1), cnpj_faturamento="", solicitante="Teste",
+        fornecedor="Fornecedor", destino="Recife", observacoes="",
+        itens_df=pd.DataFrame({"Material": ["W" * 60, "Parafuso"], "Quantidade": [1.0, 2.0]}),
+    )
+    assert conteudo.startswith(b"%PDF")
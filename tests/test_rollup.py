@@ -0,0 +1,72 @@
+import io
+from datetime import date
+
+from sqlalchemy import text
+
+import importar
+from db import engine
+
+
+def _rollup() -> dict:
+    with engine.connect() as conn:
+        return {
+            (f, c, item, dia): (round(qtd, 6), linhas)
+            for f, c, item, dia, qtd, linhas in conn.execute(text(
+                "SELECT fornecedor_id, cidade_id, item, data_compra, quantidade, linhas FROM compras_diarias"
+            ))
+        }
+
+
+def _agregado() -> dict:
+    """O que compras_diarias deveria ter: a soma direto de pedido_itens."""
+    with engine.connect() as conn:
+        return {
+            (f, c, item, dia): (round(qtd, 6), linhas)
+            for f, c, item, dia, qtd, linhas in conn.execute(text("""
+                SELECT p.fornecedor_id, p.cidade_id, i.item, p.data_compra, SUM(i.quantidade), COUNT(*)
+                FROM pedido_itens i JOIN pedidos p ON p.id = i.pedido_id
+                GROUP BY p.fornecedor_id, p.cidade_id, i.item, p.data_compra
+            """))
+        }
+
+
+def _ids_do_fornecedor(fornecedor: str) -> list[int]:
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT i.id FROM pedido_itens i
+            JOIN pedidos p ON p.id = i.pedido_id JOIN fornecedores f ON f.id = p.fornecedor_id
+            WHERE f.nome = :f ORDER BY i.id
+        """), {"f": fornecedor}).scalars().all()
+
+
+def test_rollup_acompanha_insercao_exclusao_e_importacao(banco):
+    assert _rollup() == _agregado()
+
+    # Inserção: o mesmo item duas vezes no pedido e em outro pedido do mesmo dia
+    cabecalho = {"comprador": "Rollup", "data_compra": date(2025, 5, 2), "fornecedor": "Rollup F",
+                 "cidade_destino": "Rollup C"}
+    banco.inserir_pedidos([
+        (cabecalho, [("Brita", 2), ("Brita", 0.5), ("Areia", 1)]),
+        ({**cabecalho, "comprador": "Outro"}, [("Brita", 4)]),
+    ])
+    assert _rollup() == _agregado()
+
+    # Exclusão: uma das linhas de uma chave com várias, a única de outra
+    # (a linha do rollup some) e um id que não existe
+    brita, _, areia, _ = _ids_do_fornecedor("Rollup F")
+    assert banco.deletar_compra(brita)
+    assert banco.deletar_compra(areia)
+    assert not banco.deletar_compra(10**9)
+    assert _rollup() == _agregado()
+
+    # Importação: linhas repetidas no bloco e chaves que já existem no rollup
+    csv = "\n".join([
+        "Comprador;Data;Fornecedor;Cidade;Item;Quantidade",
+        "Rollup;02/05/2025;Rollup F;Rollup C;Brita;1,5",
+        "Rollup;02/05/2025;Rollup F;Rollup C;Brita;3",
+        "Rollup;02/05/2025;Rollup F;Rollup C;Areia;7",
+        "Rollup;03/05/2025;Rollup F;Rollup C;Brita;0",
+    ])
+    resumo = importar.importar_arquivo(io.BytesIO(csv.encode()), "rollup.csv", lote=2)
+    assert (resumo["importadas"], resumo["rejeitadas"]) == (3, 1)
+    assert _rollup() == _agregado()
@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+import consultas
+import rollup
+import tarefas
+from db import engine
+
+
+def _pedido(fornecedor: str, *itens):
+    return (
+        {"comprador": "Teste", "data_compra": date(2025, 3, 1), "fornecedor": fornecedor, "cidade_destino": "Recife"},
+        list(itens),
+    )
+
+
+def _linhas() -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM pedido_itens")).scalar_one()
+
+
+def test_inserir_pedidos_grava_tudo_numa_transacao(banco):
+    antes = _linhas()
+    ids = banco.inserir_pedidos([_pedido("Lote A", ("Cabo", 2)), _pedido("Lote B", ("Toner", 1), ("Papel", 3))])
+    assert [len(lista) for lista in ids] == [1, 2]
+    assert _linhas() == antes + 3
+
+
+def test_inserir_pedidos_falha_no_meio_nao_grava_nada(banco, monkeypatch):
+    antes = _linhas()
+    versao = consultas.versao_tabela()
+    somar = rollup.somar_linhas
+    chamadas = []
+
+    def falhar_no_segundo(conn, chave, itens):
+        chamadas.append(chave)
+        if len(chamadas) == 2:
+            raise RuntimeError("falha simulada")
+        return somar(conn, chave, itens)
+
+    monkeypatch.setattr(rollup, "somar_linhas", falhar_no_segundo)
+    with pytest.raises(RuntimeError):
+        banco.inserir_pedidos([_pedido("Lote C", ("Cabo", 1)), _pedido("Lote D", ("Toner", 1))])
+    assert consultas.versao_tabela() == versao
+    assert _linhas() == antes
+
+
+def _abertos_em(pasta: str) -> list[str]:
+    caminhos = []
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            caminhos.append(os.readlink(f"/proc/self/fd/{fd}"))
+        except OSError:
+            pass
+    return [c for c in caminhos if c.startswith(pasta)]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="lista os arquivos abertos por /proc")
+def test_downloads_nao_deixam_arquivo_aberto(banco, monkeypatch, tmp_path):
+    filtros = consultas.FiltrosCompras(fornecedor="Fornecedor 1")
+    versao = consultas.versao_tabela()
+    gerado = banco.ler_export(filtros, versao, "csv")   # gera o arquivo
+    assert banco.ler_export(filtros, versao, "csv") == gerado  # do cache
+    assert b"Fornecedor 1" in gerado
+    assert _abertos_em(banco._exports["pasta"]) == []
+
+    def gravar(arq, progresso):
+        arq.write(b"ok")
+
+    monkeypatch.setattr(tarefas, "PASTA", str(tmp_path))
+    tarefa_id = tarefas.enviar("downloads", "exportar", "teste", gravar)
+    for _ in range(100):
+        if tarefas.listar("downloads")[0]["status"] == tarefas.PRONTA:
+            break
+        time.sleep(0.05)
+    assert tarefas.ler_arquivo(tarefa_id) == b"ok"
+    assert _abertos_em(str(tmp_path)) == []
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import time
+
+from sqlalchemy import text
+
+import tarefas
+from db import engine
+
+
+def _pid_encerrado() -> int:
+    filho = subprocess.Popen([sys.executable, "-c", "pass"])
+    filho.wait()
+    return filho.pid
+
+
+def test_pool_recupera_so_tarefas_de_processos_encerrados(banco, monkeypatch, tmp_path):
+    donos = {
+        "sem_dono": None,                                   # de antes da coluna
+        "pid_encerrado": f"{tarefas.HOST}:{_pid_encerrado()}",
+        "mesmo_pid": f"{tarefas.HOST}:{os.getpid()}",       # processo anterior com o mesmo pid
+        "outro_vivo": f"{tarefas.HOST}:{os.getppid()}",
+        "outro_host": f"outro-{tarefas.HOST}:1",
+    }
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO tarefas (id, usuario, tipo, descricao, status, criada_em, dono)
+                VALUES (:id, 'recuperacao', 't', 'd', :status, :agora, :dono)
+            """),
+            [{"id": f"{nome}_{status}", "status": status, "agora": int(time.time()), "dono": dono}
+             for nome, dono in donos.items() for status in (tarefas.FILA, tarefas.RODANDO, tarefas.PRONTA)],
+        )
+
+    monkeypatch.setattr(tarefas, "_pool", None)
+    monkeypatch.setattr(tarefas, "PASTA", str(tmp_path))
+    tarefas._pool_tarefas().shutdown()
+
+    status = {t["id"]: t["status"] for t in tarefas.listar("recuperacao")}
+    interrompidas = {"sem_dono", "pid_encerrado", "mesmo_pid"}
+    for nome in donos:
+        for antes in (tarefas.FILA, tarefas.RODANDO):
+            esperado = tarefas.ERRO if nome in interrompidas else antes
+            assert status[f"{nome}_{antes}"] == esperado, nome
+        assert status[f"{nome}_{tarefas.PRONTA}"] == tarefas.PRONTA
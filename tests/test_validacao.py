@@ -0,0 +1,122 @@
+import itertools
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from validacao import COLUNAS_COMPRA, validar_compras, validar_itens
+
+
+def _quantidade_por_linha(valor):
+    """Regra antiga, linha a linha: número direto; texto com 1.5 ou 1.234,5."""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return None if pd.isna(valor) else float(valor)
+    texto = "" if valor is None else str(valor).strip()
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+
+def _data_por_linha(valor):
+    texto = "" if valor is None else str(valor).strip()
+    for ler in (lambda t: datetime.strptime(t, "%d/%m/%Y"), datetime.fromisoformat):
+        try:
+            return (ler(texto).date() - date(1970, 1, 1)).days
+        except ValueError:
+            pass
+    return None
+
+
+def _motivos_por_linha(linha: dict) -> str:
+    """As mesmas regras, uma linha por vez em Python, como o app validava antes do validacao.py."""
+    texto = {c: "" if linha[c] is None else str(linha[c]).strip() for c in COLUNAS_COMPRA}
+    qtd = _quantidade_por_linha(linha["quantidade"])
+    regras = [
+        (texto["comprador"] == "", "comprador vazio"),
+        (texto["fornecedor"] == "", "fornecedor vazio"),
+        (texto["cidade_destino"] == "", "cidade destino vazia"),
+        (texto["item"] == "", "item vazio"),
+        (_data_por_linha(linha["data_compra"]) is None, "data inválida"),
+        (qtd is None, "quantidade inválida"),
+        (qtd is not None and qtd <= 0, "quantidade deve ser maior que zero"),
+    ]
+    return "; ".join(motivo for falhou, motivo in regras if falhou)
+
+
+def test_mascara_por_celula():
+    itens = pd.DataFrame({
+        "Material": ["Cimento", "  ", "Areia", None],
+        "Quantidade": ["10", "3", "abc", "0"],
+    })
+    v = validar_itens(itens)
+
+    assert v.erros.to_dict("list") == {
+        "Material": [False, True, False, True],
+        "Quantidade": [False, False, True, True],
+    }
+    assert v.ok.tolist() == [True, False, False, False]
+    assert v.motivos.tolist() == [
+        "",
+        "material vazio",
+        "quantidade inválida",
+        "material vazio; quantidade deve ser maior que zero",
+    ]
+    assert v.valores["Material"].tolist() == ["Cimento", "", "Areia", ""]
+
+
+def test_itens_sem_coluna():
+    with pytest.raises(ValueError, match="colunas ausentes: Quantidade"):
+        validar_itens(pd.DataFrame({"Material": ["Cimento"]}))
+
+
+def test_motivos_da_compra_rejeitada():
+    bruto = pd.DataFrame([
+        {"comprador": " Ana ", "data_compra": "05/03/2025", "fornecedor": "F", "cidade_destino": "C",
+         "item": "Cabo", "quantidade": "1.234,5"},
+        {"comprador": "", "data_compra": "31/02/2025", "fornecedor": "F", "cidade_destino": "",
+         "item": "Cabo", "quantidade": "-2"},
+    ])
+    v = validar_compras(bruto)
+
+    assert v.motivos.tolist() == [
+        "",
+        "comprador vazio; cidade destino vazia; data inválida; quantidade deve ser maior que zero",
+    ]
+    assert v.erros.loc[1].to_dict() == {
+        "comprador": True, "data_compra": True, "fornecedor": False, "cidade_destino": True,
+        "item": False, "quantidade": True,
+    }
+    assert v.valores.loc[0, "comprador"] == "Ana"
+    assert v.valores.loc[0, "quantidade"] == 1234.5
+    assert v.valores.loc[0, "data_compra"] == (date(2025, 3, 5) - date(1970, 1, 1)).days
+
+
+def test_quantidades_numericas_passam_direto():
+    v = validar_itens(pd.DataFrame({"Material": ["A", "B", "C"], "Quantidade": [1.5, 0.0, np.nan]}))
+    assert v.motivos.tolist() == ["", "quantidade deve ser maior que zero", "quantidade inválida"]
+
+
+def test_vetorizado_igual_as_regras_por_linha():
+    # Todas as combinações de um valor bom e alguns ruins por coluna
+    opcoes = {
+        "comprador": ["Ana", "  ", None],
+        "data_compra": ["05/03/2025", "2025-03-05", "2025-03-05 00:00:00", "31/02/2025", "ontem", ""],
+        "fornecedor": ["Fornecedor X", ""],
+        "cidade_destino": ["Recife", " "],
+        "item": ["Cabo", None],
+        "quantidade": ["3", "1.234,5", "0,5", "0", "-1", "abc", "", None],
+    }
+    linhas = [dict(zip(opcoes, combinacao)) for combinacao in itertools.product(*opcoes.values())]
+    v = validar_compras(pd.DataFrame(linhas))
+
+    assert v.motivos.tolist() == [_motivos_por_linha(l) for l in linhas]
+    assert v.ok.tolist() == [_motivos_por_linha(l) == "" for l in linhas]
+    validas = [(l, i) for i, l in enumerate(linhas) if _motivos_por_linha(l) == ""]
+    assert validas
+    for linha, i in validas:
+        assert v.valores.loc[i, "data_compra"] == _data_por_linha(linha["data_compra"])
+        assert v.valores.loc[i, "quantidade"] == _quantidade_por_linha(linha["quantidade"])
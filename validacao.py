@@ -0,0 +1,113 @@
+"""
+Validação das linhas de compra, vetorizada: um DataFrame inteiro de uma vez,
+sem laço em Python por linha. Usada pelo formulário, pelo editor de itens da
+aba de PDF (a cada edição) e pela importação em lote (importar.py).
+
+Cada validação devolve os valores já tipados, uma máscara de erro por
+célula (True onde a regra falhou, uma coluna por campo) e os motivos de
+cada linha, para o relatório de rejeitadas ou para destacar as células
+ruins na tela.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_COMPRA = ["comprador", "data_compra", "fornecedor", "cidade_destino", "item", "quantidade"]
+COLUNAS_ITENS = ["Material", "Quantidade"]
+
+
+class Validacao(NamedTuple):
+    valores: pd.DataFrame  # colunas tipadas (texto sem espaços nas pontas, números, dias)
+    erros: pd.DataFrame    # bool, mesmas colunas e índice de valores
+    motivos: pd.Series     # "" nas linhas válidas; senão os problemas, separados por "; "
+
+    @property
+    def ok(self) -> pd.Series:
+        """True nas linhas sem nenhum erro."""
+        return ~self.erros.any(axis=1)
+
+
+# ----------------------------
+# Conversões
+# ----------------------------
+def _texto(s: pd.Series) -> pd.Series:
+    return s.fillna("").astype(str).str.strip()
+
+
+def _datas_em_dias(s: pd.Series) -> pd.Series:
+    """dd/mm/aaaa ou ISO (aaaa-mm-dd, inclusive datas vindas do Excel) -> dias desde 1970."""
+    s = _texto(s)
+    datas = pd.to_datetime(s, format="%d/%m/%Y", errors="coerce")
+    falta = datas.isna() & (s != "")
+    if falta.any():
+        datas[falta] = pd.to_datetime(s[falta], format="ISO8601", errors="coerce")
+    return (datas.dt.normalize() - pd.Timestamp("1970-01-01")).dt.days
+
+
+def _quantidades(s: pd.Series) -> pd.Series:
+    """Números passam direto; texto aceita 1.5 e o formato brasileiro 1.234,5."""
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s.astype("float64")
+    s = _texto(s)
+    com_virgula = s.str.contains(",", regex=False)
+    s = s.where(~com_virgula, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(s, errors="coerce")
+
+
+# ----------------------------
+# Regras
+# ----------------------------
+def _aplicar(valores: pd.DataFrame, regras: list[tuple[str, pd.Series, str]]) -> Validacao:
+    """regras: (coluna, máscara das linhas que falham, motivo)."""
+    mascaras = [mascara.to_numpy(dtype=bool, na_value=False) for _, mascara, _ in regras]
+    por_coluna = {c: np.zeros(len(valores), dtype=bool) for c in valores.columns}
+    for (coluna, _, _), m in zip(regras, mascaras):
+        por_coluna[coluna] |= m
+    erros = pd.DataFrame(por_coluna, index=valores.index)
+
+    # Motivos só nas linhas com erro: no caso comum (tudo válido) não há
+    # concatenação de texto nenhuma
+    motivos = np.full(len(valores), "", dtype=object)
+    ruins = np.logical_or.reduce(mascaras)
+    if ruins.any():
+        partes = np.full(int(ruins.sum()), "", dtype=object)
+        for (_, _, texto), m in zip(regras, mascaras):
+            partes += np.where(m[ruins], texto + "; ", "").astype(object)
+        motivos[ruins] = [p[:-2] for p in partes]
+    return Validacao(valores, erros, pd.Series(motivos, index=valores.index))
+
+
+def validar_compras(bruto: pd.DataFrame) -> Validacao:
+    """
+    Linhas completas de compra (COLUNAS_COMPRA), do formulário ou de uma
+    planilha. data_compra vira dias desde 1970 e quantidade, float.
+    """
+    conversao = {"data_compra": _datas_em_dias, "quantidade": _quantidades}
+    valores = pd.DataFrame({c: conversao.get(c, _texto)(bruto[c]) for c in COLUNAS_COMPRA})
+    qtd = valores["quantidade"]
+
+    return _aplicar(valores, [
+        ("comprador", valores["comprador"] == "", "comprador vazio"),
+        ("fornecedor", valores["fornecedor"] == "", "fornecedor vazio"),
+        ("cidade_destino", valores["cidade_destino"] == "", "cidade destino vazia"),
+        ("item", valores["item"] == "", "item vazio"),
+        ("data_compra", valores["data_compra"].isna(), "data inválida"),
+        ("quantidade", qtd.isna(), "quantidade inválida"),
+        ("quantidade", qtd <= 0, "quantidade deve ser maior que zero"),
+    ])
+
+
+def validar_itens(itens: pd.DataFrame) -> Validacao:
+    """Itens do pedido em PDF (Material, Quantidade), como saem do st.data_editor."""
+    faltando = [c for c in COLUNAS_ITENS if c not in itens.columns]
+    if faltando:
+        raise ValueError(f"colunas ausentes: {', '.join(faltando)}")
+    valores = pd.DataFrame({"Material": _texto(itens["Material"]), "Quantidade": _quantidades(itens["Quantidade"])})
+    qtd = valores["Quantidade"]
+
+    return _aplicar(valores, [
+        ("Material", valores["Material"] == "", "material vazio"),
+        ("Quantidade", qtd.isna(), "quantidade inválida"),
+        ("Quantidade", qtd <= 0, "quantidade deve ser maior que zero"),
+    ])